@@ -1,21 +1,86 @@
+import math
+import os
+
 import dash
-from dash import dash_table, dcc, html, Input, Output, State, ALL, ctx
+from dash import dash_table, dcc, html, Input, Output, State, ALL, Patch, ctx
 import plotly.express as px
+import plotly.graph_objects as go
 import pandas as pd
+import http_utils
+import metrics_utils
 import mysql_utils
 import mongodb_utils
 import neo4j_utils
+import startup_utils
+import db_config
+from figure_store import FigureStore
+import keyword_profile
+
+# In snapshot mode every widget reads the offline Parquet snapshot, which
+# mirrors the query functions of the three utils modules (read-only)
+if db_config.DATA_MODE == "snapshot":
+    import snapshot_utils
+    mysql_utils = mongodb_utils = neo4j_utils = snapshot_utils
+
+# Slow widgets run as background jobs on a thread pool, with results shared
+# through a local disk cache, when the dash[diskcache] extras are installed;
+# otherwise they run in the request thread
+BACKGROUND_CACHE_DIR = os.environ.get("BACKGROUND_CACHE_DIR", "./.callback-cache")
+
+# Set DASH_DEBUG=0 to run the development server without debug mode
+DEBUG = os.environ.get("DASH_DEBUG", "1") == "1"
+try:
+    import diskcache
+    from background_utils import ThreadPoolManager
+    background_callback_manager = ThreadPoolManager(diskcache.Cache(BACKGROUND_CACHE_DIR))
+except ImportError:
+    background_callback_manager = None
+
+# Milliseconds between the browser's polls of a running background job
+BACKGROUND_POLL_MS = int(os.environ.get("BACKGROUND_POLL_MS", 200))
 
 # Initialize Dash app
-app = dash.Dash()
-
-# Load MySQL Data
-all_keywords_df = mysql_utils.get_all_keywords()
-all_keywords = all_keywords_df['name'].tolist()
-
-# App Layout
+app = dash.Dash(background_callback_manager=background_callback_manager)
+# WSGI entry point for process servers (see wsgi.py)
+server = app.server
+# Prometheus metrics for every backend call and callback
+metrics_utils.register_metrics_route(server)
+# Compressed layout/callback responses and cacheable assets
+http_utils.register_http_optimizations(app)
+instrument_callback = metrics_utils.instrument("dash", ignored=(dash.exceptions.PreventUpdate,))
+
+
+def background_options(running=None, cancel=None):
+    """
+    Callback keyword arguments for a slow widget. As a background job it is
+    cancelled when re-triggered or when one of `cancel` changes; `running`
+    sets loading states in either mode.
+    """
+    options = {"running": running} if running else {}
+    if background_callback_manager is not None:
+        options["background"] = True
+        options["interval"] = BACKGROUND_POLL_MS
+        if cancel:
+            options["cancel"] = cancel
+    return options
+
+# App Layout. The year range is filled in by load_initial_data on page load and
+# keyword dropdowns are searched server-side, so the layout ships no keyword list
 app.layout = html.Div([
+    dcc.Location(id='url'),
     html.H2("University Application Encyclopedia", style={'textAlign': 'center', 'fontSize': 30}),
+
+    # Focus keyword: fills the trend, publication, university and professor
+    # widgets for one keyword from a single concurrent keyword profile
+    html.Div([
+        dcc.Dropdown(
+            id='focus-keyword-selector',
+            options=[],
+            multi=False,
+            placeholder="Focus on a keyword across all widgets"
+        ),
+        dcc.Loading(html.Div(id='focus-status')),
+    ], className='chart-box'),
     
     html.Div([
         html.Div([
@@ -28,6 +93,14 @@ app.layout = html.Div([
                 value=10,
                 marks={i: str(i) for i in [5, 10, 20, 50]}
             ),
+            dcc.RangeSlider(
+                id='year-range-slider',
+                min=mysql_utils.DEFAULT_START_YEAR,
+                max=mysql_utils.DEFAULT_START_YEAR,
+                step=1,
+                value=[mysql_utils.DEFAULT_START_YEAR, mysql_utils.DEFAULT_START_YEAR],
+                tooltip={'placement': 'bottom'}
+            ),
             dcc.Graph(id='bubble-chart')
         ], className='chart-box'),
 
@@ -35,11 +108,14 @@ app.layout = html.Div([
             html.H4("Keyword Trend Over Time"),
             dcc.Dropdown(
                 id='keyword-selector',
-                options=[{'label': k, 'value': k} for k in all_keywords],
+                options=[],
                 # value=['machine learning'],
-                multi=True
+                multi=True,
+                placeholder="Type to search keywords"
             ),
-            dcc.Graph(id='line-chart')
+            dcc.Loading(dcc.Graph(id='line-chart')),
+            # Keywords drawn in the line chart, in trace order, and their colours
+            dcc.Store(id='line-chart-keywords')
         ], className='chart-box')
     ], className='chart-row'),
     html.Div([
@@ -47,7 +123,7 @@ app.layout = html.Div([
             html.H4("Publications List for Selected Keyword"),
             dcc.Dropdown(
                 id="publication-keyword-selector",
-                options=[{'label': k, 'value': k} for k in all_keywords],
+                options=[],
                 placeholder="Select a keyword"
             ),
             dash_table.DataTable(
@@ -70,7 +146,10 @@ app.layout = html.Div([
                     'backgroundColor': 'lightgrey',
                     'fontWeight': 'bold'
                 },
-                page_size=10
+                page_action='custom',
+                page_current=0,
+                page_size=mongodb_utils.PUBLICATION_PAGE_SIZE,
+                page_count=0
             )
         ], className='chart-box'),
 
@@ -83,12 +162,13 @@ app.layout = html.Div([
                 debounce=True  # Optional: wait until user finishes typing
             ),
             html.Button('Search', id='search-button-university'),
-            dcc.Graph(id='university-bar-chart'),
+            dcc.Loading(dcc.Graph(id='university-bar-chart')),
             dash_table.DataTable(
                 id="university-table",
                 columns=[
                     {"name": "University", "id": "university"},
-                    {"name": "Faculty Count", "id": "facultyCount"}
+                    {"name": "Faculty Count", "id": "facultyCount"},
+                    {"name": "Total Citations", "id": "totalCitations"}
                 ],
                 style_table={'overflowX': 'auto'},
                 style_cell={
@@ -108,15 +188,23 @@ app.layout = html.Div([
     
     html.Div([
         html.Div([
-            html.H4("Top 5 Professors by Keyword-related Citations"),
+            html.H4(id='professor-title'),
             dcc.Dropdown(
                 id='professor-keyword-selector',
-                options=[{'label': k, 'value': k} for k in all_keywords],
+                options=[],
                 # value='machine learning',
                 multi=False,
                 placeholder="Select a keyword"
             ),
-            html.Div(id='professor-cards', className="professor-container"),
+            dcc.Slider(
+                id='professor-count-slider',
+                min=1,
+                max=20,
+                step=1,
+                value=mysql_utils.TOP_FACULTY_DEFAULT,
+                marks={i: str(i) for i in [1, 5, 10, 15, 20]}
+            ),
+            dcc.Loading(html.Div(id='professor-cards', className="professor-container")),
         ], className='chart-box'),
 
         html.Div([
@@ -154,7 +242,7 @@ app.layout = html.Div([
     ], className='chart-row'),
     
 
-    # Hidden div to store the selected publication id
+    # The publication being edited: its ids, table row and citation count when opened
     dcc.Store(id="selected-publication-id"),
 
     # Add a new Store for selected professor id
@@ -168,6 +256,8 @@ app.layout = html.Div([
             dcc.Input(id="edit-venue", type="text", placeholder="Venue", disabled=True, style={'width': '100%'}),
             dcc.Input(id="edit-year", type="number", placeholder="Year", disabled=True, style={'width': '100%'}),
             dcc.Input(id="edit-citations", type="number", placeholder="Number of Citations", style={'width': '100%', 'marginTop': '10px'}),
+            dcc.Checklist(id="queue-edits", options=[{"label": " Queue edits and save them in batches", "value": "queue"}],
+                          value=[], style={'marginTop': '10px'}),
             html.Button("Save Changes", id="save-publication-btn", n_clicks=0, style={'marginTop': '10px'}),
             html.Button("Cancel", id="cancel-edit-btn", n_clicks=0, style={'marginLeft': '10px', 'marginTop': '10px'})
         ], className="modal-content"),
@@ -189,105 +279,265 @@ app.layout = html.Div([
 ])
 
 
+def default_year_range():
+    """The year range selected when the page loads"""
+    min_year, max_year = mysql_utils.get_publication_year_range()
+    return max(min_year, mysql_utils.DEFAULT_START_YEAR), max_year
+
+
+# Bubble chart figures for every top-N, rendered once per year range
+bubble_figures = FigureStore(mysql_utils.get_top_keywords,
+                             refresh_data=getattr(mysql_utils, 'refresh_keyword_year_cube_if_stale', None))
+
+
+@startup_utils.register_warmup
+def warm_bubble_figures():
+    # Only the default range is known ahead of time; the store then refreshes itself
+    bubble_figures.start(lambda: [default_year_range()], top_ns=range(5, 55, 5))
+
+
+# Callback: fill the year range once the page has loaded
+@app.callback(
+    Output('year-range-slider', 'min'),
+    Output('year-range-slider', 'max'),
+    Output('year-range-slider', 'value'),
+    Output('year-range-slider', 'marks'),
+    Input('url', 'pathname')
+)
+@instrument_callback
+def load_initial_data(pathname):
+    min_year, max_year = mysql_utils.get_publication_year_range()
+    year_range = list(default_year_range())
+    marks = {i: str(i) for i in range(min_year, max_year + 1, 10)}
+    return min_year, max_year, year_range, marks
+
+
+def keyword_search_options(search_value, selected):
+    """Dropdown options for the typed text, keeping already selected keywords"""
+    if not search_value:
+        raise dash.exceptions.PreventUpdate
+    if selected is None:
+        selected = []
+    elif isinstance(selected, str):
+        selected = [selected]
+    matches = mysql_utils.search_keywords(search_value)
+    keywords = list(dict.fromkeys(selected + matches))
+    return [{'label': k, 'value': k} for k in keywords]
+
+
+# Callbacks: server-side keyword typeahead for the three keyword dropdowns
+@app.callback(
+    Output('keyword-selector', 'options'),
+    Input('keyword-selector', 'search_value'),
+    State('keyword-selector', 'value')
+)
+@instrument_callback
+def search_trend_keywords(search_value, selected):
+    return keyword_search_options(search_value, selected)
+
+
+@app.callback(
+    Output('publication-keyword-selector', 'options'),
+    Input('publication-keyword-selector', 'search_value'),
+    State('publication-keyword-selector', 'value')
+)
+@instrument_callback
+def search_publication_keywords(search_value, selected):
+    return keyword_search_options(search_value, selected)
+
+
+@app.callback(
+    Output('professor-keyword-selector', 'options'),
+    Input('professor-keyword-selector', 'search_value'),
+    State('professor-keyword-selector', 'value')
+)
+@instrument_callback
+def search_professor_keywords(search_value, selected):
+    return keyword_search_options(search_value, selected)
+
+
+@app.callback(
+    Output('focus-keyword-selector', 'options'),
+    Input('focus-keyword-selector', 'search_value'),
+    State('focus-keyword-selector', 'value')
+)
+@instrument_callback
+def search_focus_keywords(search_value, selected):
+    return keyword_search_options(search_value, selected)
+
+
 # Callback for bubble chart based on slider
 @app.callback(
     Output('bubble-chart', 'figure'),
-    Input('top-n-slider', 'value')
+    Input('top-n-slider', 'value'),
+    Input('year-range-slider', 'value')
 )
-def update_bubble_chart(top_n):
-    df = mysql_utils.get_top_keywords(top_n)
-    fig = px.scatter(
-        df,
-        x='keyword',
-        y='popularity',
-        size='popularity',
-        color='keyword',
-        title=f'Top {top_n} Keywords (Since 2012)',
-        size_max=60
-    )
-    fig.update_layout(xaxis_tickangle=45)
-    return fig
+@instrument_callback
+def update_bubble_chart(top_n, year_range):
+    start_year, end_year = year_range
+    return bubble_figures.get(top_n, start_year, end_year)
 
 
-# Callback to update line chart
+# Callback to update line chart. The chart keeps the traces it already has:
+# only added keywords are fetched, and a Patch adds and removes traces
 @app.callback(
     Output('line-chart', 'figure'),
-    Input('keyword-selector', 'value')
+    Output('line-chart-keywords', 'data'),
+    Input('keyword-selector', 'value'),
+    State('line-chart-keywords', 'data')
 )
-def update_line_chart(selected_keywords):
+@instrument_callback
+def update_line_chart(selected_keywords, drawn):
     if not selected_keywords:
         # Return an empty figure with a title
-        return px.line(title='Select keyword(s) to display trends')
-    
-    # Get data from Neo4j
-    df = neo4j_utils.get_keyword_trend(selected_keywords)
-      
-    # Handle empty dataframe case
-    if df.empty:
-        return px.line(title='No data found for selected keywords')
-    
-
-    
-    # Create the figure
-    fig = px.line(
-        df,
-        x='year',
-        y='publication_count',
-        color='keyword',
-        markers=True,
-        title='Keyword Trend Over Time'
+        return px.line(title='Select keyword(s) to display trends'), None
+
+    shown = list(dict.fromkeys(selected_keywords))[:neo4j_utils.MAX_TREND_KEYWORDS]
+    if not drawn or not drawn['keywords']:
+        # Get data from Neo4j
+        return trend_figure(neo4j_utils.get_keyword_series(shown), selected_keywords)
+
+    added = [k for k in shown if k not in drawn['keywords']]
+    series = neo4j_utils.get_keyword_series(added) if added else {}
+
+    figure = Patch()
+    keywords, colors = [], []
+    # Delete from the end so the remaining trace indexes stay valid
+    for index in reversed(range(len(drawn['keywords']))):
+        if drawn['keywords'][index] not in shown:
+            del figure['data'][index]
+    for keyword, color in zip(drawn['keywords'], drawn['colors']):
+        if keyword in shown:
+            keywords.append(keyword)
+            colors.append(color)
+    for keyword in added:
+        if not series[keyword].empty:
+            color = next_trend_color(colors)
+            figure['data'].append(trend_trace(keyword, series[keyword], color))
+            keywords.append(keyword)
+            colors.append(color)
+
+    if not keywords:
+        return px.line(title='No data found for selected keywords'), None
+    figure['layout']['title']['text'] = trend_title(selected_keywords)
+    return figure, {'keywords': keywords, 'colors': colors}
+
+
+TREND_COLORS = px.colors.qualitative.Plotly
+
+
+def next_trend_color(used):
+    unused = [c for c in TREND_COLORS if c not in used]
+    return unused[0] if unused else TREND_COLORS[len(used) % len(TREND_COLORS)]
+
+
+def trend_title(selected_keywords):
+    title = 'Keyword Trend Over Time'
+    if len(set(selected_keywords)) > neo4j_utils.MAX_TREND_KEYWORDS:
+        title += f' (first {neo4j_utils.MAX_TREND_KEYWORDS} keywords shown)'
+    return title
+
+
+def trend_trace(keyword, df, color):
+    """One keyword's line, styled like px.line(color='keyword', markers=True)"""
+    return go.Scatter(
+        x=df['year'].tolist(),
+        y=df['publication_count'].tolist(),
+        name=keyword,
+        legendgroup=keyword,
+        mode='lines+markers',
+        line={'color': color},
+        marker={'color': color},
+        hovertemplate=f'keyword={keyword}<br>year=%{{x}}<br>publication_count=%{{y}}<extra></extra>'
+    ).to_plotly_json()
+
+
+def trend_figure(series, selected_keywords):
+    """The whole line chart for {keyword: series} plus the drawn-keywords store"""
+    keywords, colors, traces = [], [], []
+    for keyword, df in series.items():
+        # Handle keywords without data
+        if df.empty:
+            continue
+        color = next_trend_color(colors)
+        traces.append(trend_trace(keyword, df, color))
+        keywords.append(keyword)
+        colors.append(color)
+    if not traces:
+        return px.line(title='No data found for selected keywords'), None
+
+    fig = go.Figure(data=traces)
+    fig.update_layout(
+        title=trend_title(selected_keywords),
+        xaxis_title='year',
+        yaxis_title='publication_count',
+        legend_title_text='keyword'
     )
-    return fig
+    return fig, {'keywords': keywords, 'colors': colors}
 
 
-# Callback: Update Publications List
+# Callback: Update Publications List, one page at a time
 @app.callback(
     Output('publication-table', 'data'),
-    Input('publication-keyword-selector', 'value')
+    Output('publication-table', 'page_count'),
+    Output('publication-table', 'page_current'),
+    Input('publication-keyword-selector', 'value'),
+    Input('publication-table', 'page_current'),
+    Input('publication-table', 'page_size')
 )
-def update_publication_table(selected_keyword):
+@instrument_callback
+def update_publication_table(selected_keyword, page_current, page_size):
     if not selected_keyword:
-        return []
-    pubs = mongodb_utils.get_top_publications(selected_keyword)
+        return [], 0, 0
+    # A new keyword starts again from the first page
+    if ctx.triggered_id == 'publication-keyword-selector' or page_current is None:
+        page_current = 0
+
+    total = mongodb_utils.count_publications_by_keyword(selected_keyword)
+    pubs = mongodb_utils.get_top_publications(selected_keyword, page_current, page_size)
+    return publication_page(pubs, total, page_current, page_size)
+
+
+def publication_page(pubs, total, page_current, page_size):
     if not pubs:
-        return []
+        return [], 0, 0
 
     pub_df = pd.DataFrame(pubs)
     pub_df['edit-btn'] = ['Edit' for _ in range(len(pub_df))]
      # Create unique link for each edit
-    return pub_df[['title', 'venue', 'year', 'numCitations', 'edit-btn']].to_dict('records')
+    page_count = math.ceil(total / page_size)
+    # _id and id are not shown but let the edit dialog update the row without a lookup
+    return pub_df[['_id', 'id', 'title', 'venue', 'year', 'numCitations', 'edit-btn']].to_dict('records'), page_count, page_current
 
 # Callback: Update faculty-publication List
 @app.callback(
     Output('faculty-publications-table', 'data'),
     Input('search-button-faculty', 'n_clicks'),
     State('faculty-input', 'value'),
-    prevent_initial_call=True
+    prevent_initial_call=True,
+    **background_options(
+        running=[
+            (Output('search-button-faculty', 'disabled'), True, False),
+            (Output('search-button-faculty', 'children'), 'Searching...', 'Search')
+        ],
+        cancel=[Input('faculty-input', 'value')]
+    )
 )
-
+@instrument_callback
 def update_faculty_publications(n_clicks, name_input):
 
     if not name_input:
         return[]
     
-    # Proceed with your database query logic here
-    publications = mongodb_utils.get_publications_for_faculty(name_input)
-
-    if publications:
-        # Map the query result into the format the table expects
-        formatted_data = [
-            {
-                "faculty": pub['faculty'],
-                "year": pub['year'],
-                "title": pub['title']
-                # "venue": pub['venue'] if pub['venue'] else "N/A",  # Set default if None
-                
-            }
-            for pub in publications
-        ]
-        return formatted_data
-    else:
-        return []
+    # Convert the rows into the format the table expects
+    return [
+        {
+            "faculty": pub.get('faculty'),
+            "year": pub.get('year'),
+            "title": pub.get('title')
+        }
+        for pub in mongodb_utils.iter_publications_for_faculty(name_input)
+    ]
 
 # Callback: Update university/keyword List
 @app.callback(
@@ -295,22 +545,33 @@ def update_faculty_publications(n_clicks, name_input):
     Output("university-table", "data"),
     Input("search-button-university", "n_clicks"),
     State('keyword-input', 'value'),
-    prevent_initial_call=True
+    prevent_initial_call=True,
+    **background_options(
+        running=[
+            (Output('search-button-university', 'disabled'), True, False),
+            (Output('search-button-university', 'children'), 'Searching...', 'Search')
+        ],
+        cancel=[Input('keyword-input', 'value')]
+    )
 )
-
+@instrument_callback
 def update_university_table(n_clicks, selected_keyword):
     if not selected_keyword:
-        return [], px.scatter(title="No keyword selected")
+        return px.scatter(title="No keyword selected"), []
     data = mongodb_utils.get_universities_by_keyword(selected_keyword)
+    return university_outputs(selected_keyword, data)
 
+
+def university_outputs(selected_keyword, data):
     if not data:
-        return [], px.scatter(title=f"No results for '{selected_keyword}'")
+        return px.scatter(title=f"No results for '{selected_keyword}'"), []
     
     # Create the bar chart
     fig = px.bar(
         data,
         x='university',
         y='facultyCount',
+        hover_data=['totalCitations'],
         title=f"Faculty Count for '{selected_keyword}'",
         color_discrete_sequence=['#FFB347']  # pastel orange
     )
@@ -322,16 +583,30 @@ def update_university_table(n_clicks, selected_keyword):
 
     return fig, data
 
+@app.callback(
+    Output('professor-title', 'children'),
+    Input('professor-count-slider', 'value')
+)
+@instrument_callback
+def update_professor_title(count):
+    return f"Top {count} Professors by Keyword-related Citations"
+
 @app.callback(
     Output('professor-cards', 'children'), 
     Input('professor-keyword-selector', 'value'),
+    Input('professor-count-slider', 'value'),
+    **background_options()
 )
-def update_professor_cards(selected_keyword):
+@instrument_callback
+def update_professor_cards(selected_keyword, count):
     if not selected_keyword:
         return html.Div("No keyword selected.")
 
-    df = mysql_utils.get_top_faculty_by_keyword(selected_keyword)
+    df = mysql_utils.get_top_faculty_by_keyword(selected_keyword, count)
+    return professor_cards(df)
+
 
+def professor_cards(df):
     if df.empty:
         return html.Div("No professors found.")
 
@@ -365,6 +640,58 @@ def update_professor_cards(selected_keyword):
 
     return cards
 
+# Callback: fill every keyword widget from one concurrent keyword profile
+@app.callback(
+    Output('focus-status', 'children'),
+    Output('line-chart', 'figure', allow_duplicate=True),
+    Output('line-chart-keywords', 'data', allow_duplicate=True),
+    Output('publication-table', 'data', allow_duplicate=True),
+    Output('publication-table', 'page_count', allow_duplicate=True),
+    Output('publication-table', 'page_current', allow_duplicate=True),
+    Output('university-bar-chart', 'figure', allow_duplicate=True),
+    Output('university-table', 'data', allow_duplicate=True),
+    Output('professor-cards', 'children', allow_duplicate=True),
+    # The widgets' own selectors follow, so paging, the professor slider and
+    # the edit dialogs keep working on the focused keyword
+    Output('keyword-selector', 'options', allow_duplicate=True),
+    Output('keyword-selector', 'value'),
+    Output('publication-keyword-selector', 'options', allow_duplicate=True),
+    Output('publication-keyword-selector', 'value'),
+    Output('professor-keyword-selector', 'options', allow_duplicate=True),
+    Output('professor-keyword-selector', 'value', allow_duplicate=True),
+    Output('keyword-input', 'value'),
+    Input('focus-keyword-selector', 'value'),
+    State('professor-count-slider', 'value'),
+    State('publication-table', 'page_size'),
+    prevent_initial_call=True
+)
+@instrument_callback
+def focus_keyword(keyword, professor_count, page_size):
+    if not keyword:
+        raise dash.exceptions.PreventUpdate
+    profile = keyword_profile.get_keyword_profile(keyword, professor_count, page_size)
+
+    # Parts that failed or timed out leave their widget as it was
+    outputs = [dash.no_update] * 8
+    if profile['trend'] is not None:
+        outputs[0:2] = trend_figure(profile['trend'], [keyword])
+    if profile['publications'] is not None and profile['publication_count'] is not None:
+        outputs[2:5] = publication_page(profile['publications'], profile['publication_count'], 0, page_size)
+    if profile['universities'] is not None:
+        outputs[5:7] = university_outputs(keyword, profile['universities'])
+    if profile['faculty'] is not None:
+        outputs[7] = professor_cards(profile['faculty'])
+
+    # Their callbacks then run again on results the profile has just cached
+    option = [{'label': keyword, 'value': keyword}]
+    selectors = [option, [keyword], option, keyword, option, keyword, keyword]
+
+    status = f"Showing '{keyword}' in {max(profile['ms'].values(), default=0):.0f} ms"
+    if profile['errors']:
+        status += " (unavailable: " + ", ".join(profile['errors']) + ")"
+    return [status] + outputs + selectors
+
+
 # Open Modal when Edit clicked
 @app.callback(
     Output("edit-modal", "style"),
@@ -376,15 +703,15 @@ def update_professor_cards(selected_keyword):
     State("publication-table", "data"),
     prevent_initial_call=True
 )
+@instrument_callback
 def control_modal(active_cell, save_clicks, cancel_clicks, table_data):
     triggered_id = dash.callback_context.triggered_id
 
     # CASE 1: Edit button clicked → Open the modal
     if triggered_id == "publication-table" and active_cell and active_cell['column_id'] == 'edit-btn':
         row = table_data[active_cell['row']]
-        pub = mongodb_utils.get_publication_by_title(row['title'])  # Find publication by title
-        pub_id = str(pub["_id"]) if pub["_id"] else None
-        return {"display": "block"}, pub_id, pub["numCitations"]
+        selected = {"_id": row["_id"], "id": row.get("id"), "row": active_cell['row'], "numCitations": row["numCitations"]}
+        return {"display": "block"}, selected, row["numCitations"]
     
     # CASE 2: Save or Cancel clicked → Close the modal
     elif triggered_id in ["save-publication-btn", "cancel-edit-btn"]:
@@ -395,20 +722,47 @@ def control_modal(active_cell, save_clicks, cancel_clicks, table_data):
 
 
 # Save edits back to MongoDB
+def sync_mysql_citations(changed):
+    """Mirror applied citation edits into MySQL and the professor scores"""
+    for publication_id, citations in changed:
+        if publication_id is not None:
+            mysql_utils.update_publication_citations(publication_id, citations)
+
+if db_config.DATA_MODE != "snapshot":
+    mongodb_utils.citation_write_queue.on_applied = sync_mysql_citations
+
 @app.callback(
-    Output("publication-keyword-selector", "value", allow_duplicate=True),
+    Output("publication-table", "data", allow_duplicate=True),
     Input("save-publication-btn", "n_clicks"),
     State("selected-publication-id", "data"),
     State("edit-citations", "value"),
-    State("publication-keyword-selector", "value"),
-    prevent_initial_call="initial_duplicate"
+    State("queue-edits", "value"),
+    prevent_initial_call=True
 )
-def save_edits(n_clicks, pub_id, new_citations, current_keyword):
-    if pub_id and new_citations:
-        pub = mongodb_utils.get_publication_by_id(pub_id)
-        if new_citations != pub['numCitations']:
-            mongodb_utils.update_publication(pub_id, new_citations)
-    return current_keyword  # Return keyword again to refresh the table
+@instrument_callback
+def save_edits(n_clicks, selected, new_citations, queue_edits):
+    if not selected or new_citations is None or new_citations == selected["numCitations"]:
+        raise dash.exceptions.PreventUpdate
+
+    # Compare-and-set against the count the dialog was opened with
+    if "queue" in queue_edits:
+        saved = mongodb_utils.queue_citation_update(selected["_id"], new_citations,
+                                                    selected["numCitations"], selected["id"])
+    else:
+        saved = mongodb_utils.update_publication(selected["_id"], new_citations, selected["numCitations"])
+        if saved:
+            sync_mysql_citations([(selected["id"], new_citations)])
+    if not saved:
+        # Rejected or changed by someone else meanwhile: show what is stored now
+        pub = mongodb_utils.get_publication_by_id(selected["_id"])
+        if pub is None:
+            raise dash.exceptions.PreventUpdate
+        new_citations = pub["numCitations"]
+
+    # Only the edited cell is sent back to the browser
+    table = Patch()
+    table[selected["row"]]["numCitations"] = new_citations
+    return table
 
 # Callback to open the professor edit modal
 @app.callback(
@@ -421,6 +775,7 @@ def save_edits(n_clicks, pub_id, new_citations, current_keyword):
     [State("professor-keyword-selector", "value")],
     prevent_initial_call=True
 )
+@instrument_callback
 def open_professor_modal(edit_clicks, selected_keyword):
     ctx = dash.callback_context
     
@@ -467,6 +822,7 @@ def open_professor_modal(edit_clicks, selected_keyword):
      Input("cancel-professor-edit-btn", "n_clicks")],
     prevent_initial_call=True
 )
+@instrument_callback
 def close_professor_modal(save_clicks, cancel_clicks):
     ctx = dash.callback_context
     
@@ -492,6 +848,7 @@ def close_professor_modal(save_clicks, cancel_clicks):
      State("professor-keyword-selector", "value")],
     prevent_initial_call=True
 )
+@instrument_callback
 def save_professor_photo(n_clicks, professor_id, new_photo_url, current_keyword):
     # Prevent callback execution if the button hasn't been clicked
     if n_clicks is None or n_clicks <= 0:
@@ -508,5 +865,7 @@ def save_professor_photo(n_clicks, professor_id, new_photo_url, current_keyword)
     return current_keyword
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    # Warm up connections and schema in the background while the server starts
+    startup_utils.init_all_in_background()
+    app.run(debug=DEBUG)
     
\ No newline at end of file
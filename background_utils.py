@@ -0,0 +1,75 @@
+"""
+Background callbacks on an in-process thread pool.
+
+Dash's DiskcacheManager forks a process per job: the child inherits the
+pooled database clients, fills a result cache and metrics nobody reads, and
+every call pays for the spawn. ThreadPoolManager runs the jobs on a bounded
+thread pool inside the worker that received them instead, so they share its
+connections, result cache and metrics. Results, running flags and
+cancellations still go through the diskcache directory, so whichever worker
+the browser's next poll reaches can answer it.
+"""
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import dash
+
+# Threads per process running background jobs; further jobs wait in the queue
+BACKGROUND_WORKERS = int(os.environ.get("BACKGROUND_WORKERS", 4))
+
+# Running and cancelled flags outlive a worker that dies mid-job by this long at most
+JOB_FLAG_EXPIRE_SECONDS = 600
+
+
+class ThreadPoolManager(dash.DiskcacheManager):
+    """
+    A DiskcacheManager whose jobs are threads of this process rather than
+    child processes. Threads cannot be killed, so terminate_job cancels
+    cooperatively: a job that has not started is skipped, and the result of
+    one that is running is discarded. Either way the browser stops waiting
+    at once.
+    """
+
+    def __init__(self, cache, workers=BACKGROUND_WORKERS):
+        super().__init__(cache)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="background-callback")
+
+    @staticmethod
+    def _running_key(job):
+        return f"job-{job}-running"
+
+    @staticmethod
+    def _cancelled_key(job):
+        return f"job-{job}-cancelled"
+
+    def call_job_fn(self, key, job_fn, args, context):
+        job = uuid.uuid4().hex
+        self.handle.set(self._running_key(job), key, expire=JOB_FLAG_EXPIRE_SECONDS)
+        self._pool.submit(self._run, job, key, job_fn, args, context)
+        return job
+
+    def _run(self, job, key, job_fn, args, context):
+        try:
+            # Cancelled while queued, e.g. the input changed again: skip the query
+            if self.handle.get(self._cancelled_key(job)) is None:
+                job_fn(key, self._make_progress_key(key), args, context)
+                # Cancelled while running: nobody polls for this result, so let it
+                # expire (a later job with the same arguments may still read it)
+                if self.handle.get(self._cancelled_key(job)) is not None:
+                    self.handle.touch(key, expire=JOB_FLAG_EXPIRE_SECONDS)
+        finally:
+            self.handle.delete(self._running_key(job))
+
+    def job_running(self, job):
+        return job is not None and self.handle.get(self._running_key(job)) is not None
+
+    def terminate_job(self, job):
+        if job is None:
+            return
+        self.handle.set(self._cancelled_key(job), True, expire=JOB_FLAG_EXPIRE_SECONDS)
+        self.handle.delete(self._running_key(job))
+
+    def terminate_unhealthy_job(self, job):
+        # A job whose worker died loses its running flag when the flag expires
+        return False
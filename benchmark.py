@@ -0,0 +1,232 @@
+"""
+Data-layer benchmark: load the synthetic dataset at one or more scales into
+local stand-ins and time every public query function.
+
+    python benchmark.py --scales tiny,small --repeat 5 --output bench.json
+
+MySQL defaults to a SQLite file and MongoDB to mongomock (if installed);
+pass --mysql-url / --mongo-uri to use local servers instead. Neo4j has no
+embedded stand-in, so get_keyword_trend is only timed with --neo4j-uri.
+Every target database is dropped and reloaded, so never point these
+options at real data.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+
+import db_config
+import mongodb_utils
+import mysql_utils
+import neo4j_utils
+import synthetic_data
+from cache_utils import result_cache
+
+BENCH_DATABASE = "academicworld_bench"
+
+
+def _summary(samples_ms):
+    ordered = sorted(samples_ms)
+    return {
+        "mean": round(statistics.fmean(ordered), 3),
+        "p50": round(ordered[len(ordered) // 2], 3),
+        "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+        "min": round(ordered[0], 3),
+        "max": round(ordered[-1], 3),
+    }
+
+
+def _rows(result):
+    try:
+        return len(result)
+    except TypeError:
+        return None
+
+
+def time_call(func, args, repeat):
+    """Time `repeat` uncached calls and one cached call"""
+    cold = []
+    result = None
+    for _ in range(repeat):
+        result_cache.clear()
+        start = time.perf_counter()
+        result = func(*args)
+        cold.append((time.perf_counter() - start) * 1000)
+    start = time.perf_counter()
+    func(*args)
+    warm = (time.perf_counter() - start) * 1000
+    return {"cold_ms": _summary(cold), "warm_ms": round(warm, 3), "rows": _rows(result)}
+
+
+def sample_arguments(dataset):
+    """Representative inputs: the hottest keyword, a mid-popularity one and busy faculty"""
+    t = dataset["tables"]
+    names = dict(zip(t["keyword"]["id"], t["keyword"]["name"]))
+    by_popularity = t["publication_keyword"]["keyword_id"].value_counts().index.tolist()
+    busiest = t["faculty_publication"]["faculty_Id"].value_counts().index[:3].tolist()
+    faculty_names = dict(zip(t["faculty"]["id"], t["faculty"]["name"]))
+    return {
+        "hot_keyword": names[by_popularity[0]],
+        "mid_keyword": names[by_popularity[len(by_popularity) // 2]],
+        "trend_keywords": [names[k] for k in by_popularity[:10]],
+        "faculty_id": int(busiest[0]),
+        "faculty_names": ", ".join(faculty_names[f] for f in busiest),
+    }
+
+
+def benchmarks(args):
+    """(backend, function name, callable, arguments) for every public read"""
+    hot, mid = args["hot_keyword"], args["mid_keyword"]
+    return [
+        ("mysql", "mysql_utils.refresh_keyword_year_cube", mysql_utils.refresh_keyword_year_cube, ()),
+        ("mysql", "mysql_utils.get_top_keywords", mysql_utils.get_top_keywords, (50,)),
+        ("mysql", "mysql_utils.get_all_keywords", mysql_utils.get_all_keywords, ()),
+        ("mysql", "mysql_utils.search_keywords", mysql_utils.search_keywords, (hot[:3],)),
+        ("mysql", "mysql_utils.refresh_faculty_keyword_scores", mysql_utils.refresh_faculty_keyword_scores, ()),
+        ("mysql", "mysql_utils.get_top_faculty_by_keyword[hot]", mysql_utils.get_top_faculty_by_keyword, (hot,)),
+        ("mysql", "mysql_utils.get_top_faculty_by_keyword[mid]", mysql_utils.get_top_faculty_by_keyword, (mid,)),
+        ("mysql", "mysql_utils.get_top_faculty_by_keyword[hot,k=20]", mysql_utils.get_top_faculty_by_keyword, (hot, 20)),
+        ("mysql", "mysql_utils.get_faculty_by_id", mysql_utils.get_faculty_by_id, (args["faculty_id"],)),
+        ("mongo", "mongodb_utils.rebuild_keyword_catalogue", mongodb_utils.rebuild_keyword_catalogue, ()),
+        ("mongo", "mongodb_utils.rebuild_university_rollup", mongodb_utils.rebuild_university_rollup, ()),
+        ("mongo", "mongodb_utils.get_all_keywords", mongodb_utils.get_all_keywords, ()),
+        ("mongo", "mongodb_utils.get_keyword_counts", mongodb_utils.get_keyword_counts, ()),
+        ("mongo", "mongodb_utils.get_universities_by_keyword[hot]", mongodb_utils.get_universities_by_keyword, (hot,)),
+        ("mongo", "mongodb_utils.get_top_publications[hot]", mongodb_utils.get_top_publications, (hot,)),
+        ("mongo", "mongodb_utils.get_top_publications[hot,page 5]", mongodb_utils.get_top_publications, (hot, 5)),
+        ("mongo", "mongodb_utils.count_publications_by_keyword[hot]", mongodb_utils.count_publications_by_keyword, (hot,)),
+        ("mongo", "mongodb_utils.get_publications_for_faculty", mongodb_utils.get_publications_for_faculty, (args["faculty_names"],)),
+        ("neo4j", "neo4j_utils.rebuild_keyword_year_rollup", neo4j_utils.rebuild_keyword_year_rollup, ()),
+        ("neo4j", "neo4j_utils.get_keyword_trend[1]", neo4j_utils.get_keyword_trend, (args["trend_keywords"][:1],)),
+        ("neo4j", "neo4j_utils.get_keyword_trend[10]", neo4j_utils.get_keyword_trend, (args["trend_keywords"],)),
+    ]
+
+
+def connect_standins(options, workdir):
+    """Point the utils modules at the stand-in databases; returns the backends available"""
+    backends = {}
+
+    mysql_url = options.mysql_url or f"sqlite:///{os.path.join(workdir, 'academicworld.db')}"
+    mysql_utils.configure(mysql_url)
+    backends["mysql"] = mysql_url
+
+    if options.mongo_uri:
+        import pymongo
+        mongo_client = pymongo.MongoClient(options.mongo_uri)
+    else:
+        try:
+            import mongomock
+        except ImportError:
+            mongo_client = None
+        else:
+            mongo_client = mongomock.MongoClient()
+    if mongo_client is not None:
+        backends["mongo"] = options.mongo_uri or "mongomock"
+        backends["_mongo_client"] = mongo_client
+        backends["_mongo_database"] = options.mongo_database
+
+    if options.neo4j_uri:
+        neo4j_utils.configure(options.neo4j_uri, options.neo4j_user, options.neo4j_password, options.neo4j_database)
+        backends["neo4j"] = options.neo4j_uri
+    return backends
+
+
+def load_standins(dataset, backends):
+    """Load the dataset into every available stand-in, returning load times in seconds"""
+    load_seconds = {}
+
+    start = time.perf_counter()
+    synthetic_data.load_mysql(dataset, backends["mysql"])
+    mysql_utils.configure(backends["mysql"])
+    load_seconds["mysql"] = round(time.perf_counter() - start, 3)
+
+    if "mongo" in backends:
+        client = backends["_mongo_client"]
+        start = time.perf_counter()
+        database = backends["_mongo_database"]
+        synthetic_data.load_mongo(dataset, client[database])
+        mongodb_utils.configure(client, database)
+        load_seconds["mongo"] = round(time.perf_counter() - start, 3)
+
+    if "neo4j" in backends:
+        start = time.perf_counter()
+        synthetic_data.load_neo4j(dataset, neo4j_utils.get_driver(), neo4j_utils.database)
+        neo4j_utils.rebuild_keyword_year_rollup()
+        load_seconds["neo4j"] = round(time.perf_counter() - start, 3)
+    return load_seconds
+
+
+def run(options):
+    report = {
+        "meta": {
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": options.seed,
+            "repeat": options.repeat,
+        },
+        "scales": {},
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        backends = connect_standins(options, workdir)
+        report["meta"]["backends"] = {k: v for k, v in backends.items() if not k.startswith("_")}
+
+        for scale in options.scales.split(","):
+            dataset = synthetic_data.generate_dataset(scale, seed=options.seed)
+            load_seconds = load_standins(dataset, backends)
+            args = sample_arguments(dataset)
+
+            results = {}
+            for backend, name, func, call_args in benchmarks(args):
+                if backend not in backends:
+                    results[name] = {"backend": backend, "skipped": "no stand-in configured"}
+                else:
+                    try:
+                        results[name] = {"backend": backend, **time_call(func, call_args, options.repeat)}
+                    except Exception as e:
+                        results[name] = {"backend": backend, "error": repr(e)}
+                print(f"[{scale}] {name:<55} {_describe(results[name])}")
+
+            report["scales"][scale] = {
+                "sizes": dataset["sizes"],
+                "load_seconds": load_seconds,
+                "arguments": args,
+                "results": results,
+            }
+        mysql_utils.reset()
+    return report
+
+
+def _describe(result):
+    if "cold_ms" in result:
+        return f"p50 {result['cold_ms']['p50']:>10.3f} ms  cached {result['warm_ms']:>8.3f} ms"
+    return result.get("error") or f"skipped ({result['skipped']})"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", default="tiny,small",
+                        help=f"comma-separated scales from {', '.join(synthetic_data.SCALES)}")
+    parser.add_argument("--repeat", type=int, default=5, help="uncached calls per function")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_report.json", help="where to write the JSON report")
+    parser.add_argument("--mysql-url", help="SQLAlchemy URL of a scratch MySQL database (default: SQLite file)")
+    parser.add_argument("--mongo-uri", help="URI of a local mongod (default: mongomock)")
+    parser.add_argument("--mongo-database", default=BENCH_DATABASE)
+    parser.add_argument("--neo4j-uri", help="bolt URI of a scratch Neo4j server (its database is wiped)")
+    parser.add_argument("--neo4j-user", default=db_config.NEO4J_USER)
+    parser.add_argument("--neo4j-password", default=db_config.NEO4J_PASSWORD)
+    parser.add_argument("--neo4j-database", default="neo4j")
+    options = parser.parse_args(argv)
+
+    report = run(options)
+    with open(options.output, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"Wrote {options.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,346 @@
+"""
+Streaming bulk loader for MySQL, MongoDB and Neo4j.
+
+The source directory holds JSON lines (see synthetic_data.write_source):
+mysql/<table>.jsonl with one academicworld row per line, and
+mongo/<collection>.jsonl with one document per line as written by
+mongoexport. Documents without an _id get one derived from their integer
+id. Neo4j is loaded from the MySQL files.
+
+    python bulk_loader.py ./source --targets mysql,mongo,neo4j
+
+Files are read batch_size lines at a time. Batches go in as one
+executemany INSERT, one unordered insert_many or one UNWIND query. The
+three stores load at the same time. The MySQL and MongoDB indexes, and the
+tables and collections derived from the data, are built once the rows are
+in; a MongoDB database that already has a keyword catalogue has the new
+publications counted into it batch by batch instead. Progress is checkpointed after every batch; rerunning the same command
+resumes where it stopped. --fresh drops the existing data first and starts
+over; without it rows are only added.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bson import ObjectId, json_util
+
+import db_config
+
+BATCH_SIZE = 5000
+
+# Load order; link tables come after the rows they reference
+MYSQL_TABLES = ["university", "faculty", "keyword", "publication",
+                "publication_keyword", "faculty_publication", "faculty_keyword"]
+MONGO_COLLECTIONS = ["publications", "faculty"]
+
+# (source table, Cypher for one UNWIND batch of its rows). MERGE keeps a
+# replayed batch from creating duplicates after a resume
+NEO4J_STEPS = [
+    ("keyword", "UNWIND $rows AS r MERGE (k:KEYWORD {id: r.id}) SET k.name = r.name"),
+    ("publication", "UNWIND $rows AS r MERGE (p:PUBLICATION {id: r.ID}) "
+                    "SET p.title = r.title, p.venue = r.venue, p.year = r.year, p.numCitations = r.num_citations"),
+    ("university", "UNWIND $rows AS r MERGE (i:INSTITUTE {id: r.id}) SET i.name = r.name"),
+    ("faculty", "UNWIND $rows AS r MERGE (f:FACULTY {id: r.id}) SET f.name = r.name, f.position = r.position "
+                "WITH f, r MATCH (i:INSTITUTE {id: r.university_id}) MERGE (f)-[:AFFILIATION_WITH]->(i)"),
+    ("publication_keyword", "UNWIND $rows AS r MATCH (p:PUBLICATION {id: r.publication_id}), "
+                            "(k:KEYWORD {id: r.keyword_id}) MERGE (p)-[l:LABEL_BY]->(k) SET l.score = r.score"),
+    ("faculty_publication", "UNWIND $rows AS r MATCH (f:FACULTY {id: r.faculty_Id}), "
+                            "(p:PUBLICATION {id: r.publication_Id}) MERGE (f)-[:PUBLISH]->(p)"),
+    ("faculty_keyword", "UNWIND $rows AS r MATCH (f:FACULTY {id: r.faculty_id}), "
+                        "(k:KEYWORD {id: r.keyword_id}) MERGE (f)-[i:INTERESTED_IN]->(k) SET i.score = r.score"),
+]
+# Node keys are indexed before loading: every MERGE and MATCH above looks them up
+NEO4J_NODE_KEYS = [("KEYWORD", "id"), ("PUBLICATION", "id"), ("INSTITUTE", "id"), ("FACULTY", "id")]
+
+
+class Checkpoint:
+    """{step: lines loaded, or "done"} kept in a JSON file, rewritten atomically"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.state = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.state = json.load(f)
+
+    def lines_done(self, step):
+        value = self.state.get(step, 0)
+        return None if value == "done" else value
+
+    def is_done(self, step):
+        return self.state.get(step) == "done"
+
+    def update(self, step, value):
+        with self._lock:
+            self.state[step] = value
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(self.state, f, indent=1)
+            os.replace(tmp, self.path)
+
+    def reset(self):
+        with self._lock:
+            self.state = {}
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+
+def iter_batches(path, batch_size, skip=0, parse=json.loads):
+    """Yield (records, lines read so far) from a JSON-lines file, skipping the first `skip` lines"""
+    batch = []
+    line_number = 0
+    with open(path) as f:
+        for line in f:
+            line_number += 1
+            if line_number <= skip or not line.strip():
+                continue
+            batch.append(parse(line))
+            if len(batch) >= batch_size:
+                yield batch, line_number
+                batch = []
+    if batch:
+        yield batch, line_number
+
+
+class Report:
+    """Rows and seconds per step, printed as they finish"""
+
+    def __init__(self):
+        self.steps = {}
+        self._lock = threading.Lock()
+
+    def add(self, step, rows, seconds):
+        with self._lock:
+            self.steps[step] = {"rows": rows, "seconds": round(seconds, 3),
+                                "rows_per_second": round(rows / seconds) if seconds > 0 else None}
+        rate = f"{rows / seconds:>10.0f} rows/s" if seconds > 0 and rows else ""
+        print(f"[load] {step:<32} {rows:>10} rows {seconds:>8.2f}s {rate}")
+
+
+def load_file(step, path, write_batch, checkpoint, report, batch_size, parse=json.loads):
+    """Stream one source file through write_batch, checkpointing after every batch"""
+    skip = checkpoint.lines_done(step)
+    if skip is None:
+        print(f"[load] {step:<32} already loaded")
+        return
+    if not os.path.exists(path):
+        print(f"[load] {step:<32} skipped (no {path})")
+        return
+    start = time.perf_counter()
+    rows = 0
+    for records, lines in iter_batches(path, batch_size, skip, parse):
+        write_batch(records)
+        rows += len(records)
+        checkpoint.update(step, lines)
+    checkpoint.update(step, "done")
+    report.add(step, rows, time.perf_counter() - start)
+
+
+def run_step(step, func, checkpoint, report):
+    """Run a one-off step (index or rollup build) unless the checkpoint has it"""
+    if checkpoint.is_done(step):
+        return
+    start = time.perf_counter()
+    func()
+    checkpoint.update(step, "done")
+    report.add(step, 0, time.perf_counter() - start)
+
+
+# MySQL
+
+def load_mysql(source, url, checkpoint, report, batch_size=BATCH_SIZE, fresh=False):
+    import sqlalchemy as sa
+
+    import mysql_utils
+    from synthetic_data import mysql_metadata
+
+    engine = sa.create_engine(url)
+    metadata = mysql_metadata()
+    if fresh:
+        metadata.drop_all(engine)
+    # Primary keys only; secondary indexes are built after the load
+    metadata.create_all(engine)
+
+    for name in MYSQL_TABLES:
+        # IGNORE makes a batch replayed after a crash a no-op
+        insert = metadata.tables[name].insert().prefix_with("IGNORE", dialect="mysql") \
+            .prefix_with("OR IGNORE", dialect="sqlite")
+
+        def write_batch(records, insert=insert):
+            with engine.begin() as connection:
+                if connection.dialect.name == "mysql":
+                    connection.execute(sa.text("SET unique_checks = 0, foreign_key_checks = 0"))
+                connection.execute(insert, records)  # one executemany per batch
+
+        load_file(f"mysql:{name}", os.path.join(source, "mysql", f"{name}.jsonl"),
+                  write_batch, checkpoint, report, batch_size)
+    engine.dispose()
+
+    mysql_utils.configure(url)
+    run_step("mysql:indexes", lambda: mysql_utils.ensure_schema(mysql_utils.get_engine()), checkpoint, report)
+    run_step("mysql:faculty_keyword_score", mysql_utils.refresh_faculty_keyword_scores, checkpoint, report)
+    mysql_utils.invalidate_keyword_year_cube()
+
+
+# MongoDB
+
+def source_object_id(source_id):
+    """The ObjectId a document without one is stored under: its integer id, zero-padded"""
+    return ObjectId(f"{int(source_id):024x}")
+
+
+def load_mongo(source, client, database, checkpoint, report, batch_size=BATCH_SIZE, fresh=False):
+    import pymongo.errors
+
+    import mongodb_utils
+
+    db = client[database]
+    if fresh:
+        for name in MONGO_COLLECTIONS + [mongodb_utils.UNIVERSITY_ROLLUP, mongodb_utils.KEYWORD_CATALOGUE]:
+            db[name].drop()
+
+    # Adding to a database that already has a keyword catalogue (e.g. from
+    # another source directory): count the new publications into it instead
+    # of rebuilding it from every publication
+    adjust_catalogue = not fresh and db[mongodb_utils.KEYWORD_CATALOGUE].estimated_document_count() > 0
+    if adjust_catalogue:
+        mongodb_utils.configure(client, database)
+
+    for name in MONGO_COLLECTIONS:
+        def write_batch(docs, name=name, collection=db[name]):
+            for doc in docs:
+                # Without an _id in the source the server would pick a new one
+                # on every attempt, so a resumed batch would not be skipped
+                if "_id" not in doc and "id" in doc:
+                    doc["_id"] = source_object_id(doc["id"])
+            duplicates = set()
+            try:
+                collection.insert_many(docs, ordered=False)
+            except pymongo.errors.BulkWriteError as e:
+                # Duplicate _ids are documents a resumed batch already wrote
+                if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+                    raise
+                duplicates = {error["index"] for error in e.details["writeErrors"]}
+            if adjust_catalogue and name == "publications":
+                added = [keyword for i, doc in enumerate(docs) if i not in duplicates
+                         for keyword in {kw["name"] for kw in doc.get("keywords", [])}]
+                mongodb_utils.adjust_keyword_catalogue(added=added)
+
+        load_file(f"mongo:{name}", os.path.join(source, "mongo", f"{name}.jsonl"),
+                  write_batch, checkpoint, report, batch_size, parse=json_util.loads)
+
+    run_step("mongo:indexes", lambda: mongodb_utils.ensure_indexes(db), checkpoint, report)
+    mongodb_utils.configure(client, database)
+    if not adjust_catalogue:
+        run_step("mongo:keyword_catalogue", mongodb_utils.rebuild_keyword_catalogue, checkpoint, report)
+    run_step("mongo:university_rollup", mongodb_utils.rebuild_university_rollup, checkpoint, report)
+
+
+# Neo4j
+
+def load_neo4j(source, driver, database, checkpoint, report, batch_size=BATCH_SIZE, fresh=False):
+    """
+    Load the graph through `driver`, then build the keyword-year rollup.
+    neo4j_utils must be configured for the same server; its own schema is
+    created when it connects.
+    """
+    import neo4j_utils
+
+    with driver.session(database=database) as session:
+        if fresh:
+            session.run("MATCH (n) CALL { WITH n DETACH DELETE n } IN TRANSACTIONS OF 10000 ROWS").consume()
+        for label, key in NEO4J_NODE_KEYS:
+            session.run(f"CREATE INDEX {label.lower()}_{key} IF NOT EXISTS FOR (n:{label}) ON (n.{key})").consume()
+        session.run("CALL db.awaitIndexes()").consume()
+
+        for name, query in NEO4J_STEPS:
+            def write_batch(rows, query=query):
+                session.run(query, rows=rows).consume()
+
+            load_file(f"neo4j:{name}", os.path.join(source, "mysql", f"{name}.jsonl"),
+                      write_batch, checkpoint, report, batch_size)
+
+    run_step("neo4j:keyword_year_rollup", neo4j_utils.rebuild_keyword_year_rollup, checkpoint, report)
+
+
+def run(options):
+    fresh = options.fresh
+    if fresh:
+        options.checkpoint.reset()
+    elif options.checkpoint.state:
+        print(f"Resuming from {options.checkpoint.path}")
+
+    report = Report()
+    jobs = {}
+    if "mysql" in options.targets:
+        jobs["mysql"] = lambda: load_mysql(options.source, options.mysql_url, options.checkpoint, report,
+                                           options.batch_size, fresh)
+    if "mongo" in options.targets:
+        def mongo_job():
+            import pymongo
+            client = pymongo.MongoClient(options.mongo_uri)
+            load_mongo(options.source, client, options.mongo_database, options.checkpoint, report,
+                       options.batch_size, fresh)
+        jobs["mongo"] = mongo_job
+    if "neo4j" in options.targets:
+        def neo4j_job():
+            import neo4j_utils
+            neo4j_utils.configure(options.neo4j_uri, options.neo4j_user, options.neo4j_password,
+                                  options.neo4j_database)
+            load_neo4j(options.source, neo4j_utils.get_driver(), options.neo4j_database, options.checkpoint, report,
+                       options.batch_size, fresh)
+        jobs["neo4j"] = neo4j_job
+
+    # The stores are independent, so they load at the same time
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(jobs) or 1) as pool:
+        futures = {name: pool.submit(job) for name, job in jobs.items()}
+    failed = {}
+    for name, future in futures.items():
+        if future.exception() is not None:
+            failed[name] = repr(future.exception())
+            print(f"[load] {name} failed: {future.exception()} (rerun to resume)")
+    elapsed = time.perf_counter() - start
+
+    rows = sum(step["rows"] for step in report.steps.values())
+    print(f"[load] total {rows} rows in {elapsed:.1f}s ({rows / elapsed if elapsed else 0:.0f} rows/s)")
+    return {"seconds": round(elapsed, 3), "rows": rows, "steps": report.steps, "failed": failed}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("source", help="directory with mysql/*.jsonl and mongo/*.jsonl")
+    parser.add_argument("--targets", default="mysql,mongo,neo4j", help="comma-separated stores to load")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--checkpoint", help="checkpoint file (default: SOURCE/.load_checkpoint.json)")
+    parser.add_argument("--fresh", action="store_true", help="drop existing data and ignore the checkpoint")
+    parser.add_argument("--report", help="also write the throughput report to this JSON file")
+    parser.add_argument("--mysql-url", default=None, help="SQLAlchemy URL (default: from db_config)")
+    parser.add_argument("--mongo-uri", default=db_config.MONGO_URI)
+    parser.add_argument("--mongo-database", default=db_config.MONGO_DATABASE)
+    parser.add_argument("--neo4j-uri", default=db_config.NEO4J_URI)
+    parser.add_argument("--neo4j-user", default=db_config.NEO4J_USER)
+    parser.add_argument("--neo4j-password", default=db_config.NEO4J_PASSWORD)
+    parser.add_argument("--neo4j-database", default=db_config.NEO4J_DATABASE)
+    options = parser.parse_args(argv)
+
+    if options.mysql_url is None:
+        import mysql_utils
+        options.mysql_url = mysql_utils.connection_string
+    options.targets = options.targets.split(",")
+    checkpoint_path = options.checkpoint or os.path.join(options.source, ".load_checkpoint.json")
+    options.checkpoint = Checkpoint(checkpoint_path)
+
+    result = run(options)
+    if options.report:
+        with open(options.report, "w") as f:
+            json.dump(result, f, indent=2)
+    return 1 if result["failed"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
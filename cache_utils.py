@@ -0,0 +1,267 @@
+import functools
+import inspect
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Default bounds for the shared result cache
+CACHE_MAX_ENTRIES = 1024
+CACHE_TTL_SECONDS = 300
+
+# Invalidations are shared through this directory with every process on the
+# host (e.g. gunicorn workers) when diskcache is installed
+GENERATION_DIR = os.environ.get("RESULT_CACHE_DIR", "./.result-cache")
+
+
+def _freeze(value):
+    """Turn lists/dicts/sets into hashable equivalents for use in cache keys"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(v) for v in value)
+    return value
+
+
+class Generations:
+    """
+    Invalidation counter shared between processes.
+
+    Every invalidation takes the next generation and stamps it on the
+    invalidated tags. A value computed from a start at generation g is stale
+    once one of its tags carries a stamp above g, whichever process stamped it.
+    Without a directory (or without diskcache) the counter is per process.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self._stamps = {}  # used without diskcache: "generation" or tag -> stamp
+        self._lock = threading.Lock()
+        self._store = None
+        self._pid = None
+
+    def _shared(self):
+        if self.directory is None:
+            return None
+        # SQLite connections must not cross a fork, so each process opens its own
+        if self._pid != os.getpid():
+            try:
+                import diskcache
+            except ImportError:
+                self.directory = None
+                return None
+            self._store = diskcache.Cache(self.directory, eviction_policy="none")
+            self._pid = os.getpid()
+        return self._store
+
+    def current(self):
+        store = self._shared()
+        if store is None:
+            with self._lock:
+                return self._stamps.get("generation", 0)
+        return store.get("generation", 0)
+
+    def latest(self, tags):
+        """The highest stamp on any of the tags (0 if none was invalidated)"""
+        store = self._shared()
+        if store is None:
+            with self._lock:
+                return max((self._stamps.get(("tag", tag), 0) for tag in tags), default=0)
+        return max((store.get(("tag", tag), 0) for tag in tags), default=0)
+
+    def stamp(self, tags):
+        """Take the next generation and stamp it on every tag"""
+        store = self._shared()
+        if store is None:
+            with self._lock:
+                generation = self._stamps["generation"] = self._stamps.get("generation", 0) + 1
+                for tag in tags:
+                    self._stamps[("tag", tag)] = generation
+            return generation
+        with store.transact():
+            generation = store.incr("generation")
+            for tag in tags:
+                store.set(("tag", tag), generation)
+        return generation
+
+
+def _function_tag(key):
+    # Keys of @cached entries start with the function's module and qualname
+    return ("function",) + tuple(key[:2]) if isinstance(key, tuple) else None
+
+
+class ResultCache:
+    """
+    Size-bounded LRU cache with per-entry TTL and tag-based invalidation.
+
+    Each entry can carry tags such as ("faculty", 42); invalidate_tags drops
+    every entry that depends on one of the given tags. With `generations`,
+    invalidations reach the caches of other processes too: an entry is
+    checked against the tag stamps on read, and a value whose computation
+    started before an invalidation of its tags is never stored.
+    """
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS, generations=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.generations = generations
+        self._entries = OrderedDict()  # key -> (expires_at, value, tags, generation)
+        self._tag_index = {}  # tag -> set of keys
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """Returns (found, value)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            expires_at, value, tags, generation = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                self._remove(key)
+                self.evictions += 1
+                self.misses += 1
+                return False, None
+            if self.generations is not None:
+                # Usually nothing was invalidated since the entry was checked last
+                current = self.generations.current()
+                if current != generation:
+                    if self.generations.latest(tags) > generation:
+                        self._remove(key)
+                        self.invalidations += 1
+                        self.misses += 1
+                        return False, None
+                    self._entries[key] = (expires_at, value, tags, current)
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, value
+
+    def generation(self):
+        """Read before computing a value and pass to set(), so a late write cannot undo an invalidation"""
+        return self.generations.current() if self.generations is not None else 0
+
+    def set(self, key, value, tags=(), ttl=None, generation=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        tags = frozenset(tags) | {_function_tag(key)} - {None}
+        if self.generations is not None:
+            if generation is None:
+                generation = self.generations.current()
+            elif self.generations.latest(tags) > generation:
+                # Invalidated while the value was being computed
+                return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires_at, value, tags, generation)
+            for tag in tags:
+                self._tag_index.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate_tags(self, *tags):
+        """Drop every entry tagged with any of the given tags"""
+        if self.generations is not None and tags:
+            self.generations.stamp(tags)
+        with self._lock:
+            keys = set()
+            for tag in tags:
+                keys |= self._tag_index.get(tag, set())
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def invalidate_function(self, func):
+        """Drop every entry produced by the given cached function"""
+        prefix = (func.__module__, func.__qualname__)
+        if self.generations is not None:
+            self.generations.stamp([("function",) + prefix])
+        with self._lock:
+            keys = [k for k in self._entries if k[:2] == prefix]
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tag_index.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def _remove(self, key):
+        _, _, tags, _ = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tag_index.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_index[tag]
+
+
+# Shared by mysql_utils, mongodb_utils and neo4j_utils
+result_cache = ResultCache(generations=Generations(GENERATION_DIR))
+
+
+def cached(tags=None, ttl=None, cache=None):
+    """
+    Cache a read function's result keyed on the function and its arguments.
+
+    Args:
+        tags (callable): optional f(arguments, result) returning the tags the
+            entry depends on; arguments is a dict of the bound call arguments
+        ttl (float): seconds before the entry expires (defaults to the cache TTL)
+        cache (ResultCache): cache to store into (defaults to result_cache)
+
+    Cached values are shared between callers and must be treated as read-only.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            store = result_cache if cache is None else cache
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = (func.__module__, func.__qualname__, _freeze(bound.arguments))
+
+            found, value = store.get(key)
+            if found:
+                return value
+            generation = store.generation()
+            value = func(*args, **kwargs)
+            entry_tags = tags(bound.arguments, value) if tags else ()
+            store.set(key, value, entry_tags, ttl, generation)
+            return value
+
+        return wrapper
+    return decorator
+
+
+def invalidate_tags(*tags):
+    return result_cache.invalidate_tags(*tags)
+
+
+def cache_stats():
+    return result_cache.stats()
@@ -0,0 +1,40 @@
+import os
+
+# Connection and pool settings for all three databases. Replace the defaults
+# with your credentials or override them with environment variables.
+
+# MySQL. MYSQL_URL, when set, is used as the full SQLAlchemy URL instead
+# (e.g. sqlite:///academicworld.db for a local stand-in)
+MYSQL_URL = os.environ.get("MYSQL_URL")
+MYSQL_HOST = os.environ.get("MYSQL_HOST", "localhost")
+MYSQL_PORT = int(os.environ.get("MYSQL_PORT", 3306))
+MYSQL_USER = os.environ.get("MYSQL_USER", "root")
+MYSQL_PASSWORD = os.environ.get("MYSQL_PASSWORD", "test_root")
+MYSQL_DATABASE = os.environ.get("MYSQL_DATABASE", "academicworld")
+
+MYSQL_POOL_SIZE = int(os.environ.get("MYSQL_POOL_SIZE", 10))
+MYSQL_MAX_OVERFLOW = int(os.environ.get("MYSQL_MAX_OVERFLOW", 20))
+MYSQL_POOL_TIMEOUT = float(os.environ.get("MYSQL_POOL_TIMEOUT", 30))  # seconds to wait for a free connection
+MYSQL_POOL_RECYCLE = int(os.environ.get("MYSQL_POOL_RECYCLE", 1800))  # seconds before a connection is replaced
+MYSQL_POOL_PRE_PING = os.environ.get("MYSQL_POOL_PRE_PING", "1") == "1"
+
+# MongoDB
+MONGO_URI = os.environ.get("MONGO_URI", "mongodb://localhost:27017/")
+MONGO_DATABASE = os.environ.get("MONGO_DATABASE", "academicworld")
+MONGO_MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL_SIZE", 50))
+MONGO_MIN_POOL_SIZE = int(os.environ.get("MONGO_MIN_POOL_SIZE", 0))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get("MONGO_WAIT_QUEUE_TIMEOUT_MS", 30000))
+
+# Neo4j
+NEO4J_URI = os.environ.get("NEO4J_URI", "bolt://localhost:7687")
+NEO4J_USER = os.environ.get("NEO4J_USER", "neo4j")
+NEO4J_PASSWORD = os.environ.get("NEO4J_PASSWORD", "123456789")
+NEO4J_DATABASE = os.environ.get("NEO4J_DATABASE", "academicworld")
+NEO4J_MAX_POOL_SIZE = int(os.environ.get("NEO4J_MAX_POOL_SIZE", 50))
+NEO4J_ACQUISITION_TIMEOUT = float(os.environ.get("NEO4J_ACQUISITION_TIMEOUT", 60))  # seconds
+
+# Data source: "live" queries the three databases above, "snapshot" answers
+# every dashboard query read-only from the Parquet files in SNAPSHOT_DIR
+# (written by `python snapshot_utils.py export`)
+DATA_MODE = os.environ.get("DATA_MODE", "live")
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", "snapshot")
@@ -0,0 +1,150 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import plotly.graph_objects as go
+from plotly.colors import qualitative
+
+# Seconds between checks for new data; a check that finds none costs no query (0 disables them)
+FIGURE_REFRESH_SECONDS = float(os.environ.get("FIGURE_REFRESH_SECONDS", 60))
+
+# Largest bubble diameter in pixels
+BUBBLE_SIZE_MAX = 60
+
+
+class FigureStore:
+    """
+    Ready-to-return bubble chart figures per year range.
+
+    One top-`max_top_n` query per year range is rendered once, one
+    go.Scatter trace per keyword with the size scale set by the largest
+    bubble. Every smaller top-N is a prefix of that ranking, so the figure
+    for top-N is the first N traces plus a new title. Figures are kept as
+    plain JSON dicts for the `max_ranges` most recent year ranges; requests
+    for a range that is being rendered wait for that render.
+    """
+
+    def __init__(self, load_top_keywords, refresh_data=None, max_top_n=50, max_ranges=64,
+                 refresh_seconds=FIGURE_REFRESH_SECONDS):
+        self.load_top_keywords = load_top_keywords  # (top_n, start_year, end_year) -> DataFrame
+        self.refresh_data = refresh_data  # reloads the underlying data if it changed; returns whether it did
+        self.max_top_n = max_top_n
+        self.max_ranges = max_ranges
+        self.refresh_seconds = refresh_seconds
+        self._ranges = OrderedDict()  # (start_year, end_year) -> {"base": figure, top_n: figure}
+        self._rendering = {}  # (start_year, end_year) -> Future of the entry being rendered
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _render(self, start_year, end_year):
+        df = self.load_top_keywords(self.max_top_n, start_year, end_year)
+        largest = df['popularity'].max() if len(df) else 1
+        colors = qualitative.Plotly
+        fig = go.Figure([
+            go.Scatter(
+                x=[keyword], y=[popularity], name=keyword, legendgroup=keyword, mode='markers',
+                marker={'size': [popularity], 'sizemode': 'area', 'sizeref': 2 * largest / BUBBLE_SIZE_MAX ** 2,
+                        'color': colors[i % len(colors)]},
+                hovertemplate='keyword=%{x}<br>popularity=%{y}<extra></extra>'
+            )
+            for i, (keyword, popularity) in enumerate(zip(df['keyword'], df['popularity']))
+        ])
+        fig.update_layout(xaxis_title='keyword', yaxis_title='popularity', legend_title_text='keyword',
+                          xaxis_tickangle=45)
+        # Plain lists and dicts serialize much faster than a Figure with numpy arrays
+        return {"base": json.loads(fig.to_json())}
+
+    def _derive(self, base, top_n, start_year, end_year):
+        layout = dict(base["layout"])
+        layout["title"] = {**layout.get("title", {}), "text": f'Top {top_n} Keywords ({start_year}-{end_year})'}
+        return {"data": base["data"][:top_n], "layout": layout}
+
+    def get(self, top_n, start_year, end_year):
+        """The figure for the top_n keywords of the year range, rendering the range if needed"""
+        entry = self._entry((start_year, end_year))
+        figure = entry.get(top_n)
+        if figure is None:
+            figure = entry[top_n] = self._derive(entry["base"], min(top_n, self.max_top_n), start_year, end_year)
+        return figure
+
+    def _entry(self, key):
+        with self._lock:
+            entry = self._ranges.get(key)
+            if entry is not None:
+                self._ranges.move_to_end(key)
+                return entry
+            rendering = self._rendering.get(key)
+            waiting = rendering is not None
+            if not waiting:
+                rendering = self._rendering[key] = Future()
+        if waiting:
+            return rendering.result()
+
+        try:
+            entry = self._render(*key)
+        except BaseException as e:
+            with self._lock:
+                del self._rendering[key]
+            rendering.set_exception(e)
+            raise
+        with self._lock:
+            del self._rendering[key]
+            self._insert(key, entry)
+        rendering.set_result(entry)
+        return entry
+
+    def _insert(self, key, entry):
+        self._ranges[key] = entry
+        self._ranges.move_to_end(key)
+        while len(self._ranges) > self.max_ranges:
+            self._ranges.popitem(last=False)
+
+    def warm(self, ranges, top_ns=()):
+        """Render the given year ranges and derive the given top-N figures ahead of time"""
+        for start_year, end_year in ranges:
+            for top_n in top_ns:
+                self.get(top_n, start_year, end_year)
+            if not top_ns:
+                self.get(self.max_top_n, start_year, end_year)
+
+    def refresh(self):
+        """Re-render every stored year range if refresh_data reports new data"""
+        if self.refresh_data is None or not self.refresh_data():
+            return False
+        with self._lock:
+            keys = list(self._ranges)
+        for key in keys:
+            entry = self._render(*key)
+            with self._lock:
+                # Ranges evicted meanwhile stay evicted
+                if key in self._ranges:
+                    self._ranges[key] = entry
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._ranges.clear()
+
+    def start(self, initial_ranges=None, top_ns=()):
+        """
+        Warm up on a daemon thread, then check for new data every refresh_seconds.
+        `initial_ranges` is a callable returning the year ranges to warm.
+        """
+        def run():
+            try:
+                self.warm(initial_ranges() if initial_ranges else [], top_ns)
+            except Exception as e:
+                print(f"Figure store warm-up failed: {e}")
+            while self.refresh_seconds:
+                time.sleep(self.refresh_seconds)
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f"Figure store refresh failed: {e}")
+
+        self._thread = threading.Thread(target=run, name="figure-store", daemon=True)
+        self._thread.start()
+        return self._thread
@@ -0,0 +1,23 @@
+import os
+
+import startup_utils
+
+bind = os.environ.get("BIND", "0.0.0.0:8050")
+# WEB_CONCURRENCY overrides the (2 x cores) + 1 recommendation
+workers = int(os.environ.get("WEB_CONCURRENCY", startup_utils.recommended_worker_count()))
+threads = int(os.environ.get("WORKER_THREADS", 4))
+timeout = int(os.environ.get("WORKER_TIMEOUT", 120))
+
+# Import the app once in the master so workers fork with it already loaded
+preload_app = True
+
+
+def when_ready(server):
+    server.log.info("Serving with %s workers x %s threads", workers, threads)
+
+
+def post_fork(server, worker):
+    # Connections must never be shared across processes: drop anything
+    # inherited from the master and warm up this worker's own connections
+    startup_utils.reset_all()
+    startup_utils.init_all_in_background()
@@ -0,0 +1,93 @@
+import gzip
+import hashlib
+import os
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# Responses smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", 1024))
+# Encodings to offer, in order of preference ("br" is skipped without the brotli package)
+COMPRESS_ENCODINGS = [e.strip() for e in os.environ.get("COMPRESS_ENCODINGS", "br,gzip").split(",") if e.strip()]
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.environ.get("BROTLI_QUALITY", 5))
+# max-age for assets; Dash adds ?m=<mtime> to asset URLs, so a changed file gets a new URL
+ASSET_MAX_AGE = int(os.environ.get("ASSET_MAX_AGE", 86400))
+
+
+def _compress(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+
+def choose_encoding(accept_encoding):
+    """The first configured encoding the client accepts, or None"""
+    accepted = {part.split(";")[0].strip() for part in (accept_encoding or "").lower().split(",")}
+    for encoding in COMPRESS_ENCODINGS:
+        if encoding == "br" and brotli is None:
+            continue
+        if encoding in accepted:
+            return encoding
+    return None
+
+
+def register_http_optimizations(app):
+    """
+    Compress the Dash layout and callback responses and make the layout and
+    assets cacheable.
+
+    - _dash-layout and _dash-update-component bodies of at least
+      COMPRESS_MIN_BYTES are sent with brotli or gzip, whichever the client
+      accepts first from COMPRESS_ENCODINGS.
+    - The layout and assets get an ETag so a repeat load is a 304. Assets
+      are also cached for ASSET_MAX_AGE seconds; the layout is revalidated
+      every time.
+    - Bytes before and after compression are counted per route in
+      metrics_utils.
+    """
+    from flask import request
+
+    import metrics_utils
+
+    prefix = app.config.routes_pathname_prefix
+    layout_path = f"{prefix}_dash-layout"
+    compressed_paths = {layout_path, f"{prefix}_dash-update-component"}
+    assets_prefix = f"{prefix}{app.config.assets_url_path.strip('/')}/"
+
+    @app.server.after_request
+    def optimize_response(response):
+        path = request.path
+        if path.startswith(assets_prefix):
+            # Flask's send_file already sets the ETag and answers conditional requests
+            response.headers["Cache-Control"] = f"public, max-age={ASSET_MAX_AGE}"
+            return response
+        if path not in compressed_paths or response.status_code != 200 or response.direct_passthrough:
+            return response
+
+        encoding = None
+        if "Content-Encoding" not in response.headers:
+            response.headers.add("Vary", "Accept-Encoding")
+            encoding = choose_encoding(request.headers.get("Accept-Encoding"))
+        body = response.get_data()
+
+        if path == layout_path:
+            # Strong ETag per representation, so gzip and brotli copies differ
+            response.set_etag(hashlib.sha1(body).hexdigest() + (f"-{encoding}" if encoding else ""))
+            response.headers["Cache-Control"] = "no-cache"
+            response.make_conditional(request)
+            if response.status_code == 304:
+                metrics_utils.record_bytes(path, len(body), 0)
+                return response
+
+        sent = body
+        if encoding and len(body) >= COMPRESS_MIN_BYTES:
+            sent = _compress(body, encoding)
+            response.set_data(sent)
+            response.headers["Content-Encoding"] = encoding
+        metrics_utils.record_bytes(path, len(body), len(sent))
+        return response
+
+    return optimize_response
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+
+class KeywordYearCube:
+    """
+    In-memory keyword x year publication counts with prefix sums over years,
+    so "top N keywords between year A and year B" is a vectorized subtraction
+    instead of a join over publication_keyword.
+    """
+
+    def __init__(self, counts_df):
+        """
+        Args:
+            counts_df (pandas.DataFrame): rows of [keyword, year, publication_count]
+        """
+        df = counts_df.copy()
+        df['year'] = pd.to_numeric(df['year'], errors='coerce')
+        df = df.dropna(subset=['year'])
+        df['year'] = df['year'].astype(int)
+
+        self.keywords = np.array(sorted(df['keyword'].unique()), dtype=object)
+        if df.empty:
+            self.min_year = self.max_year = None
+            self.prefix = np.zeros((0, 1), dtype=np.int64)
+            return
+
+        self.min_year = int(df['year'].min())
+        self.max_year = int(df['year'].max())
+
+        rows = np.searchsorted(self.keywords, df['keyword'].to_numpy())
+        cols = df['year'].to_numpy() - self.min_year
+        counts = np.zeros((len(self.keywords), self.max_year - self.min_year + 1), dtype=np.int64)
+        np.add.at(counts, (rows, cols), df['publication_count'].to_numpy(dtype=np.int64))
+
+        # prefix[:, j] holds the count for every year before min_year + j
+        self.prefix = np.zeros((counts.shape[0], counts.shape[1] + 1), dtype=np.int64)
+        np.cumsum(counts, axis=1, out=self.prefix[:, 1:])
+
+    def range_counts(self, start_year=None, end_year=None):
+        """Publication count per keyword for start_year <= year <= end_year"""
+        if self.min_year is None:
+            return np.zeros(len(self.keywords), dtype=np.int64)
+        start = self.min_year if start_year is None else max(int(start_year), self.min_year)
+        end = self.max_year if end_year is None else min(int(end_year), self.max_year)
+        if start > end:
+            return np.zeros(len(self.keywords), dtype=np.int64)
+        return self.prefix[:, end - self.min_year + 1] - self.prefix[:, start - self.min_year]
+
+    def top_keywords(self, top_n=5, start_year=None, end_year=None):
+        """
+        Returns:
+            pandas.DataFrame: DataFrame with columns [keyword, popularity]
+        """
+        totals = self.range_counts(start_year, end_year)
+        top_n = min(int(top_n), len(totals))
+        if top_n <= 0:
+            return pd.DataFrame({'keyword': [], 'popularity': []})
+
+        # Partial select the candidates, then order them by count (ties by name)
+        candidates = np.argpartition(-totals, top_n - 1)[:top_n]
+        order = np.lexsort((self.keywords[candidates], -totals[candidates]))
+        picked = candidates[order]
+        picked = picked[totals[picked] > 0]
+        return pd.DataFrame({
+            'keyword': self.keywords[picked].tolist(),
+            'popularity': totals[picked]
+        })
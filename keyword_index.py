@@ -0,0 +1,42 @@
+from bisect import bisect_left
+
+
+class KeywordIndex:
+    """
+    Prefix/substring search over keyword names.
+
+    Names are kept in a sorted, lower-cased array so prefix matches are a
+    bisect range; substring matches fill any remaining slots.
+    """
+
+    def __init__(self, names):
+        unique = sorted(set(n for n in names if n), key=str.lower)
+        self._names = unique
+        self._folded = [n.lower() for n in unique]
+
+    def __len__(self):
+        return len(self._names)
+
+    def search(self, text, limit=20):
+        """Return up to `limit` names, prefix matches first, then substring matches"""
+        query = (text or '').strip().lower()
+        if not query:
+            return self._names[:limit]
+
+        start = bisect_left(self._folded, query)
+        matches = []
+        i = start
+        while i < len(self._folded) and len(matches) < limit and self._folded[i].startswith(query):
+            matches.append(self._names[i])
+            i += 1
+        prefix_end = i
+
+        if len(matches) < limit:
+            for j, folded in enumerate(self._folded):
+                if start <= j < prefix_end:
+                    continue
+                if query in folded:
+                    matches.append(self._names[j])
+                    if len(matches) >= limit:
+                        break
+        return matches
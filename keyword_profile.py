@@ -0,0 +1,83 @@
+"""
+Everything the dashboard shows about one keyword, fetched from MySQL,
+MongoDB and Neo4j at the same time.
+
+get_keyword_profile() submits one query per widget to a shared thread pool
+and waits for each only until its backend's timeout, so the wall-clock time
+is that of the slowest backend rather than the sum of all of them. Parts
+that fail or time out are left as None with the reason in "errors"; the
+rest of the profile is still returned.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import db_config
+from metrics_utils import instrument
+
+# Seconds to wait for each backend's part of a profile
+PROFILE_TIMEOUTS = {
+    "mysql": float(os.environ.get("PROFILE_TIMEOUT_MYSQL", 5)),
+    "mongo": float(os.environ.get("PROFILE_TIMEOUT_MONGO", 5)),
+    "neo4j": float(os.environ.get("PROFILE_TIMEOUT_NEO4J", 5)),
+}
+
+# Shared by all profiles; a timed-out query keeps its thread until it returns
+_executor = ThreadPoolExecutor(max_workers=int(os.environ.get("PROFILE_WORKERS", 16)),
+                               thread_name_prefix="keyword-profile")
+
+
+def _sources():
+    """(mysql, mongo, neo4j) query modules for the configured DATA_MODE"""
+    if db_config.DATA_MODE == "snapshot":
+        import snapshot_utils
+        return snapshot_utils, snapshot_utils, snapshot_utils
+    import mongodb_utils
+    import mysql_utils
+    import neo4j_utils
+    return mysql_utils, mongodb_utils, neo4j_utils
+
+
+def _parts(keyword, top_faculty, page_size):
+    """(part name, backend, function, arguments) for every widget"""
+    mysql, mongo, neo4j = _sources()
+    return [
+        ("faculty", "mysql", mysql.get_top_faculty_by_keyword, (keyword, top_faculty)),
+        ("publications", "mongo", mongo.get_top_publications, (keyword, 0, page_size)),
+        ("publication_count", "mongo", mongo.count_publications_by_keyword, (keyword,)),
+        ("universities", "mongo", mongo.get_universities_by_keyword, (keyword,)),
+        ("trend", "neo4j", neo4j.get_keyword_series, ([keyword],)),
+    ]
+
+
+@instrument("profile")
+def get_keyword_profile(keyword, top_faculty=5, page_size=10, timeouts=None):
+    """
+    Returns {"keyword", "faculty", "publications", "publication_count",
+    "universities", "trend" ({keyword: series}), "errors": {part: reason},
+    "ms": {part: elapsed}}
+    """
+    timeouts = {**PROFILE_TIMEOUTS, **(timeouts or {})}
+    start = time.perf_counter()
+
+    def timed(func, args):
+        result = func(*args)
+        return result, (time.perf_counter() - start) * 1000
+
+    futures = [(name, backend, _executor.submit(timed, func, args))
+               for name, backend, func, args in _parts(keyword, top_faculty, page_size)]
+
+    profile = {"keyword": keyword, "errors": {}, "ms": {}}
+    for name, backend, future in futures:
+        # Each part gets its backend's timeout counted from the common start
+        remaining = max(0.0, start + timeouts[backend] - time.perf_counter())
+        try:
+            profile[name], profile["ms"][name] = future.result(timeout=remaining)
+        except TimeoutError:
+            future.cancel()
+            profile[name] = None
+            profile["errors"][name] = f"{backend} timed out after {timeouts[backend]:g}s"
+        except Exception as e:
+            profile[name] = None
+            profile["errors"][name] = f"{backend}: {e}"
+    return profile
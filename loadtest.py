@@ -0,0 +1,481 @@
+"""
+End-to-end load test of the Dash callback endpoint.
+
+Every virtual user replays browsing sessions against _dash-update-component
+the way the browser does: load the page, move the bubble chart sliders,
+pick trend and focus keywords, page through publications, open professor
+cards, run university and faculty searches and edit a citation count,
+pausing about --think-time seconds between steps. Background callbacks are
+polled until they finish, so their latency is what the user waits for.
+
+    python loadtest.py --users 20 --duration 60 --output loadtest.json
+    python loadtest.py --url http://localhost:8050 --users 50 --think-time 2
+
+Without --url the app is served in-process on a free local port against the
+stand-ins of benchmark.py (the synthetic dataset in a SQLite file and
+mongomock), so no network is needed. The trend chart and focus keyword need
+Neo4j and are skipped unless --neo4j-uri is given; with DATA_MODE=snapshot
+the app reads SNAPSHOT_DIR instead and every step runs. Edits are only sent
+to a --url server with --allow-writes.
+
+Exits non-zero when --max-error-rate or --max-p95-ms is exceeded, so it can
+gate CI. The thresholds only cover the steps that ran: on the default
+stand-ins the trend chart (and so its incremental Patch updates) and the
+focus keyword are not exercised, so a CI gate needs --neo4j-uri or
+DATA_MODE=snapshot to cover them.
+"""
+import argparse
+import json
+import logging
+import platform
+import random
+import re
+import statistics
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+# Seconds between polls of a running background callback when the app sets no interval
+DEFAULT_POLL_INTERVAL = 0.5
+# Typed into the keyword dropdowns to find keywords when none are given
+SEARCH_PREFIXES = ["da", "ma", "co", "ne", "le", "sy", "in", "pr", "al", "se"]
+
+
+def _percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def _split_output(output):
+    # Same format as dash._utils.split_callback_id; "@hash" stays in the property
+    parts = output[2:-2].split("...") if output.startswith("..") else [output]
+    return [dict(zip(("id", "property"), part.rsplit(".", 1))) for part in parts]
+
+
+def _find_texts(node, component_type):
+    """children of every `component_type` component in a serialized layout fragment"""
+    if isinstance(node, list):
+        return [text for item in node for text in _find_texts(item, component_type)]
+    if not isinstance(node, dict):
+        return []
+    props = node.get("props", {})
+    found = [props["children"]] if node.get("type") == component_type and isinstance(props.get("children"), str) else []
+    return found + _find_texts(props.get("children"), component_type)
+
+
+class CallbackError(Exception):
+    pass
+
+
+class DashClient:
+    """
+    One browser tab: the page's signed end_id and the app's callback map.
+
+    call() finds a callback by its first output and its inputs, posts it
+    like the renderer and returns the response ({} for PreventUpdate).
+    """
+
+    def __init__(self, base_url, dependencies, timeout=60):
+        self.base_url = base_url.rstrip("/") + "/"
+        self.dependencies = dependencies
+        self.timeout = timeout
+        self.end_id = None
+
+    def _request(self, path, body=None, params=None):
+        url = self.base_url + path
+        if params:
+            url += "?" + urllib.parse.urlencode(params)
+        data = json.dumps(body).encode() if body is not None else None
+        headers = {"Content-Type": "application/json", "Accept-Encoding": "identity"}
+        request = urllib.request.Request(url, data=data, headers=headers, method="POST" if data else "GET")
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return response.status, response.read()
+
+    def load_page(self):
+        """GET the index page (for its end_id) and the layout"""
+        _, page = self._request("")
+        match = re.search(rb'<script id="_dash-config" type="application/json">(.*?)</script>', page, re.S)
+        self.end_id = json.loads(match.group(1)).get("end_id") if match else None
+        self._request("_dash-layout")
+
+    def _callback(self, output, input_ids):
+        for dependency in self.dependencies:
+            outputs = _split_output(dependency["output"])
+            first = f"{outputs[0]['id']}.{outputs[0]['property'].split('@')[0]}"
+            if first == output and [f"{i['id']}.{i['property']}" for i in dependency["inputs"]] == input_ids:
+                return dependency, outputs
+        raise CallbackError(f"no callback for {output} <- {input_ids}")
+
+    def call(self, output, inputs, state=None, triggered=None):
+        """
+        Run the callback whose first output is `output` ("id.property").
+        `inputs` and `state` map "id.property" to values in the callback's
+        order (every input must be given); `triggered` defaults to the
+        first input.
+        """
+        dependency, outputs = self._callback(output, list(inputs))
+        state = state or {}
+        body = {
+            "output": dependency["output"],
+            "outputs": outputs if dependency["output"].startswith("..") else outputs[0],
+            "inputs": [{**i, "value": inputs[f"{i['id']}.{i['property']}"]} for i in dependency["inputs"]],
+            "state": [{**s, "value": state.get(f"{s['id']}.{s['property']}")} for s in dependency["state"]],
+            "changedPropIds": [triggered or next(iter(inputs))],
+        }
+        params = {"endId": self.end_id} if self.end_id else {}
+        status, data = self._request("_dash-update-component", body, params)
+        if status == 204:
+            return {}
+        result = json.loads(data)
+
+        background = dependency.get("background")
+        if background and "cacheKey" in result:
+            # Poll like the renderer, with the inputs blanked out
+            poll = {**body, "inputs": [{**i, "value": None} for i in body["inputs"]],
+                    "state": [{**s, "value": None} for s in body["state"]]}
+            params = {**params, "cacheKey": result["cacheKey"], "job": result["job"]}
+            interval = background["interval"] / 1000 if "interval" in background else DEFAULT_POLL_INTERVAL
+            deadline = time.monotonic() + self.timeout
+            while "response" not in result:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"{output} still running after {self.timeout:g}s")
+                time.sleep(interval)
+                status, data = self._request("_dash-update-component", poll, params)
+                if status == 204:
+                    return {}
+                result = json.loads(data)
+        return result.get("response", {})
+
+
+class Recorder:
+    """Latency samples and errors per step, shared by every virtual user"""
+
+    def __init__(self):
+        self.samples = {}  # step -> [ms]
+        self.errors = {}  # step -> {reason: count}
+        self._lock = threading.Lock()
+
+    def timed(self, step, func, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            reason = f"HTTP {e.code}" if isinstance(e, urllib.error.HTTPError) else type(e).__name__
+            with self._lock:
+                self.samples.setdefault(step, [])
+                counts = self.errors.setdefault(step, {})
+                counts[reason] = counts.get(reason, 0) + 1
+            return None
+        elapsed = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.samples.setdefault(step, []).append(elapsed)
+        return result
+
+    def report(self, seconds):
+        steps = {}
+        with self._lock:
+            names = sorted(set(self.samples) | set(self.errors))
+            for name in names:
+                ordered = sorted(self.samples.get(name, []))
+                errors = sum(self.errors.get(name, {}).values())
+                total = len(ordered) + errors
+                steps[name] = {
+                    "requests": total,
+                    "errors": errors,
+                    "error_rate": round(errors / total, 4) if total else 0.0,
+                    "throughput_rps": round(total / seconds, 3),
+                    "error_reasons": dict(self.errors.get(name, {})),
+                }
+                if ordered:
+                    steps[name]["latency_ms"] = {
+                        "mean": round(statistics.fmean(ordered), 3),
+                        "p50": round(_percentile(ordered, 0.50), 3),
+                        "p95": round(_percentile(ordered, 0.95), 3),
+                        "p99": round(_percentile(ordered, 0.99), 3),
+                        "max": round(ordered[-1], 3),
+                    }
+        requests = sum(s["requests"] for s in steps.values())
+        errors = sum(s["errors"] for s in steps.values())
+        return {
+            "requests": requests,
+            "errors": errors,
+            "error_rate": round(errors / requests, 4) if requests else 0.0,
+            "throughput_rps": round(requests / seconds, 3),
+            "steps": steps,
+        }
+
+
+def discover_inputs(client, keywords=None, faculty=None):
+    """Keywords and faculty names to use, found through the app itself when not given"""
+    if not keywords:
+        found = []
+        for prefix in SEARCH_PREFIXES:
+            response = client.call("keyword-selector.options", {"keyword-selector.search_value": prefix})
+            found += [o["value"] for o in response.get("keyword-selector", {}).get("options", [])]
+        keywords = list(dict.fromkeys(found))
+    if not keywords:
+        raise CallbackError("no keywords found; pass --keywords")
+    if not faculty:
+        found = []
+        for keyword in keywords[:5]:
+            response = client.call("professor-cards.children", {
+                "professor-keyword-selector.value": keyword, "professor-count-slider.value": 5})
+            found += _find_texts(response.get("professor-cards", {}).get("children"), "H5")
+        faculty = list(dict.fromkeys(found))
+    return keywords, faculty
+
+
+def session(client, recorder, rng, options, keywords, faculty, pause):
+    """One visit, step by step; a failed step is recorded and the visit goes on"""
+    recorder.timed("page_load", client.load_page)
+    initial = recorder.timed("load_initial_data", client.call,
+                             "year-range-slider.min", {"url.pathname": "/"}) or {}
+    slider = initial.get("year-range-slider", {})
+    low, high = slider.get("min", 1980), slider.get("max", 2023)
+    pause()
+
+    # Slider moves on the bubble chart
+    for _ in range(options.slider_moves):
+        start = rng.randint(low, high)
+        recorder.timed("bubble_chart", client.call, "bubble-chart.figure", {
+            "top-n-slider.value": rng.choice([5, 10, 20, 50]),
+            "year-range-slider.value": [start, rng.randint(start, high)],
+        })
+        pause()
+
+    # Keyword selections: typeahead, then a growing trend chart selection
+    keyword = rng.choice(keywords)
+    recorder.timed("keyword_search", client.call, "publication-keyword-selector.options",
+                   {"publication-keyword-selector.search_value": keyword[:2]})
+    if "trend" not in options.skip:
+        selected, drawn = [], None
+        for _ in range(3):
+            selected.append(rng.choice(keywords))
+            response = recorder.timed("line_chart", client.call, "line-chart.figure",
+                                      {"keyword-selector.value": selected},
+                                      {"line-chart-keywords.data": drawn})
+            if response:
+                drawn = response.get("line-chart-keywords", {}).get("data", drawn)
+            pause()
+
+    # Publications for a keyword, two pages
+    table = None
+    for page in range(2):
+        response = recorder.timed("publication_table", client.call, "publication-table.data", {
+            "publication-keyword-selector.value": keyword,
+            "publication-table.page_current": page,
+            "publication-table.page_size": 10,
+        })
+        if page == 0 and response:
+            table = response.get("publication-table", {}).get("data")
+        pause()
+
+    recorder.timed("professor_cards", client.call, "professor-cards.children", {
+        "professor-keyword-selector.value": keyword,
+        "professor-count-slider.value": rng.choice([5, 10]),
+    })
+    pause()
+    recorder.timed("university_search", client.call, "university-bar-chart.figure",
+                   {"search-button-university.n_clicks": 1}, {"keyword-input.value": keyword})
+    pause()
+    if faculty:
+        recorder.timed("faculty_search", client.call, "faculty-publications-table.data",
+                       {"search-button-faculty.n_clicks": 1}, {"faculty-input.value": rng.choice(faculty)})
+        pause()
+    if "focus" not in options.skip:
+        recorder.timed("focus_keyword", client.call, "focus-status.children",
+                       {"focus-keyword-selector.value": rng.choice(keywords)},
+                       {"professor-count-slider.value": 5, "publication-table.page_size": 10})
+        pause()
+
+    # Edit flow: open the dialog on the first row, save one more citation
+    if "edit" not in options.skip and table:
+        opened = recorder.timed("open_edit", client.call, "edit-modal.style", {
+            "publication-table.active_cell": {"row": 0, "column": 0, "column_id": "edit-btn"},
+            "save-publication-btn.n_clicks": None,
+            "cancel-edit-btn.n_clicks": None,
+        }, {"publication-table.data": table})
+        selected = (opened or {}).get("selected-publication-id", {}).get("data")
+        pause()
+        if selected:
+            recorder.timed("save_edit", client.call, "publication-table.data", {"save-publication-btn.n_clicks": 1}, {
+                "selected-publication-id.data": selected,
+                "edit-citations.value": selected["numCitations"] + 1,
+                "queue-edits.value": [],
+            })
+
+
+def run_users(base_url, options, recorder):
+    """Run --users virtual users until --duration seconds have passed; returns the elapsed seconds"""
+    setup = DashClient(base_url, [], options.timeout)
+    dependencies = json.loads(setup._request("_dash-dependencies")[1])
+    setup.dependencies = dependencies
+    setup.load_page()
+    keywords, faculty = discover_inputs(setup, options.keywords, options.faculty)
+
+    deadline = time.monotonic() + options.duration
+    sessions = [0] * options.users
+
+    def user(index):
+        rng = random.Random(options.seed + index)
+        client = DashClient(base_url, dependencies, options.timeout)
+
+        def pause():
+            if options.think_time:
+                time.sleep(min(rng.uniform(0.5, 1.5) * options.think_time, max(0.0, deadline - time.monotonic())))
+
+        # Spread the users' first requests over the ramp-up
+        time.sleep(options.ramp_up * index / options.users)
+        while time.monotonic() < deadline:
+            session(client, recorder, rng, options, keywords, faculty, pause)
+            sessions[index] += 1
+
+    start = time.monotonic()
+    threads = [threading.Thread(target=user, args=(i,), name=f"load-user-{i}", daemon=True)
+               for i in range(options.users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.monotonic() - start, sum(sessions), len(keywords), len(faculty)
+
+
+def serve_standins(options, workdir):
+    """
+    Load the synthetic dataset into the benchmark stand-ins (unless
+    DATA_MODE=snapshot), then serve the app on a free local port.
+    Returns (base URL, server, backends).
+    """
+    import db_config
+    if db_config.DATA_MODE == "snapshot":
+        backends = {"snapshot": db_config.SNAPSHOT_DIR}
+    else:
+        import benchmark
+        import synthetic_data
+        backends = benchmark.connect_standins(options, workdir)
+        if "mongo" not in backends:
+            raise SystemExit("mongomock is not installed; pass --mongo-uri or --url")
+        benchmark.load_standins(synthetic_data.generate_dataset(options.scale, seed=options.seed), backends)
+        if "neo4j" not in backends:
+            print("No Neo4j stand-in: skipping the trend and focus steps (pass --neo4j-uri to run them)")
+            options.skip |= {"trend", "focus"}
+
+    from werkzeug.serving import make_server
+
+    # One log line per request would drown the report
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    import app
+    import startup_utils
+    startup_utils.run_warmups()
+    server = make_server("127.0.0.1", 0, app.server, threaded=True)
+    threading.Thread(target=server.serve_forever, name="loadtest-server", daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}/", server, {k: v for k, v in backends.items() if not k.startswith("_")}
+
+
+def run(options):
+    report = {
+        "meta": {
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "users": options.users,
+            "duration": options.duration,
+            "think_time": options.think_time,
+            "seed": options.seed,
+        },
+    }
+    recorder = Recorder()
+    with tempfile.TemporaryDirectory() as workdir:
+        server = None
+        if options.url:
+            base_url = options.url
+            if not options.allow_writes:
+                options.skip.add("edit")
+            report["meta"]["target"] = base_url
+        else:
+            base_url, server, backends = serve_standins(options, workdir)
+            report["meta"]["target"] = {"in_process": base_url, "scale": options.scale, "backends": backends}
+        try:
+            seconds, sessions, keywords, faculty = run_users(base_url, options, recorder)
+        finally:
+            if server is not None:
+                server.shutdown()
+    report["meta"].update(skipped=sorted(options.skip), sessions=sessions, seconds=round(seconds, 3),
+                          keywords=keywords, faculty=faculty)
+    report.update(recorder.report(seconds))
+    return report
+
+
+def print_report(report):
+    print(f"{'step':<20} {'requests':>8} {'err %':>7} {'req/s':>8} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}")
+    for name, step in report["steps"].items():
+        latency = step.get("latency_ms", {})
+        print(f"{name:<20} {step['requests']:>8} {step['error_rate'] * 100:>7.2f} {step['throughput_rps']:>8.2f} "
+              f"{latency.get('p50', float('nan')):>10.1f} {latency.get('p95', float('nan')):>10.1f} "
+              f"{latency.get('p99', float('nan')):>10.1f}")
+    print(f"{report['requests']} requests in {report['meta']['seconds']} s ({report['throughput_rps']} req/s), "
+          f"error rate {report['error_rate'] * 100:.2f}%, {report['meta']['sessions']} sessions")
+
+
+def check_thresholds(report, options):
+    """Messages for every threshold the run exceeded"""
+    failures = []
+    if options.max_error_rate is not None and report["error_rate"] > options.max_error_rate:
+        failures.append(f"error rate {report['error_rate']} > {options.max_error_rate}")
+    if options.max_p95_ms is not None:
+        for name, step in report["steps"].items():
+            p95 = step.get("latency_ms", {}).get("p95")
+            if p95 is not None and p95 > options.max_p95_ms:
+                failures.append(f"{name} p95 {p95} ms > {options.max_p95_ms} ms")
+    return failures
+
+
+def main(argv=None):
+    import db_config
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="base URL of a running dashboard (default: serve one in-process)")
+    parser.add_argument("--users", type=int, default=10, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to keep starting sessions")
+    parser.add_argument("--ramp-up", type=float, default=5, help="seconds over which the users start")
+    parser.add_argument("--think-time", type=float, default=1.0, help="mean pause between steps in seconds")
+    parser.add_argument("--slider-moves", type=int, default=3, help="bubble chart slider moves per session")
+    parser.add_argument("--timeout", type=float, default=60, help="seconds before a request counts as failed")
+    parser.add_argument("--keywords", type=lambda s: s.split(","), help="comma-separated keywords to use")
+    parser.add_argument("--faculty", type=lambda s: s.split(","), help="comma-separated faculty names to search")
+    parser.add_argument("--skip", type=lambda s: set(s.split(",")), default=set(),
+                        help="comma-separated steps to leave out: trend, focus, edit")
+    parser.add_argument("--allow-writes", action="store_true", help="send the edit flow to a --url server")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="loadtest_report.json", help="where to write the JSON report")
+    parser.add_argument("--max-error-rate", type=float, help="fail when the overall error rate is higher")
+    parser.add_argument("--max-p95-ms", type=float, help="fail when any step's p95 latency is higher (only steps that ran; "
+                             "trend and focus need --neo4j-uri or DATA_MODE=snapshot)")
+    # In-process stand-ins (see benchmark.py)
+    parser.add_argument("--scale", default="small", help="synthetic dataset scale for the in-process app")
+    parser.add_argument("--mysql-url", help="SQLAlchemy URL of a scratch MySQL database (default: SQLite file)")
+    parser.add_argument("--mongo-uri", help="URI of a local mongod (default: mongomock)")
+    parser.add_argument("--mongo-database", default="academicworld_loadtest")
+    parser.add_argument("--neo4j-uri", help="bolt URI of a scratch Neo4j server (its database is wiped)")
+    parser.add_argument("--neo4j-user", default=db_config.NEO4J_USER)
+    parser.add_argument("--neo4j-password", default=db_config.NEO4J_PASSWORD)
+    parser.add_argument("--neo4j-database", default="neo4j")
+    options = parser.parse_args(argv)
+
+    report = run(options)
+    print_report(report)
+    with open(options.output, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"Wrote {options.output}")
+
+    failures = check_thresholds(report, options)
+    for failure in failures:
+        print(f"FAILED: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,203 @@
+import functools
+import inspect
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+
+# Calls slower than this are written to the slow-query log (0 disables it)
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get("SLOW_QUERY_THRESHOLD_MS", 500))
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+slow_query_log = logging.getLogger("slow_queries")
+
+
+class _Series:
+    __slots__ = ("calls", "errors", "rows", "duration_sum", "buckets")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.duration_sum = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)  # last one is +Inf
+
+
+_series = {}  # (function, backend) -> _Series
+_bytes = {}  # route -> [responses, raw bytes, sent bytes]
+_lock = threading.Lock()
+
+
+def record(function, backend, seconds, rows=None, error=False):
+    with _lock:
+        series = _series.get((function, backend))
+        if series is None:
+            series = _series[(function, backend)] = _Series()
+        series.calls += 1
+        series.errors += error
+        series.rows += rows or 0
+        series.duration_sum += seconds
+        series.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+    if SLOW_QUERY_THRESHOLD_MS and seconds * 1000 >= SLOW_QUERY_THRESHOLD_MS:
+        slow_query_log.warning("slow call %s [%s] took %.1f ms", function, backend, seconds * 1000)
+
+
+def record_bytes(route, raw_bytes, sent_bytes):
+    """Count one HTTP response of `raw_bytes` that went out as `sent_bytes` (after compression)"""
+    with _lock:
+        counts = _bytes.setdefault(route, [0, 0, 0])
+        counts[0] += 1
+        counts[1] += raw_bytes
+        counts[2] += sent_bytes
+
+
+def bytes_snapshot():
+    """{route: {"responses", "raw", "sent"}} copy of the response size counters"""
+    with _lock:
+        return {route: {"responses": c[0], "raw": c[1], "sent": c[2]} for route, c in _bytes.items()}
+
+
+def _row_count(result):
+    # A dict is a single record (e.g. get_faculty_by_id)
+    if isinstance(result, dict):
+        return 1
+    # Checked on the type: dash.Patch answers every attribute on the instance
+    if isinstance(result, (list, tuple)) or hasattr(type(result), "shape"):
+        return len(result)
+    return None
+
+
+def instrument(backend, ignored=()):
+    """
+    Time every call of the decorated function and count calls, errors and
+    rows returned under (function, backend). Generators are timed until they
+    are exhausted or closed. Exceptions listed in `ignored` (e.g. Dash's
+    PreventUpdate) are re-raised without counting as errors.
+
+    Place it under @cached so that cache hits are not counted as backend calls.
+    """
+    def decorator(func):
+        name = f"{func.__module__}.{func.__qualname__}"
+
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def generator_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                rows = 0
+                error = False
+                try:
+                    for item in func(*args, **kwargs):
+                        rows += 1
+                        yield item
+                except Exception as e:
+                    error = not isinstance(e, ignored)
+                    raise
+                finally:
+                    record(name, backend, time.perf_counter() - start, rows, error)
+            return generator_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                record(name, backend, time.perf_counter() - start, error=not isinstance(e, ignored))
+                raise
+            record(name, backend, time.perf_counter() - start, _row_count(result))
+            return result
+        return wrapper
+    return decorator
+
+
+def snapshot():
+    """{(function, backend): {...}} copy of the current counters"""
+    with _lock:
+        return {key: {"calls": s.calls, "errors": s.errors, "rows": s.rows,
+                      "duration_sum": s.duration_sum, "buckets": list(s.buckets)}
+                for key, s in _series.items()}
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _gauge_lines(name, help_text, values):
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+    for labels, value in values:
+        lines.append(f"{name}{_labels(**labels)} {value}")
+    return lines
+
+
+def _extra_gauges():
+    """Cache and pool statistics, for whatever has been created in this process"""
+    import cache_utils
+    import mysql_utils
+
+    lines = []
+    cache = cache_utils.cache_stats()
+    lines += _gauge_lines("app_result_cache", "Shared result cache statistics",
+                          [({"stat": k}, v) for k, v in cache.items()])
+    if mysql_utils._engine is not None:
+        pool = mysql_utils.get_pool_stats()
+        lines += _gauge_lines("app_mysql_pool", "MySQL connection pool statistics",
+                              [({"stat": k}, v) for k, v in pool.items()])
+    return lines
+
+
+def render_prometheus():
+    """All counters in the Prometheus text exposition format"""
+    data = snapshot()
+    lines = [
+        "# HELP app_calls_total Calls per function and backend",
+        "# TYPE app_calls_total counter",
+    ]
+    for (function, backend), s in sorted(data.items()):
+        lines.append(f"app_calls_total{_labels(function=function, backend=backend)} {s['calls']}")
+    lines += ["# HELP app_errors_total Calls that raised", "# TYPE app_errors_total counter"]
+    for (function, backend), s in sorted(data.items()):
+        lines.append(f"app_errors_total{_labels(function=function, backend=backend)} {s['errors']}")
+    lines += ["# HELP app_rows_returned_total Rows returned", "# TYPE app_rows_returned_total counter"]
+    for (function, backend), s in sorted(data.items()):
+        lines.append(f"app_rows_returned_total{_labels(function=function, backend=backend)} {s['rows']}")
+
+    lines += ["# HELP app_call_duration_seconds Call latency", "# TYPE app_call_duration_seconds histogram"]
+    for (function, backend), s in sorted(data.items()):
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), s["buckets"]):
+            cumulative += count
+            lines.append("app_call_duration_seconds_bucket"
+                         f"{_labels(function=function, backend=backend, le=bound)} {cumulative}")
+        lines.append(f"app_call_duration_seconds_sum{_labels(function=function, backend=backend)} {s['duration_sum']}")
+        lines.append(f"app_call_duration_seconds_count{_labels(function=function, backend=backend)} {s['calls']}")
+
+    responses = bytes_snapshot()
+    lines += ["# HELP app_responses_total HTTP responses per route", "# TYPE app_responses_total counter"]
+    for route, c in sorted(responses.items()):
+        lines.append(f"app_responses_total{_labels(route=route)} {c['responses']}")
+    lines += ["# HELP app_response_bytes_total Response body bytes before (raw) and after (sent) compression",
+              "# TYPE app_response_bytes_total counter"]
+    for route, c in sorted(responses.items()):
+        lines.append(f"app_response_bytes_total{_labels(route=route, stage='raw')} {c['raw']}")
+        lines.append(f"app_response_bytes_total{_labels(route=route, stage='sent')} {c['sent']}")
+
+    lines += _extra_gauges()
+    return "\n".join(lines) + "\n"
+
+
+def register_metrics_route(server, path="/metrics"):
+    """Serve render_prometheus() from the Dash app's Flask server"""
+    from flask import Response
+
+    def metrics():
+        return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+    server.add_url_rule(path, "metrics", metrics)
@@ -1,68 +1,422 @@
+import atexit
+import collections
+import threading
+
 from bson import ObjectId
 import pymongo
+import pymongo.errors
+from pymongo import UpdateOne
 
-client = pymongo.MongoClient("mongodb://localhost:27017/")
-db = client["academicworld"]
-publications_collection = db["publications"]
-faculty_collection = db["faculty"]
+import db_config
+from cache_utils import cached, invalidate_tags, result_cache
+from metrics_utils import instrument
+from startup_utils import timed_step
 
-faculty_collection.create_index("name")
-publications_collection.create_index([("keywords.id", pymongo.ASCENDING)])
+# Materialized (keyword, university) -> facultyCount/totalCitations rollup
+UNIVERSITY_ROLLUP = "keyword_university_rollup"
+# Distinct publication keywords with their publication counts ({_id: name, count})
+KEYWORD_CATALOGUE = "keyword_catalogue"
 
-# Function to get all keywords
-def get_all_keywords():
-    keywords = publications_collection.aggregate([
-        {"$unwind": "$keywords"},
-        {"$group": {"_id": "$keywords.name"}},
-        {"$sort": {"_id": 1}}
+# The client and indexes are created lazily on first use (or by init())
+_client = None
+_client_lock = threading.Lock()
+# Set by configure(); db_config.MONGO_DATABASE otherwise
+_database = None
+
+def get_db():
+    """Return the academicworld database, connecting and creating indexes on first use"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                client = pymongo.MongoClient(
+                    db_config.MONGO_URI,
+                    maxPoolSize=db_config.MONGO_MAX_POOL_SIZE,
+                    minPoolSize=db_config.MONGO_MIN_POOL_SIZE,
+                    waitQueueTimeoutMS=db_config.MONGO_WAIT_QUEUE_TIMEOUT_MS
+                )
+                ensure_indexes(client[_database or db_config.MONGO_DATABASE])
+                _client = client
+    return _client[_database or db_config.MONGO_DATABASE]
+
+def reset():
+    """Forget the client inherited from a parent process (call after fork)"""
+    global _client
+    with _client_lock:
+        # MongoClient is not fork-safe; the child simply builds a new one
+        _client = None
+
+def configure(client, database=None):
+    """
+    Use the given client (e.g. a mongomock stand-in) instead of connecting to
+    MONGO_URI, and optionally another database than db_config.MONGO_DATABASE
+    """
+    global _client, _database, _keyword_catalogue_ready, _university_rollup_ready
+    with _client_lock:
+        _database = database
+        ensure_indexes(client[database or db_config.MONGO_DATABASE])
+        _client = client
+    _keyword_catalogue_ready = False
+    _university_rollup_ready = False
+    result_cache.clear()
+
+def publications_collection():
+    return get_db()["publications"]
+
+def faculty_collection():
+    return get_db()["faculty"]
+
+def university_rollup_collection():
+    return get_db()[UNIVERSITY_ROLLUP]
+
+def keyword_catalogue_collection():
+    return get_db()[KEYWORD_CATALOGUE]
+
+def ensure_indexes(db):
+    db["faculty"].create_index("name")
+    # Serves the $lookup in iter_publications_for_faculty
+    db["publications"].create_index("id")
+    db["publications"].create_index([("keywords.id", pymongo.ASCENDING)])
+    # Serves the keyword match and the citation sort in get_top_publications
+    db["publications"].create_index([("keywords.name", pymongo.ASCENDING), ("numCitations", pymongo.DESCENDING)])
+    db[UNIVERSITY_ROLLUP].create_index([("keyword", pymongo.ASCENDING), ("facultyCount", pymongo.DESCENDING)])
+
+def init():
+    """Connect and create indexes now instead of on the first query"""
+    with timed_step("mongodb_utils.connect"):
+        get_db().command("ping")
+    with timed_step("mongodb_utils.keyword_catalogue"):
+        ensure_keyword_catalogue()
+    with timed_step("mongodb_utils.university_rollup"):
+        ensure_university_rollup()
+
+@instrument("mongo")
+def rebuild_keyword_catalogue():
+    """Recount every keyword from the publications collection"""
+    publications_collection().aggregate([
+        # Count each publication once per keyword, as adjust_keyword_catalogue does
+        {"$project": {"names": {"$setUnion": ["$keywords.name"]}}},
+        {"$unwind": "$names"},
+        {"$group": {"_id": "$names", "count": {"$sum": 1}}},
+        {"$out": KEYWORD_CATALOGUE}
     ])
+    result_cache.invalidate_function(get_all_keywords)
+    result_cache.invalidate_function(get_keyword_counts)
+
+@instrument("mongo")
+def adjust_keyword_catalogue(added=(), removed=()):
+    """
+    Keep the catalogue in step with publication writes (bulk_loader calls it
+    for publications added to a loaded database): `added` and `removed` are
+    keyword names gained or lost by publications, once per publication.
+    """
+    deltas = {}
+    for name in added:
+        deltas[name] = deltas.get(name, 0) + 1
+    for name in removed:
+        deltas[name] = deltas.get(name, 0) - 1
+    requests = [pymongo.UpdateOne({"_id": name}, {"$inc": {"count": delta}}, upsert=True)
+                for name, delta in deltas.items() if delta]
+    if not requests:
+        return
+    catalogue = keyword_catalogue_collection()
+    catalogue.bulk_write(requests, ordered=False)
+    catalogue.delete_many({"_id": {"$in": list(deltas)}, "count": {"$lte": 0}})
+    result_cache.invalidate_function(get_all_keywords)
+    result_cache.invalidate_function(get_keyword_counts)
+
+_keyword_catalogue_ready = False
+
+def ensure_keyword_catalogue():
+    """Build the catalogue on first use if it has never been built"""
+    global _keyword_catalogue_ready
+    if not _keyword_catalogue_ready:
+        if keyword_catalogue_collection().estimated_document_count() == 0:
+            rebuild_keyword_catalogue()
+        _keyword_catalogue_ready = True
+
+# Function to get all keywords, read from the maintained catalogue
+@cached()
+@instrument("mongo")
+def get_all_keywords():
+    ensure_keyword_catalogue()
+    keywords = keyword_catalogue_collection().find({}, {"_id": 1}).sort("_id", pymongo.ASCENDING)
     return [{"label": kw["_id"], "value": kw["_id"]} for kw in keywords]
 
+@cached()
+@instrument("mongo")
+def get_keyword_counts():
+    """{keyword name: number of publications labelled with it}"""
+    ensure_keyword_catalogue()
+    return {kw["_id"]: kw["count"] for kw in keyword_catalogue_collection().find({}, {"_id": 1, "count": 1})}
 
-def get_universities_by_keyword(keyword):
-    result = faculty_collection.aggregate([
+
+def _university_rollup_pipeline():
+    return [
         {"$unwind": "$keywords"},
-        {"$match": {"keywords.name": keyword}},
         {"$group": {
-            "_id": "$affiliation.name",
+            "_id": {"keyword": "$keywords.name", "university": "$affiliation.name"},
             "totalCitations": {"$sum": "$numCitations"},
             "facultyCount": {"$sum": 1}
         }},
-        {"$sort": {"facultyCount": -1}},
-        {"$limit": 50}
-    ])
-    return [{"university": r["_id"], "facultyCount": r["facultyCount"] } for r in result]
+        {"$project": {
+            "_id": 0,
+            "keyword": "$_id.keyword",
+            "university": "$_id.university",
+            "facultyCount": 1,
+            "totalCitations": 1
+        }}
+    ]
 
+@instrument("mongo")
+def rebuild_university_rollup():
+    """Recompute the whole keyword -> university rollup from the faculty collection"""
+    faculty_collection().aggregate(_university_rollup_pipeline() + [{"$out": UNIVERSITY_ROLLUP}])
+    result_cache.invalidate_function(get_universities_by_keyword)
 
-# Function to get top 5 publications based on keyword
-def get_top_publications(keyword):
-    result = publications_collection.aggregate([
-        {"$unwind": "$keywords"},
+_university_rollup_ready = False
+
+def ensure_university_rollup():
+    """Build the rollup on first use if it has never been built"""
+    global _university_rollup_ready
+    if not _university_rollup_ready:
+        if university_rollup_collection().estimated_document_count() == 0:
+            rebuild_university_rollup()
+        _university_rollup_ready = True
+
+@cached()
+@instrument("mongo")
+def get_universities_by_keyword(keyword):
+    ensure_university_rollup()
+    result = university_rollup_collection().find(
+        {"keyword": keyword},
+        {"_id": 0, "university": 1, "facultyCount": 1, "totalCitations": 1}
+    ).sort("facultyCount", pymongo.DESCENDING).limit(50)
+    return list(result)
+
+
+# Rows per page of the publications table
+PUBLICATION_PAGE_SIZE = 10
+
+# Function to get one page of a keyword's publications, most cited first
+@cached(tags=lambda arguments, result: [("publication-keyword", arguments['keyword'])])
+@instrument("mongo")
+def get_top_publications(keyword, page=0, page_size=PUBLICATION_PAGE_SIZE):
+    # Match on the array field directly (no $unwind) so the
+    # (keywords.name, numCitations) index serves both the filter and the sort
+    result = publications_collection().aggregate([
         {"$match": {"keywords.name": keyword}},
         {"$sort": {"numCitations": -1}},
-        {"$limit": 50},
+        {"$skip": page * page_size},
+        {"$limit": page_size},
         {"$project": {
-            "_id": 0,
+            "_id": 1,
+            "id": 1,
             "title": 1,
             "venue": 1,
             "year": 1,
             "numCitations": 1
         }}
     ])
-    return list(result)
+    # The ids travel with the table rows so an edit needs no lookup
+    rows = list(result)
+    for row in rows:
+        row["_id"] = str(row["_id"])
+    return rows
+
+@cached(tags=lambda arguments, result: [("publication-keyword", arguments['keyword'])])
+@instrument("mongo")
+def count_publications_by_keyword(keyword):
+    return publications_collection().count_documents({"keywords.name": keyword})
 
+@instrument("mongo")
 def get_publication_by_title(title):
-    return publications_collection.find_one({"title": title})
+    return publications_collection().find_one({"title": title})
 
-def update_publication(pub_id, new_citations):
+def _citation_filter(pub_id, expected):
+    query = {"_id": ObjectId(pub_id)}
+    if expected is not None:
+        query["numCitations"] = expected
+    return query
+
+@instrument("mongo")
+def update_publication(pub_id, new_citations, expected=None):
+    """
+    Set a publication's citation count. With `expected` this is a
+    compare-and-set: nothing is written unless the stored count still equals
+    it. Returns True when the update was applied.
+    """
     # Only allow positive citation numbers
     if new_citations < 0:
         return False
-    publications_collection.update_one(
-        {"_id": ObjectId(pub_id)},
-        {"$set": {"numCitations": new_citations}}
+    previous = publications_collection().find_one_and_update(
+        _citation_filter(pub_id, expected),
+        {"$set": {"numCitations": new_citations}},
+        projection={"keywords.name": 1}
     )
+    if previous is None:
+        return False
+    # Drop cached listings for every keyword the publication is labelled with
+    invalidate_tags(*[("publication-keyword", kw["name"]) for kw in previous.get("keywords", [])])
+    return True
+
+# Queued citation edits are written after this many seconds, or as soon as
+# this many distinct publications are waiting
+CITATION_QUEUE_FLUSH_SECONDS = 2.0
+CITATION_QUEUE_MAX_PENDING = 500
+# An edit is given up after this many failed writes
+CITATION_QUEUE_MAX_ATTEMPTS = 5
+# Given-up edits kept for inspection (see CitationWriteQueue.failed)
+CITATION_QUEUE_FAILED_KEPT = 100
+
+# Write error codes worth retrying (shutdowns, elections, interruptions);
+# any other write error, e.g. a validation failure, will not go away
+TRANSIENT_WRITE_ERRORS = {6, 7, 89, 91, 189, 262, 9001, 10107, 11600, 11602, 13435, 13436}
+
+class CitationWriteQueue:
+    """
+    Write-behind buffer for citation edits. Edits of the same publication are
+    merged (the last value wins, compared against the first expected value)
+    and every flush writes all pending edits with one unordered bulk_write.
+    on_applied, if set, is called with [(publication id, citations)] for the
+    edits that were applied.
+
+    Edits that fail with a transient error are kept for the next flush, up to
+    max_attempts writes; a failed timed flush is printed and retried on the
+    next timer. Edits that fail for good (a permanent write error, or too many
+    attempts) are printed and moved to `failed`.
+    """
+
+    def __init__(self, flush_seconds=CITATION_QUEUE_FLUSH_SECONDS, max_pending=CITATION_QUEUE_MAX_PENDING,
+                 on_applied=None, max_attempts=CITATION_QUEUE_MAX_ATTEMPTS):
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self.on_applied = on_applied
+        self.max_attempts = max_attempts
+        self.failed = collections.deque(maxlen=CITATION_QUEUE_FAILED_KEPT)  # (_id string, entry, error)
+        self._pending = {}  # _id string -> {"expected", "citations", "id", "attempts"}
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def put(self, pub_id, new_citations, expected=None, publication_id=None):
+        if new_citations < 0:
+            return False
+        with self._lock:
+            entry = self._pending.get(pub_id)
+            if entry is None:
+                self._pending[pub_id] = {"expected": expected, "citations": new_citations, "id": publication_id,
+                                         "attempts": 0}
+            else:
+                entry["citations"] = new_citations
+            full = len(self._pending) >= self.max_pending
+            if not full:
+                self._arm_timer()
+        if full:
+            self.flush()
+        return True
+
+    def _arm_timer(self):
+        # Called with the lock held
+        if self._pending and self._timer is None:
+            self._timer = threading.Timer(self.flush_seconds, self._flush_on_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_on_timer(self):
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"Error flushing queued citation edits: {e}")
+        # Retry whatever flush put back
+        with self._lock:
+            self._arm_timer()
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+    @instrument("mongo")
+    def flush(self):
+        """Write everything pending now; returns {_id string: applied}"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not pending:
+            return {}
 
+        collection = publications_collection()
+        operations = [UpdateOne(_citation_filter(pub_id, entry["expected"]),
+                                {"$set": {"numCitations": entry["citations"]}})
+                      for pub_id, entry in pending.items()]
+        # Any error other than a BulkWriteError fails every edit
+        failed, error = {pub_id: None for pub_id in pending}, None
+        try:
+            collection.bulk_write(operations, ordered=False)
+            failed = {}
+        except pymongo.errors.BulkWriteError as e:
+            # Unordered, so every operation without a write error was applied
+            pub_ids = list(pending)
+            failed = {pub_ids[we["index"]]: we for we in e.details["writeErrors"]}
+            error = e
+        finally:
+            self._retry_or_give_up(pending, failed)
+
+        # One read tells which compare-and-sets won and which keywords to invalidate
+        applied, keywords, changed = {}, set(), []
+        written = [ObjectId(pub_id) for pub_id in pending if pub_id not in failed]
+        current = collection.find({"_id": {"$in": written}}, {"numCitations": 1, "keywords.name": 1})
+        for doc in current:
+            pub_id = str(doc["_id"])
+            entry = pending[pub_id]
+            applied[pub_id] = doc.get("numCitations") == entry["citations"]
+            if applied[pub_id]:
+                keywords.update(kw["name"] for kw in doc.get("keywords", []))
+                changed.append((entry["id"], entry["citations"]))
+        invalidate_tags(*[("publication-keyword", keyword) for keyword in keywords])
+        if self.on_applied is not None and changed:
+            self.on_applied(changed)
+        if error is not None:
+            raise error
+        return applied
+
+    def _retry_or_give_up(self, pending, failed):
+        """Requeue the failed edits worth retrying; failed maps _id string -> write error (None if unknown)"""
+        given_up = []
+        with self._lock:
+            for pub_id, write_error in failed.items():
+                entry = pending[pub_id]
+                entry["attempts"] += 1
+                permanent = write_error is not None and write_error.get("code") not in TRANSIENT_WRITE_ERRORS
+                if permanent or entry["attempts"] >= self.max_attempts:
+                    reason = write_error.get("errmsg") if permanent else f"{entry['attempts']} failed attempts"
+                    given_up.append((pub_id, entry, reason))
+                else:
+                    # Unless a newer edit was queued meanwhile
+                    self._pending.setdefault(pub_id, entry)
+        for pub_id, entry, reason in given_up:
+            self.failed.append((pub_id, entry, reason))
+            print(f"Gave up citation edit of publication {pub_id} ({entry['citations']}): {reason}")
+
+    def flush_at_exit(self):
+        # Exceptions raised at interpreter shutdown would only print a traceback
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"Error flushing queued citation edits at exit: {e}")
+
+citation_write_queue = CitationWriteQueue()
+atexit.register(citation_write_queue.flush_at_exit)
+
+def queue_citation_update(pub_id, new_citations, expected=None, publication_id=None):
+    """Queue a compare-and-set citation edit for the next batched write"""
+    return citation_write_queue.put(pub_id, new_citations, expected, publication_id)
+
+def flush_citation_updates():
+    return citation_write_queue.flush()
+
+@instrument("mongo")
 def get_publication_by_id(id_str):
     # Convert string ID to ObjectId if it's not already an ObjectId
     if isinstance(id_str, str):
@@ -70,68 +424,69 @@ def get_publication_by_id(id_str):
     else:
         id_obj = id_str
     # Fetch publication using the ID
-    return publications_collection.find_one({"_id": id_obj})
-
-def get_publications_for_faculty(faculty_names):
-    if faculty_names:
-        faculty_list = []
-        for name in faculty_names.split(','):
-            name_parts = name.strip().split(' ')
-            if len(name_parts) == 2:
-                first_name, last_name = name_parts
-                # Reformat to "Last, First" (e.g., "Agouris, Peggy")
-                formatted_name = f"{last_name},{first_name}"
-                faculty_list.append(formatted_name)
-
-        
-        result = faculty_collection.aggregate([
-            {
-                "$match": {
-                    "name": {"$in": faculty_list}  
-                }
+    return publications_collection().find_one({"_id": id_obj})
+
+# Cursor batch size used when streaming a faculty member's publications
+FACULTY_PUBLICATION_BATCH_SIZE = 500
+
+def parse_faculty_names(faculty_names):
+    """Turn "Peggy Agouris, Tim Davis" into the stored "Agouris,Peggy" form"""
+    faculty_list = []
+    for name in faculty_names.split(','):
+        name_parts = name.strip().split(' ')
+        if len(name_parts) == 2:
+            first_name, last_name = name_parts
+            # Reformat to "Last, First" (e.g., "Agouris, Peggy")
+            formatted_name = f"{last_name},{first_name}"
+            faculty_list.append(formatted_name)
+    return faculty_list
+
+@instrument("mongo")
+def iter_publications_for_faculty(faculty_names, page=0, page_size=None, newest_first=True,
+                                  batch_size=FACULTY_PUBLICATION_BATCH_SIZE):
+    """
+    Yield {faculty, year, title} rows for the given faculty, sorted by year.
+
+    One pipeline: the name match uses the faculty name index and the $lookup
+    into publications uses the publications.id index. The year sort comes after
+    the $lookup, so the server sorts every row before returning the first batch.
+    """
+    if not faculty_names:
+        return
+    faculty_list = parse_faculty_names(faculty_names)
+    if not faculty_list:
+        return
+
+    pipeline = [
+        {"$match": {"name": {"$in": faculty_list}}},
+        {"$project": {"_id": 0, "name": 1, "publications": 1}},
+        {"$unwind": "$publications"},
+        {
+            "$lookup": {
+                "from": "publications",
+                "localField": "publications",
+                "foreignField": "id",
+                "as": "pub_details"
             }
-        ])
-        
-        # Convert result to a list and print it
-        result_list = list(result)
-        
-        # if not result_list:
-        #     print("No results found for the given faculty names.")
-
-        if result_list:    
-            result = faculty_collection.aggregate([
-                {
-                    "$match": {
-                        "name": {"$in": faculty_list}
-                    }
-                },
-                {
-                    "$unwind": "$publications"
-                },
-                {
-                    "$lookup": {
-                        "from": "publications",
-                        "localField": "publications",
-                        "foreignField": "id",
-                        "as": "pub_details"
-                    }
-                },
-                {
-                    "$unwind": "$pub_details"
-                },
-                # {
-                #     "$sort": {"pub_details.year": -1}
-                # },
-                {
-                    "$project": {
-                        "faculty": "$name",
-                        "year": "$pub_details.year",
-                        "title": "$pub_details.title"
-                        
-                    }
-                }
-            ])
-        
-        return list(result)
-    return []
-        
\ No newline at end of file
+        },
+        {"$unwind": "$pub_details"},
+        {"$sort": {"pub_details.year": -1 if newest_first else 1, "pub_details.id": 1}},
+    ]
+    if page_size:
+        pipeline += [{"$skip": page * page_size}, {"$limit": page_size}]
+    pipeline.append({
+        "$project": {
+            "_id": 0,
+            "faculty": "$name",
+            "year": "$pub_details.year",
+            "title": "$pub_details.title"
+        }
+    })
+
+    # allowDiskUse lets the blocking sort spill for faculty with many publications
+    with faculty_collection().aggregate(pipeline, batchSize=batch_size, allowDiskUse=True) as cursor:
+        for row in cursor:
+            yield row
+
+def get_publications_for_faculty(faculty_names, page=0, page_size=None, newest_first=True):
+    return list(iter_publications_for_faculty(faculty_names, page, page_size, newest_first))
@@ -1,59 +1,265 @@
-import mysql.connector as sql
+import threading
+import time
+from contextlib import contextmanager
+
 import pandas as pd
 import sqlalchemy as sa
 
-# Replace with your MySQL credentials
-db_host = 'localhost'
-db_port = 3306
-db_user = 'root'
-db_password = 'test_root'
-db_name = 'academicworld'
+import db_config
+from cache_utils import cached, invalidate_tags, result_cache
+from keyword_cube import KeywordYearCube
+from keyword_index import KeywordIndex
+from metrics_utils import instrument
+from startup_utils import timed_step
+
+# MySQL credentials and pool settings live in db_config
+db_host = db_config.MYSQL_HOST
+db_port = db_config.MYSQL_PORT
+db_user = db_config.MYSQL_USER
+db_password = db_config.MYSQL_PASSWORD
+db_name = db_config.MYSQL_DATABASE
 
 # Create a connection string
-connection_string = f"mysql+mysqlconnector://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
-
-# Create an engine (using SQLAlchemy)
-engine = sa.create_engine(connection_string)
-
-# create index if not exist
-connection = engine.connect()
-def index_exists():
-    check_index_query = """
-    SELECT 1
-    FROM INFORMATION_SCHEMA.STATISTICS 
-    WHERE TABLE_SCHEMA = 'academicworld' 
-    AND TABLE_NAME = 'keyword' 
-    AND INDEX_NAME = 'idx_keyword_name';
-    """
-    result = connection.execute(sa.text(check_index_query))
-    if result.fetchone() is not None:
-        return True
-    else:
-        return False
+connection_string = db_config.MYSQL_URL or f"mysql+mysqlconnector://{db_user}:{db_password}@{db_host}:{db_port}/{db_name}"
+
+# The engine and schema are created lazily on first use (or by init())
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_engine():
+    """Return the shared SQLAlchemy engine, creating it and the schema on first use"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                engine = sa.create_engine(
+                    connection_string,
+                    pool_size=db_config.MYSQL_POOL_SIZE,
+                    max_overflow=db_config.MYSQL_MAX_OVERFLOW,
+                    pool_timeout=db_config.MYSQL_POOL_TIMEOUT,
+                    pool_recycle=db_config.MYSQL_POOL_RECYCLE,
+                    pool_pre_ping=db_config.MYSQL_POOL_PRE_PING
+                )
+                ensure_schema(engine)
+                _engine = engine
+    return _engine
+
+def reset():
+    """Forget the engine inherited from a parent process (call after fork)"""
+    global _engine
+    with _engine_lock:
+        if _engine is not None:
+            # close=False leaves the parent's sockets alone
+            _engine.dispose(close=False)
+        _engine = None
+
+def configure(url):
+    """Point the module at another database (e.g. a SQLite stand-in) and drop derived state"""
+    global connection_string, _keyword_year_cube, _keyword_index, _faculty_scores_ready
+    reset()
+    connection_string = url
+    _keyword_year_cube = None
+    _keyword_index = None
+    _faculty_scores_ready = False
+    result_cache.clear()
+
+# (table, definition) created by ensure_schema when missing
+SCHEMA_TABLES = [
+    # Materialized SUM(num_citations) per faculty member and keyword name (names
+    # are not unique in keyword), kept up to date by update_publication_citations()
+    ("faculty_keyword_score", """
+        faculty_id INT NOT NULL,
+        keyword VARCHAR(512) NOT NULL,
+        total_citations BIGINT NOT NULL,
+        PRIMARY KEY (faculty_id, keyword)
+    """),
+]
+
+# (table, index name, columns) created by ensure_schema when missing
+SCHEMA_INDEXES = [
+    ("keyword", "idx_keyword_name", "name"),
+    # Top-k faculty per keyword is a backward range scan of this index
+    ("faculty_keyword_score", "idx_faculty_keyword_score_top", "keyword, total_citations"),
+    # Authors of one publication, for update_publication_citations (the primary key leads with faculty_Id)
+    ("faculty_publication", "idx_faculty_publication_publication", "publication_Id"),
+]
+
+def index_exists(connection, table, index_name):
+    indexes = sa.inspect(connection).get_indexes(table)
+    return any(index["name"] == index_name for index in indexes)
 
-if index_exists() == False:
-    connection.execute(sa.text("CREATE INDEX idx_keyword_name ON keyword(name);"))
-    connection.commit()
+def _table_columns(definition):
+    return [line.split()[0] for line in definition.strip().splitlines() if not line.strip().startswith("PRIMARY")]
 
-def get_data(query):
-    df = pd.read_sql(query, engine)
+def ensure_schema(engine):
+    """Create the tables and indexes the queries below rely on if they do not exist yet"""
+    with engine.connect() as connection:
+        for table, definition in SCHEMA_TABLES:
+            # The tables are derived data: one with an older layout is dropped and rebuilt
+            if sa.inspect(connection).has_table(table):
+                columns = [column["name"] for column in sa.inspect(connection).get_columns(table)]
+                if columns != _table_columns(definition):
+                    connection.execute(sa.text(f"DROP TABLE {table};"))
+            connection.execute(sa.text(f"CREATE TABLE IF NOT EXISTS {table} ({definition});"))
+        for table, index_name, columns in SCHEMA_INDEXES:
+            if index_exists(connection, table, index_name) == False:
+                connection.execute(sa.text(f"CREATE INDEX {index_name} ON {table}({columns});"))
+        connection.commit()
+
+def init():
+    """Connect and set up the schema now instead of on the first query"""
+    with timed_step("mysql_utils.connect"):
+        get_engine()
+    with timed_step("mysql_utils.keyword_cube"):
+        get_keyword_year_cube()
+    with timed_step("mysql_utils.keyword_index"):
+        refresh_keyword_index()
+    with timed_step("mysql_utils.faculty_keyword_scores"):
+        ensure_faculty_keyword_scores()
+
+# Pool checkout counters, updated by pooled_connection()
+_pool_stats = {"checkouts": 0, "timeouts": 0, "wait_seconds_total": 0.0, "wait_seconds_max": 0.0}
+_pool_stats_lock = threading.Lock()
+
+@contextmanager
+def pooled_connection():
+    """Check a connection out of the pool, recording how long the checkout waited"""
+    engine = get_engine()
+    start = time.perf_counter()
+    try:
+        connection = engine.connect()
+    except sa.exc.TimeoutError:
+        with _pool_stats_lock:
+            _pool_stats["timeouts"] += 1
+        raise
+    waited = time.perf_counter() - start
+    with _pool_stats_lock:
+        _pool_stats["checkouts"] += 1
+        _pool_stats["wait_seconds_total"] += waited
+        _pool_stats["wait_seconds_max"] = max(_pool_stats["wait_seconds_max"], waited)
+    try:
+        yield connection
+    finally:
+        connection.close()
+
+@contextmanager
+def pooled_transaction():
+    """Pooled connection inside a transaction that commits on success"""
+    with pooled_connection() as connection:
+        with connection.begin():
+            yield connection
+
+def get_pool_stats():
+    """Current pool occupancy plus checkout and wait-time counters"""
+    pool = get_engine().pool
+    with _pool_stats_lock:
+        stats = dict(_pool_stats)
+    stats["wait_ms_avg"] = 1000 * stats["wait_seconds_total"] / stats["checkouts"] if stats["checkouts"] else 0.0
+    stats["wait_ms_max"] = 1000 * stats.pop("wait_seconds_max")
+    stats.pop("wait_seconds_total")
+    stats.update({
+        "pool_size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": pool.overflow(),
+        "max_overflow": db_config.MYSQL_MAX_OVERFLOW,
+    })
+    return stats
+
+def get_data(query, params=None):
+    with pooled_connection() as connection:
+        df = pd.read_sql(sa.text(query), connection, params=params)
     return df
 
-def get_top_keywords(top_n=5):
-    return get_data(f"""
-        SELECT k.name AS keyword, COUNT(DISTINCT pk.publication_id) AS popularity
+# Default lower bound of the Top Keywords year range
+DEFAULT_START_YEAR = 2012
+
+_keyword_year_cube = None
+_keyword_year_cube_generation = 0
+_keyword_year_cube_lock = threading.Lock()
+
+# Stamped by loads that change publication_keyword, in whichever process runs them
+KEYWORD_YEAR_CUBE_TAG = ("keyword-year-cube",)
+
+@instrument("mysql")
+def refresh_keyword_year_cube():
+    """Rebuild the keyword x year count cube from publication_keyword"""
+    global _keyword_year_cube, _keyword_year_cube_generation
+    generation = result_cache.generation()
+    df = get_data("""
+        SELECT k.name AS keyword, p.year AS year, COUNT(DISTINCT pk.publication_id) AS publication_count
         FROM publication_keyword pk
         JOIN publication p ON pk.publication_id = p.ID
         JOIN keyword k ON pk.keyword_id = k.id
-        WHERE p.year >= '2012'
-        GROUP BY k.name
-        ORDER BY popularity DESC
-        LIMIT {top_n};
+        WHERE p.year IS NOT NULL
+        GROUP BY k.name, p.year;
     """)
+    cube = KeywordYearCube(df)
+    with _keyword_year_cube_lock:
+        _keyword_year_cube = cube
+        _keyword_year_cube_generation = generation
+    result_cache.invalidate_function(get_top_keywords)
+    return cube
+
+def refresh_keyword_year_cube_if_stale():
+    """Rebuild the cube only if a load stamped it since it was built; returns whether it did"""
+    generations = result_cache.generations
+    if _keyword_year_cube is not None and generations is not None \
+            and generations.latest([KEYWORD_YEAR_CUBE_TAG]) <= _keyword_year_cube_generation:
+        return False
+    refresh_keyword_year_cube()
+    return True
+
+def invalidate_keyword_year_cube():
+    """Tell every process that publication_keyword changed (e.g. after a bulk load)"""
+    invalidate_tags(KEYWORD_YEAR_CUBE_TAG)
+
+def get_keyword_year_cube():
+    """Return the keyword x year count cube, building it on first use"""
+    cube = _keyword_year_cube
+    if cube is None:
+        cube = refresh_keyword_year_cube()
+    return cube
+
+@instrument("mysql")
+def get_publication_year_range():
+    """(min_year, max_year) covered by keyword-labelled publications"""
+    cube = get_keyword_year_cube()
+    if cube.min_year is None:
+        return DEFAULT_START_YEAR, DEFAULT_START_YEAR
+    return cube.min_year, cube.max_year
 
+@cached()
+@instrument("mysql")
+def get_top_keywords(top_n=5, start_year=DEFAULT_START_YEAR, end_year=None):
+    return get_keyword_year_cube().top_keywords(top_n, start_year, end_year)
+
+@cached()
+@instrument("mysql")
 def get_all_keywords():
     return get_data("SELECT name FROM keyword ORDER BY name;")
 
+# Number of suggestions returned by search_keywords
+KEYWORD_SEARCH_LIMIT = 20
+
+_keyword_index = None
+
+@instrument("mysql")
+def refresh_keyword_index():
+    """Rebuild the keyword typeahead index from the keyword table"""
+    global _keyword_index
+    result_cache.invalidate_function(get_all_keywords)
+    _keyword_index = KeywordIndex(get_all_keywords()['name'].tolist())
+    return _keyword_index
+
+@instrument("mysql")
+def search_keywords(text, limit=KEYWORD_SEARCH_LIMIT):
+    """Keyword names matching `text`, prefix matches first"""
+    index = _keyword_index
+    if index is None:
+        index = refresh_keyword_index()
+    return index.search(text, limit)
+
 # def get_keyword_trend(keywords):
 #     formatted = ','.join(f"'{kw}'" for kw in keywords)
 #     query = f"""
@@ -70,74 +276,152 @@ def get_all_keywords():
 #     """
 #     return get_data(query)
 
-def get_top_faculty_by_keyword(selected_keyword):
-    query = f"""
+# Default and largest number of professors shown per keyword
+TOP_FACULTY_DEFAULT = 5
+TOP_FACULTY_MAX = 50
+
+_faculty_scores_ready = False
+_faculty_scores_lock = threading.Lock()
+
+@instrument("mysql")
+def refresh_faculty_keyword_scores():
+    """Rebuild faculty_keyword_score from the publication tables"""
+    global _faculty_scores_ready
+    with pooled_transaction() as connection:
+        connection.execute(sa.text("DELETE FROM faculty_keyword_score;"))
+        connection.execute(sa.text("""
+            INSERT INTO faculty_keyword_score (faculty_id, keyword, total_citations)
+            SELECT fp.faculty_id, pk.keyword, COALESCE(SUM(p.num_citations), 0)
+            FROM faculty_publication fp
+            JOIN publication p ON fp.publication_Id = p.ID
+            -- A publication counts once per keyword name, however many ids carry the name
+            JOIN (
+                SELECT DISTINCT pk.publication_id, k.name AS keyword
+                FROM publication_keyword pk
+                JOIN keyword k ON pk.keyword_id = k.id
+                WHERE k.name IS NOT NULL
+            ) pk ON p.ID = pk.publication_id
+            GROUP BY fp.faculty_id, pk.keyword;
+        """))
+    _faculty_scores_ready = True
+    result_cache.invalidate_function(get_top_faculty_by_keyword)
+
+def ensure_faculty_keyword_scores():
+    """Build faculty_keyword_score once if it is still empty"""
+    global _faculty_scores_ready
+    if _faculty_scores_ready:
+        return
+    with _faculty_scores_lock:
+        if _faculty_scores_ready:
+            return
+        with pooled_connection() as connection:
+            empty = connection.execute(sa.text("SELECT 1 FROM faculty_keyword_score LIMIT 1;")).first() is None
+        if empty:
+            refresh_faculty_keyword_scores()
+        _faculty_scores_ready = True
+
+def _faculty_tags(arguments, result):
+    tags = [("faculty", int(faculty_id)) for faculty_id in result['id']]
+    return tags + [("faculty-keyword-score", arguments['selected_keyword'])]
+
+@cached(tags=_faculty_tags)
+@instrument("mysql")
+def get_top_faculty_by_keyword(selected_keyword, k=TOP_FACULTY_DEFAULT):
+    """The k faculty with the most citations on publications labelled `selected_keyword`"""
+    ensure_faculty_keyword_scores()
+    query = """
         SELECT f.id, f.name, f.photo_url, u.name AS university, f.position, f.research_interest, f.email, f.phone,
-               SUM(p.num_citations) AS total_citations
-        FROM faculty f
-        JOIN faculty_publication fp ON f.id = fp.faculty_id
-        JOIN publication p ON fp.publication_Id = p.ID
-        JOIN publication_keyword pk ON p.ID = pk.publication_id
-        JOIN keyword k ON pk.keyword_id = k.id
+               s.total_citations
+        FROM faculty_keyword_score s
+        JOIN faculty f ON s.faculty_id = f.id
         JOIN university u ON f.university_id = u.id
-        WHERE k.name = '{selected_keyword}'
-        GROUP BY f.id
-        ORDER BY total_citations DESC
-        LIMIT 5;
+        WHERE s.keyword = :keyword
+        ORDER BY s.total_citations DESC
+        LIMIT :k;
     """
-    return get_data(query)
+    k = max(1, min(int(k), TOP_FACULTY_MAX))
+    return get_data(query, {"keyword": selected_keyword, "k": k})
 
+@instrument("mysql")
+def update_publication_citations(publication_id, new_citations):
+    """
+    Set a publication's citation count and shift the faculty_keyword_score
+    rows of its authors and keywords by the difference, in one transaction.
+    """
+    if new_citations < 0:
+        return False
+    ensure_faculty_keyword_scores()
+    params = {"publication_id": publication_id}
+    with pooled_transaction() as connection:
+        # Lock the row on MySQL so concurrent edits apply their deltas in turn
+        lock = " FOR UPDATE" if connection.dialect.name == "mysql" else ""
+        row = connection.execute(
+            sa.text(f"SELECT num_citations FROM publication WHERE ID = :publication_id{lock};"), params).first()
+        if row is None:
+            return False
+        delta = new_citations - (row.num_citations or 0)
+        connection.execute(sa.text("UPDATE publication SET num_citations = :citations WHERE ID = :publication_id;"),
+                           {**params, "citations": new_citations})
+        keywords = connection.execute(sa.text("""
+            SELECT k.name FROM publication_keyword pk
+            JOIN keyword k ON pk.keyword_id = k.id
+            WHERE pk.publication_id = :publication_id AND k.name IS NOT NULL;
+        """), params).scalars().all()
+        keywords = list(dict.fromkeys(keywords))
+        if delta and keywords:
+            connection.execute(sa.text("""
+                UPDATE faculty_keyword_score
+                SET total_citations = total_citations + :delta
+                WHERE faculty_id IN (SELECT faculty_id FROM faculty_publication WHERE publication_Id = :publication_id)
+                  AND keyword IN :keywords;
+            """).bindparams(sa.bindparam("keywords", expanding=True)), {**params, "delta": delta, "keywords": keywords})
+    invalidate_tags(*[("faculty-keyword-score", keyword) for keyword in keywords])
+    return True
+
+@instrument("mysql")
 def update_professor_photo(professor_id, photo_url):
     update_query = """
         UPDATE faculty
         SET photo_url = :photo_url
         WHERE id = :professor_id
     """
-    with engine.connect() as connection:
+    with pooled_transaction() as connection:
         connection.execute(sa.text(update_query), {
             "photo_url": photo_url,
             "professor_id": professor_id
         })
+    invalidate_tags(("faculty", int(professor_id)))
 
+@cached(tags=lambda arguments, result: [("faculty", int(arguments['faculty_id']))])
+@instrument("mysql")
 def get_faculty_by_id(faculty_id):
     """Get faculty information by ID"""
-    query = f"""
+    query = """
     SELECT f.id, f.name, f.position, f.email, f.phone, f.photo_url, 
            u.name as university
     FROM faculty f
     JOIN university u ON f.university_id = u.id
-    WHERE f.id = {faculty_id}
+    WHERE f.id = :faculty_id
     """
     
-    result_df = get_data(query)
+    result_df = get_data(query, {"faculty_id": faculty_id})
     if result_df.empty:
         return None
     return result_df.iloc[0].to_dict()
 
 def get_mysql_connection():
-    """Create and return a direct MySQL connection"""
-    conn = sql.connect(
-        host=db_host,
-        port=db_port,
-        user=db_user,
-        password=db_password,
-        database=db_name
-    )
-    return conn
+    """Return a raw DB-API connection from the shared pool; close() hands it back"""
+    return get_engine().raw_connection()
 
+@instrument("mysql")
 def update_faculty_photo_url(faculty_id, new_photo_url):
     """Update the photo URL for a faculty member"""
     try:
-        conn = get_mysql_connection()
-        cursor = conn.cursor()
-        
-        query = "UPDATE faculty SET photo_url = %s WHERE id = %s"
-        cursor.execute(query, (new_photo_url, faculty_id))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
+        with pooled_transaction() as connection:
+            query = "UPDATE faculty SET photo_url = :photo_url WHERE id = :faculty_id"
+            connection.execute(sa.text(query), {"photo_url": new_photo_url, "faculty_id": faculty_id})
+
+        invalidate_tags(("faculty", int(faculty_id)))
         return True
     except Exception as e:
         print(f"Error updating faculty photo URL: {e}")
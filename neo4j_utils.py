@@ -1,53 +1,210 @@
+import threading
+
 from neo4j import GraphDatabase
 import pandas as pd
 
-uri = "bolt://localhost:7687"
-username = "neo4j"
-password = "123456789"
+import db_config
+from cache_utils import cached, invalidate_tags, result_cache
+from metrics_utils import instrument
+from startup_utils import timed_step
+
+uri = db_config.NEO4J_URI
+username = db_config.NEO4J_USER
+password = db_config.NEO4J_PASSWORD
+database = db_config.NEO4J_DATABASE
+
+# The driver is created lazily on first use (or by init())
+_driver = None
+_driver_lock = threading.Lock()
+
+def get_driver():
+    """Return the shared Neo4j driver, creating it on first use"""
+    global _driver
+    if _driver is None:
+        with _driver_lock:
+            if _driver is None:
+                driver = GraphDatabase.driver(
+                    uri,
+                    auth=(username, password),
+                    max_connection_pool_size=db_config.NEO4J_MAX_POOL_SIZE,
+                    connection_acquisition_timeout=db_config.NEO4J_ACQUISITION_TIMEOUT
+                )
+                ensure_schema(driver)
+                _driver = driver
+    return _driver
+
+def reset():
+    """Forget the driver inherited from a parent process (call after fork)"""
+    global _driver
+    with _driver_lock:
+        _driver = None
+
+def configure(new_uri, new_username=None, new_password=None, new_database=None):
+    """Point the module at another Neo4j server (e.g. a local instance for benchmarks)"""
+    global uri, username, password, database, _keyword_year_rollup_ready
+    reset()
+    _keyword_year_rollup_ready = False
+    uri = new_uri
+    username = new_username or username
+    password = new_password or password
+    database = new_database or database
+    result_cache.clear()
+
+# Created by ensure_schema when missing
+SCHEMA_STATEMENTS = [
+    "CREATE INDEX keyword_name IF NOT EXISTS FOR (k:KEYWORD) ON (k.name)",
+    "CREATE INDEX publication_id IF NOT EXISTS FOR (p:PUBLICATION) ON (p.id)",
+    # One (:KEYWORD_YEAR {keyword, year, publicationCount}) rollup node per keyword and year
+    "CREATE CONSTRAINT keyword_year_unique IF NOT EXISTS FOR (r:KEYWORD_YEAR) REQUIRE (r.keyword, r.year) IS UNIQUE",
+    "CREATE INDEX keyword_year_keyword IF NOT EXISTS FOR (r:KEYWORD_YEAR) ON (r.keyword)",
+]
 
-driver = GraphDatabase.driver(uri, auth=(username, password))
+def ensure_schema(driver):
+    """Create the indexes and constraints the queries below rely on if they do not exist yet"""
+    with driver.session(database=database) as session:
+        for statement in SCHEMA_STATEMENTS:
+            session.run(statement).consume()
 
-try:
-    driver.verify_connectivity()
+def init():
+    """Open and verify a connection and set up the schema now instead of on the first query"""
+    with timed_step("neo4j_utils.connect"):
+        get_driver().verify_connectivity()
     print("Connection established successfully")
-except Exception as e:
-    print(f"Connection failed: {e}")
+    with timed_step("neo4j_utils.keyword_year_rollup"):
+        ensure_keyword_year_rollup()
+
+# Keywords beyond this many are dropped from a single trend request
+MAX_TREND_KEYWORDS = 25
+# Keywords sent per UNWIND query; larger selections are paged in batches
+TREND_BATCH_SIZE = 10
+
+TREND_COLUMNS = ["year", "keyword", "publication_count"]
+
+# Reads the rollup through the KEYWORD_YEAR keyword index; no LABEL_BY edges are traversed
+KEYWORD_TREND_QUERY = """
+UNWIND $keywords AS keyword
+MATCH (r:KEYWORD_YEAR {keyword: keyword})
+RETURN r.year AS year, keyword, r.publicationCount AS publication_count
+ORDER BY keyword, year
+"""
+
+# Keywords recounted per transaction by rebuild_keyword_year_rollup
+KEYWORD_ROLLUP_BATCH_SIZE = 500
+
+# Replaces the rollup nodes of the given keywords with fresh counts
+KEYWORD_ROLLUP_REFRESH_QUERY = """
+UNWIND $keywords AS keyword
+OPTIONAL MATCH (old:KEYWORD_YEAR {keyword: keyword})
+DELETE old
+WITH DISTINCT keyword
+MATCH (:KEYWORD {name: keyword})<-[:LABEL_BY]-(p:PUBLICATION)
+WHERE p.year IS NOT NULL
+WITH keyword, p.year AS year, COUNT(p) AS publication_count
+CREATE (:KEYWORD_YEAR {keyword: keyword, year: year, publicationCount: publication_count})
+"""
+
+def _trend_tags(arguments, result):
+    return [("keyword-trend", keyword) for keyword in arguments['keywords']]
+
+def refresh_keyword_year_rollup(keywords):
+    """Recount the rollup of the given keywords, one transaction per KEYWORD_ROLLUP_BATCH_SIZE keywords"""
+    keywords = list(dict.fromkeys(keywords))
+    with get_driver().session(database=database) as session:
+        for start in range(0, len(keywords), KEYWORD_ROLLUP_BATCH_SIZE):
+            batch = keywords[start:start + KEYWORD_ROLLUP_BATCH_SIZE]
+            session.execute_write(lambda tx: tx.run(KEYWORD_ROLLUP_REFRESH_QUERY, keywords=batch).consume())
+            invalidate_tags(*[("keyword-trend", keyword) for keyword in batch])
 
+@instrument("neo4j")
+def rebuild_keyword_year_rollup():
+    """Recount every keyword in batches, then drop rollups of keywords that no longer exist"""
+    global _keyword_year_rollup_ready
+    with get_driver().session(database=database) as session:
+        keywords = session.run("MATCH (k:KEYWORD) RETURN DISTINCT k.name AS name").value("name")
+    refresh_keyword_year_rollup(keywords)
+    with get_driver().session(database=database) as session:
+        session.run("""
+            MATCH (r:KEYWORD_YEAR)
+            WHERE NOT EXISTS { MATCH (:KEYWORD {name: r.keyword}) }
+            DELETE r
+        """).consume()
+    _keyword_year_rollup_ready = True
+    result_cache.invalidate_function(get_keyword_trend)
+    result_cache.invalidate_function(get_keyword_series)
 
-    
-def get_keyword_trend(keywords):
+_keyword_year_rollup_ready = False
+
+def ensure_keyword_year_rollup():
+    """Build the rollup on first use if it has never been built"""
+    global _keyword_year_rollup_ready
+    if not _keyword_year_rollup_ready:
+        with get_driver().session(database=database) as session:
+            empty = session.run("MATCH (r:KEYWORD_YEAR) RETURN r LIMIT 1").single() is None
+        if empty:
+            rebuild_keyword_year_rollup()
+        _keyword_year_rollup_ready = True
+
+def _trend_batches(keywords, limit=MAX_TREND_KEYWORDS, batch_size=TREND_BATCH_SIZE):
+    # Drop duplicates but keep the selection order, then cap and page the list
+    unique = list(dict.fromkeys(keywords))[:limit]
+    for start in range(0, len(unique), batch_size):
+        yield unique[start:start + batch_size]
+
+@cached(tags=_trend_tags)
+def get_keyword_trend(keywords, limit=MAX_TREND_KEYWORDS):
     """
     Get the trend (publication count by year) for specified keywords
-    
+
+    Counts come from the KEYWORD_YEAR rollup. Keywords are sent
+    TREND_BATCH_SIZE at a time in one UNWIND query each, so ten keywords
+    cost a single round trip. Only the first `limit` distinct keywords are
+    queried.
+
     Args:
         keywords (list): List of keywords to get trends for
-    
+        limit (int): Maximum number of distinct keywords to query
+
     Returns:
         pandas.DataFrame: DataFrame with columns [year, keyword, publication_count]
     """
-    results = []
-    
-    with driver.session(database="academicworld") as session:
-        for keyword in keywords:
-            # Query to find the num of publications by year
-            query = """
-            MATCH (k:KEYWORD {name: $keyword})<-[:LABEL_BY]-(p:PUBLICATION)
-            WHERE p.year IS NOT NULL
-            RETURN p.year AS year, $keyword AS keyword, COUNT(p) AS publication_count
-            ORDER BY p.year
-            """
-            result = session.run(query, keyword=keyword)
-            
-            # Process results for this keyword
-            for record in result:
-                year = record["year"]
-                keyword_name = record["keyword"]
-                count = record["publication_count"]
-                results.append({
-                    "year": year,
-                    "keyword": keyword_name,
-                    "publication_count": count
-                })
-    
-    df = pd.DataFrame(results)
-    return df
+    return pd.DataFrame(_trend_rows(keywords, limit), columns=TREND_COLUMNS)
+
+@instrument("neo4j")
+def _trend_rows(keywords, limit=MAX_TREND_KEYWORDS):
+    ensure_keyword_year_rollup()
+    rows = []
+
+    with get_driver().session(database=database) as session:
+        for batch in _trend_batches(keywords, limit):
+            result = session.run(KEYWORD_TREND_QUERY, keywords=batch)
+            rows.extend(result.values(*TREND_COLUMNS))
+    return rows
+
+def get_keyword_series(keywords):
+    """
+    {keyword: DataFrame[year, keyword, publication_count]} for the given
+    keywords. Every keyword's series is cached on its own, so a chart that
+    gains one keyword fetches only that one; misses are fetched together
+    with the batched trend query.
+    """
+    series, missing = {}, []
+    for keyword in dict.fromkeys(keywords):
+        found, value = result_cache.get(_series_key(keyword))
+        if found:
+            series[keyword] = value
+        else:
+            missing.append(keyword)
+
+    if missing:
+        generation = result_cache.generation()
+        df = pd.DataFrame(_trend_rows(missing, limit=len(missing)), columns=TREND_COLUMNS)
+        for keyword in missing:
+            value = df[df['keyword'] == keyword].reset_index(drop=True)
+            result_cache.set(_series_key(keyword), value, [("keyword-trend", keyword)], generation=generation)
+            series[keyword] = value
+    return series
+
+def _series_key(keyword):
+    # Same key layout as @cached, so invalidate_function(get_keyword_series) applies
+    return (__name__, "get_keyword_series", keyword)
+
@@ -0,0 +1,450 @@
+"""
+Query-plan checks: prove that the data layer's queries use their indexes.
+
+Every request-time read of benchmark.py (plus the citation edit path) is run
+once against stand-ins loaded with the synthetic dataset, and every
+statement it sends is captured and explained:
+
+- MySQL: EXPLAIN (EXPLAIN QUERY PLAN on the SQLite stand-in) of every
+  SELECT/UPDATE/DELETE, captured with a SQLAlchemy cursor event
+- MongoDB: explain (executionStats) of every find, aggregate, count and
+  update, captured with a pymongo command listener. mongomock cannot
+  explain, so this needs --mongo-uri
+- Neo4j: PROFILE of the trend query and EXPLAIN of the rollup adjustment
+  (it writes), with --neo4j-uri
+
+Plans are reduced to flags (full_scan, full_index_scan, missing_index,
+temporary, filesort, in_memory_sort, unwind_before_match,
+large_intermediate) and the indexes used, per query function.
+
+    python query_plans.py                                  # report only
+    python query_plans.py --baseline query_plan_baseline.json
+    python query_plans.py --baseline query_plan_baseline.json --update-baseline
+
+With --baseline the run fails (exit code 1) when a function gains a flag or
+stops using an index it used in the baseline, or when a function errors.
+Baselines are kept per dialect (sqlite, mysql, mongodb, neo4j), so the
+SQLite stand-in and a real MySQL server can share one file. Dialects missing
+from the baseline are reported but not enforced: the committed
+query_plan_baseline.json only holds the SQLite stand-in, so the MySQL,
+MongoDB and Neo4j checks enforce nothing until their entries are added with
+--update-baseline against scratch servers. Every target database is dropped
+and reloaded, so never point these options at real data.
+"""
+import argparse
+import json
+import os
+import re
+import tempfile
+import time
+
+import db_config
+import mongodb_utils
+import mysql_utils
+import neo4j_utils
+import synthetic_data
+from cache_utils import result_cache
+
+PLAN_DATABASE = "academicworld_plans"
+
+# Row estimates (or documents examined) above this are flagged as large intermediate results
+LARGE_INTERMEDIATE_ROWS = int(os.environ.get("LARGE_INTERMEDIATE_ROWS", 10000))
+
+# Rebuild jobs scan whole tables by design; only request-time paths are checked
+SKIPPED_PREFIXES = ("refresh_", "rebuild_")
+
+SQL_STATEMENTS = ("SELECT", "WITH", "UPDATE", "DELETE")
+MONGO_COMMANDS = {"find", "aggregate", "count", "distinct", "update", "delete", "findAndModify"}
+# Session and transport fields the explain command does not accept
+MONGO_IGNORED_FIELDS = {"lsid", "txnNumber", "autocommit", "startTransaction", "writeConcern", "readConcern"}
+
+CYPHER_FULL_SCANS = {"AllNodesScan", "NodeByLabelScan", "DirectedAllRelationshipsScan",
+                     "UndirectedAllRelationshipsScan", "DirectedRelationshipTypeScan",
+                     "UndirectedRelationshipTypeScan"}
+
+
+class Capture:
+    """Statements sent by the data layer while `function` is set"""
+
+    def __init__(self):
+        self.function = None
+        self.sql = []  # (function, statement, parameters)
+        self.mongo = []  # (function, database, command)
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self.function and not executemany and statement.lstrip().upper().startswith(SQL_STATEMENTS):
+            self.sql.append((self.function, statement, parameters))
+
+    # pymongo.monitoring.CommandListener
+    def started(self, event):
+        if self.function and event.command_name in MONGO_COMMANDS:
+            self.mongo.append((self.function, event.database_name, dict(event.command)))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def _result(flags=(), indexes=(), plan=None):
+    return {"flags": sorted(set(flags)), "indexes": sorted(set(indexes)), "plan": plan}
+
+
+# MySQL / SQLite
+
+def _sqlite_plan(rows):
+    flags, indexes = [], []
+    for detail in (row["detail"] for row in rows):
+        words = detail.split()
+        table = words[1] if len(words) > 1 else ""
+        index = re.search(r"USING (?:COVERING )?INDEX (\S+)", detail)
+        if detail.startswith("SEARCH") and "AUTOMATIC" in detail:
+            # SQLite builds a throwaway index because none exists
+            flags.append(f"missing_index:{table}")
+        elif detail.startswith("SCAN") and "CONSTANT ROW" not in detail:
+            flags.append(f"full_index_scan:{table}" if index else f"full_scan:{table}")
+        if index and "AUTOMATIC" not in detail:
+            indexes.append(f"{table}.{index.group(1)}")
+        elif "USING INTEGER PRIMARY KEY" in detail or "USING PRIMARY KEY" in detail:
+            indexes.append(f"{table}.PRIMARY")
+        if detail.startswith("USE TEMP B-TREE"):
+            flags.append(f"temporary:{detail.split(' FOR ')[-1].lower().replace(' ', '_')}")
+    return _result(flags, indexes, [row["detail"] for row in rows])
+
+
+def _mysql_plan(rows, large_rows):
+    flags, indexes = [], []
+    for row in rows:
+        table = row.get("table")
+        if not table or table.startswith("<"):
+            continue
+        access = (row.get("type") or "").upper()
+        extra = row.get("Extra") or ""
+        if access == "ALL":
+            flags.append(f"full_scan:{table}" if row.get("possible_keys") else f"missing_index:{table}")
+        elif access == "INDEX":
+            flags.append(f"full_index_scan:{table}")
+        if row.get("key"):
+            indexes.append(f"{table}.{row['key']}")
+        if "Using temporary" in extra:
+            flags.append(f"temporary:{table}")
+        if "Using filesort" in extra:
+            flags.append(f"filesort:{table}")
+        if (row.get("rows") or 0) * float(row.get("filtered") or 100) / 100 > large_rows:
+            flags.append(f"large_intermediate:{table}")
+    return _result(flags, indexes, [{k: row.get(k) for k in ("table", "type", "key", "rows", "filtered", "Extra")}
+                                    for row in rows])
+
+
+def explain_sql(statement, parameters, large_rows=LARGE_INTERMEDIATE_ROWS):
+    """Flags and indexes of one captured DBAPI statement"""
+    engine = mysql_utils.get_engine()
+    sqlite = engine.dialect.name == "sqlite"
+    with engine.connect() as connection:
+        result = connection.exec_driver_sql(("EXPLAIN QUERY PLAN " if sqlite else "EXPLAIN ") + statement, parameters)
+        rows = [dict(row) for row in result.mappings()]
+    return _sqlite_plan(rows) if sqlite else _mysql_plan(rows, large_rows)
+
+
+# MongoDB
+
+def _walk(node):
+    if isinstance(node, dict):
+        yield node
+        for value in node.values():
+            yield from _walk(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _walk(value)
+
+
+def _mongo_plan(command, explained, large_rows):
+    name = next(iter(command))
+    collection = command[name]
+    flags, indexes = [], []
+    for node in _walk(explained):
+        stage = node.get("stage")
+        if stage == "COLLSCAN":
+            flags.append(f"full_scan:{collection}")
+        elif stage == "IXSCAN":
+            indexes.append(f"{collection}.{node.get('indexName')}")
+        elif stage == "SORT":
+            flags.append(f"in_memory_sort:{collection}")
+        # $lookup stages report their own scans of the joined collection
+        lookup = node.get("$lookup")
+        if isinstance(lookup, dict) and node.get("collectionScans"):
+            flags.append(f"full_scan:{lookup.get('from')}")
+        for index in node.get("indexesUsed", []) if isinstance(lookup, dict) else []:
+            indexes.append(f"{lookup.get('from')}.{index}")
+        examined = node.get("totalDocsExamined", node.get("docsExamined"))
+        if isinstance(examined, int) and examined > large_rows:
+            flags.append(f"large_intermediate:{collection}")
+
+    stages = [next(iter(stage)) for stage in command.get("pipeline", [])]
+    if "$unwind" in stages and (
+            "$match" not in stages or stages.index("$unwind") < stages.index("$match")):
+        flags.append(f"unwind_before_match:{collection}")
+    return _result(flags, indexes, command.get("pipeline") or command.get("filter") or command.get("query"))
+
+
+def explain_mongo(database, command, large_rows=LARGE_INTERMEDIATE_ROWS):
+    """Flags and indexes of one captured command, from explain with executionStats"""
+    command = {k: v for k, v in command.items() if not k.startswith("$") and k not in MONGO_IGNORED_FIELDS}
+    explained = mongodb_utils.get_db().client[database].command(
+        {"explain": command, "verbosity": "executionStats"})
+    return _mongo_plan(command, explained, large_rows)
+
+
+# Neo4j
+
+def _cypher_plan(plan, large_rows):
+    flags, indexes, operators = [], [], []
+
+    def visit(node):
+        operator = node.get("operatorType", "").split("@")[0]
+        arguments = node.get("arguments", {})
+        details = arguments.get("Details", "")
+        operators.append(f"{operator} {details}".strip())
+        match = re.search(r":(\w+)\(([\w, ]+)\)", details)
+        index = f"{match.group(1)}({match.group(2)})" if match else details
+        if operator in CYPHER_FULL_SCANS:
+            flags.append(f"full_scan:{details.split(' ')[0]}")
+        elif "IndexScan" in operator:
+            flags.append(f"full_index_scan:{index}")
+        if "Index" in operator:
+            indexes.append(index)
+        rows = node.get("rows", arguments.get("EstimatedRows", 0))
+        if rows and rows > large_rows:
+            flags.append(f"large_intermediate:{operator}")
+        for child in node.get("children", []):
+            visit(child)
+
+    visit(plan)
+    return _result(flags, indexes, operators)
+
+
+def explain_cypher(query, parameters, profile=True, large_rows=LARGE_INTERMEDIATE_ROWS):
+    """Flags and indexes of a Cypher query, from PROFILE (runs it) or EXPLAIN"""
+    with neo4j_utils.get_driver().session(database=neo4j_utils.database) as session:
+        summary = session.run(("PROFILE " if profile else "EXPLAIN ") + query, parameters).consume()
+    return _cypher_plan(summary.profile if profile else summary.plan, large_rows)
+
+
+def cypher_cases(args):
+    """(name, query, parameters, profile) of every Cypher query on a request path"""
+    keywords = args["trend_keywords"][:neo4j_utils.TREND_BATCH_SIZE]
+    return [
+        ("neo4j_utils.get_keyword_trend", neo4j_utils.KEYWORD_TREND_QUERY, {"keywords": keywords}, True),
+    ]
+
+
+# Running the checks
+
+def read_cases(args):
+    """(backend, name, callable, arguments) for every request-time read of benchmark.py"""
+    import benchmark
+
+    return [case for case in benchmark.benchmarks(args)
+            if case[0] != "neo4j" and not case[1].split(".")[1].startswith(SKIPPED_PREFIXES)]
+
+
+def write_cases(args, backends):
+    """The citation edit path, adding one citation to a publication"""
+    cases = [("mysql", "mysql_utils.update_publication_citations", mysql_utils.update_publication_citations,
+              (args["publication_id"], args["publication_citations"] + 1))]
+    if "mongo" in backends:
+        pub = mongodb_utils.get_top_publications(args["hot_keyword"])[0]
+        cases.append(("mongo", "mongodb_utils.update_publication", mongodb_utils.update_publication,
+                      (pub["_id"], pub["numCitations"] + 1, pub["numCitations"])))
+    return cases
+
+
+def connect(options, workdir, capture):
+    """Load the synthetic dataset into the stand-ins with the capture hooks installed"""
+    import benchmark
+    import sqlalchemy as sa
+
+    backends = benchmark.connect_standins(options, workdir)
+    if options.mongo_uri:
+        import pymongo
+        backends["_mongo_client"] = pymongo.MongoClient(options.mongo_uri, event_listeners=[capture])
+    elif "mongo" in backends:
+        # mongomock has no explain; its data is still needed by the MySQL-side cases
+        backends["mongo_skipped"] = "explain needs a mongod (--mongo-uri)"
+
+    dataset = synthetic_data.generate_dataset(options.scale, seed=options.seed)
+    benchmark.load_standins(dataset, backends)
+    sa.event.listen(mysql_utils.get_engine(), "before_cursor_execute", capture.before_cursor_execute)
+
+    args = benchmark.sample_arguments(dataset)
+    publication = dataset["tables"]["publication"].iloc[0]
+    args.update(publication_id=int(publication["ID"]), publication_citations=int(publication["num_citations"]))
+    return backends, args
+
+
+def inspect_plans(options):
+    """{dialect: {function: {"flags", "indexes", "queries": [...]}}} for the stand-ins"""
+    capture = Capture()
+    report = {}
+    errors = {}
+    executed = []
+
+    def add(dialect, function, explained, statement):
+        entry = report.setdefault(dialect, {}).setdefault(function, {"flags": [], "indexes": [], "queries": []})
+        entry["flags"] = sorted(set(entry["flags"]) | set(explained["flags"]))
+        entry["indexes"] = sorted(set(entry["indexes"]) | set(explained["indexes"]))
+        entry["queries"].append({"statement": statement, **explained})
+
+    with tempfile.TemporaryDirectory() as workdir:
+        backends, args = connect(options, workdir, capture)
+        sql_dialect = mysql_utils.get_engine().dialect.name
+
+        reads = [case for case in read_cases(args) if case[0] != "mongo" or options.mongo_uri]
+        # Lazily built state (keyword cube, score table) is built here, outside the capture
+        for backend, name, func, call_args in reads:
+            try:
+                func(*call_args)
+            except Exception:
+                pass
+
+        for backend, name, func, call_args in reads + write_cases(args, backends):
+            if backend == "mongo" and not options.mongo_uri:
+                continue
+            result_cache.clear()
+            capture.function = name
+            try:
+                func(*call_args)
+            except Exception as e:
+                errors[name] = repr(e)
+            finally:
+                capture.function = None
+            executed.append(name)
+
+        for function, statement, parameters in capture.sql:
+            try:
+                add(sql_dialect, function, explain_sql(statement, parameters, options.large_rows),
+                    " ".join(statement.split()))
+            except Exception as e:
+                errors[function] = repr(e)
+        for function, database, command in capture.mongo:
+            try:
+                add("mongodb", function, explain_mongo(database, command, options.large_rows),
+                    f"{next(iter(command))} {command[next(iter(command))]}")
+            except Exception as e:
+                errors[function] = repr(e)
+
+        if "neo4j" in backends:
+            for name, query, parameters, profile in cypher_cases(args):
+                try:
+                    add("neo4j", name, explain_cypher(query, parameters, profile, options.large_rows),
+                        " ".join(query.split()))
+                except Exception as e:
+                    errors[name] = repr(e)
+        mysql_utils.reset()
+
+    skipped = {k: v for k, v in [("mongodb", backends.get("mongo_skipped")),
+                                 ("neo4j", None if "neo4j" in backends else "needs --neo4j-uri")] if v}
+    queried = {function for functions in report.values() for function in functions}
+    in_memory = [name for name in executed if name not in queried and name not in errors]
+    return {"meta": {"started": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "scale": options.scale,
+                     "seed": options.seed, "large_rows": options.large_rows, "skipped": skipped,
+                     "in_memory": in_memory},
+            "plans": report, "errors": errors}
+
+
+def compare(plans, baseline):
+    """Regressions of `plans` against `baseline`, for the dialects both contain"""
+    regressions = []
+    for dialect, functions in plans.items():
+        if dialect not in baseline:
+            continue
+        for function, entry in functions.items():
+            expected = baseline[dialect].get(function)
+            if expected is None:
+                continue
+            for flag in sorted(set(entry["flags"]) - set(expected["flags"])):
+                regressions.append(f"[{dialect}] {function}: new {flag}")
+            for index in sorted(set(expected["indexes"]) - set(entry["indexes"])):
+                regressions.append(f"[{dialect}] {function}: no longer uses {index}")
+    return regressions
+
+
+def baseline_of(plans):
+    """The part of a report that is kept as the baseline"""
+    return {dialect: {function: {"flags": entry["flags"], "indexes": entry["indexes"]}
+                      for function, entry in sorted(functions.items())}
+            for dialect, functions in sorted(plans.items())}
+
+
+def print_report(report):
+    for dialect, functions in sorted(report["plans"].items()):
+        print(f"== {dialect}")
+        for function, entry in sorted(functions.items()):
+            flags = ", ".join(entry["flags"]) or "-"
+            print(f"{function:<55} indexes: {', '.join(entry['indexes']) or '-'}")
+            print(f"{'':<55} flags:   {flags}")
+    if report["meta"]["in_memory"]:
+        print(f"== served from memory (no queries): {', '.join(report['meta']['in_memory'])}")
+    for dialect, reason in report["meta"]["skipped"].items():
+        print(f"== {dialect}: skipped ({reason})")
+    for function, error in report["errors"].items():
+        print(f"ERROR {function}: {error}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baseline", help="JSON baseline to compare against (and to write with --update-baseline)")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="store this run's plans for its dialects in --baseline instead of comparing")
+    parser.add_argument("--output", default="query_plans_report.json", help="where to write the full plans")
+    parser.add_argument("--scale", default="small", help=f"synthetic dataset scale from {', '.join(synthetic_data.SCALES)}")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--large-rows", type=int, default=LARGE_INTERMEDIATE_ROWS,
+                        help="flag plan steps estimated or measured above this many rows")
+    parser.add_argument("--mysql-url", help="SQLAlchemy URL of a scratch MySQL database (default: SQLite file)")
+    parser.add_argument("--mongo-uri", help="URI of a scratch mongod (mongomock cannot explain)")
+    parser.add_argument("--mongo-database", default=PLAN_DATABASE)
+    parser.add_argument("--neo4j-uri", help="bolt URI of a scratch Neo4j server (its database is wiped)")
+    parser.add_argument("--neo4j-user", default=db_config.NEO4J_USER)
+    parser.add_argument("--neo4j-password", default=db_config.NEO4J_PASSWORD)
+    parser.add_argument("--neo4j-database", default="neo4j")
+    return parser
+
+
+def main(argv=None):
+    options = build_parser().parse_args(argv)
+
+    report = inspect_plans(options)
+    print_report(report)
+    with open(options.output, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"Wrote {options.output}")
+
+    if not options.baseline:
+        return 1 if report["errors"] else 0
+
+    baseline = {}
+    if os.path.exists(options.baseline):
+        with open(options.baseline) as f:
+            baseline = json.load(f)
+    if options.update_baseline:
+        baseline.update(baseline_of(report["plans"]))
+        with open(options.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Updated {options.baseline}")
+        return 1 if report["errors"] else 0
+
+    for dialect in sorted(set(report["plans"]) - set(baseline)):
+        print(f"== {dialect}: not in {options.baseline}, so its plans are reported but not enforced")
+    failures = compare(report["plans"], baseline) + [f"{f}: {e}" for f, e in report["errors"].items()]
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    if not failures:
+        print(f"No plan regressions against {options.baseline}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,376 @@
+"""
+Offline snapshot engine.
+
+export_snapshot() pulls just the data the dashboard widgets read out of
+MySQL, MongoDB and Neo4j into a directory of Parquet files. The functions
+below answer the same queries as mysql_utils, mongodb_utils and
+neo4j_utils from that snapshot with vectorized pandas/NumPy lookups, so the
+dashboard can run read-only with no database servers (DATA_MODE=snapshot).
+
+    python snapshot_utils.py export ./snapshot
+
+Parquet support needs pyarrow (or fastparquet) installed.
+"""
+import argparse
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import db_config
+from keyword_cube import KeywordYearCube
+from keyword_index import KeywordIndex
+from metrics_utils import instrument
+from mongodb_utils import PUBLICATION_PAGE_SIZE, parse_faculty_names
+from mysql_utils import DEFAULT_START_YEAR, KEYWORD_SEARCH_LIMIT, TOP_FACULTY_DEFAULT, TOP_FACULTY_MAX
+from neo4j_utils import MAX_TREND_KEYWORDS, TREND_COLUMNS
+from startup_utils import timed_step
+
+# file name -> columns, for every table in a snapshot
+TABLES = {
+    "keyword_year": ["keyword", "year", "publication_count"],
+    "keywords": ["name"],
+    "faculty": ["id", "name", "photo_url", "university", "position", "research_interest", "email", "phone"],
+    "faculty_keyword_citations": ["faculty_id", "keyword", "total_citations"],
+    "keyword_trend": TREND_COLUMNS,
+    "publications": ["_id", "id", "title", "venue", "year", "numCitations"],
+    "publication_keywords": ["keyword", "publication"],
+    "university_keyword": ["keyword", "university", "facultyCount", "totalCitations"],
+    "faculty_publications": ["faculty", "year", "title"],
+}
+
+
+# Export
+
+def _export_mysql():
+    import mysql_utils
+    mysql_utils.ensure_faculty_keyword_scores()
+    return {
+        "keyword_year": mysql_utils.get_data("""
+            SELECT k.name AS keyword, p.year AS year, COUNT(DISTINCT pk.publication_id) AS publication_count
+            FROM publication_keyword pk
+            JOIN publication p ON pk.publication_id = p.ID
+            JOIN keyword k ON pk.keyword_id = k.id
+            WHERE p.year IS NOT NULL
+            GROUP BY k.name, p.year;
+        """),
+        "keywords": mysql_utils.get_data("SELECT name FROM keyword ORDER BY name;"),
+        "faculty": mysql_utils.get_data("""
+            SELECT f.id, f.name, f.photo_url, u.name AS university, f.position, f.research_interest, f.email, f.phone
+            FROM faculty f
+            JOIN university u ON f.university_id = u.id;
+        """),
+        # The table the live top-faculty query reads, so both rank alike
+        "faculty_keyword_citations": mysql_utils.get_data(
+            "SELECT faculty_id, keyword, total_citations FROM faculty_keyword_score;"),
+    }
+
+
+def _export_mongo():
+    import mongodb_utils
+    mongodb_utils.ensure_university_rollup()
+
+    publications, publication_keywords = [], []
+    cursor = mongodb_utils.publications_collection().find(
+        {}, {"_id": 1, "id": 1, "title": 1, "venue": 1, "year": 1, "numCitations": 1, "keywords.name": 1})
+    pub_titles = {}
+    for row, doc in enumerate(cursor):
+        publications.append({
+            "_id": str(doc["_id"]),
+            "id": doc.get("id"),
+            "title": doc.get("title"),
+            "venue": doc.get("venue"),
+            "year": doc.get("year"),
+            "numCitations": doc.get("numCitations"),
+        })
+        pub_titles[doc.get("id")] = (doc.get("year"), doc.get("title"))
+        for kw in doc.get("keywords", []):
+            publication_keywords.append({"keyword": kw["name"], "publication": row})
+
+    faculty_publications = []
+    for doc in mongodb_utils.faculty_collection().find({}, {"name": 1, "publications": 1}):
+        for pub_id in doc.get("publications", []):
+            if pub_id in pub_titles:
+                year, title = pub_titles[pub_id]
+                faculty_publications.append({"faculty": doc["name"], "year": year, "title": title})
+
+    university_keyword = list(mongodb_utils.university_rollup_collection().find(
+        {}, {"_id": 0, "keyword": 1, "university": 1, "facultyCount": 1, "totalCitations": 1}))
+    return {
+        "publications": pd.DataFrame(publications, columns=TABLES["publications"]),
+        "publication_keywords": pd.DataFrame(publication_keywords, columns=TABLES["publication_keywords"]),
+        "university_keyword": pd.DataFrame(university_keyword, columns=TABLES["university_keyword"]),
+        "faculty_publications": pd.DataFrame(faculty_publications, columns=TABLES["faculty_publications"]),
+    }
+
+
+def _export_neo4j():
+    import neo4j_utils
+    neo4j_utils.ensure_keyword_year_rollup()
+    query = """
+    MATCH (r:KEYWORD_YEAR)
+    RETURN r.year AS year, r.keyword AS keyword, r.publicationCount AS publication_count
+    """
+    with neo4j_utils.get_driver().session(database=neo4j_utils.database) as session:
+        rows = session.run(query).values(*TREND_COLUMNS)
+    return {"keyword_trend": pd.DataFrame(rows, columns=TREND_COLUMNS)}
+
+
+def export_snapshot(directory):
+    """Write every snapshot table to `directory` as Parquet; returns {table: rows}"""
+    os.makedirs(directory, exist_ok=True)
+    tables = {}
+    for name, export in [("mysql", _export_mysql), ("mongo", _export_mongo), ("neo4j", _export_neo4j)]:
+        with timed_step(f"snapshot.export.{name}"):
+            tables.update(export())
+    for name, df in tables.items():
+        df[TABLES[name]].to_parquet(os.path.join(directory, f"{name}.parquet"), index=False)
+    return {name: len(df) for name, df in tables.items()}
+
+
+# Query engine
+
+def _key_slices(sorted_keys):
+    """{key: (start, stop)} for an array already sorted by key"""
+    keys = np.asarray(sorted_keys)
+    if len(keys) == 0:
+        return {}
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    stops = np.r_[starts[1:], len(keys)]
+    return {keys[s]: (int(s), int(e)) for s, e in zip(starts, stops)}
+
+
+class Snapshot:
+    """Snapshot tables pre-sorted by lookup key so each query is one slice"""
+
+    def __init__(self, tables):
+        self.cube = KeywordYearCube(tables["keyword_year"])
+        self.keyword_index = KeywordIndex(tables["keywords"]["name"].tolist())
+        self.keywords = tables["keywords"][["name"]].reset_index(drop=True)
+
+        self.faculty = tables["faculty"].set_index("id", drop=False)
+        self.faculty_scores = tables["faculty_keyword_citations"].sort_values(
+            ["keyword", "total_citations"], ascending=[True, False], kind="stable").reset_index(drop=True)
+        self.faculty_score_slices = _key_slices(self.faculty_scores["keyword"])
+
+        self.trend = tables["keyword_trend"].sort_values(["keyword", "year"], kind="stable").reset_index(drop=True)
+        self.trend_slices = _key_slices(self.trend["keyword"])
+
+        publications = tables["publications"]
+        links = tables["publication_keywords"]
+        keyword_pubs = publications.iloc[links["publication"].to_numpy()].reset_index(drop=True)
+        keyword_pubs.insert(0, "keyword", links["keyword"].to_numpy())
+        self.keyword_publications = keyword_pubs.sort_values(
+            ["keyword", "numCitations"], ascending=[True, False], kind="stable").reset_index(drop=True)
+        self.keyword_publication_slices = _key_slices(self.keyword_publications["keyword"])
+        self.publications_by_id = publications.set_index("_id", drop=False)
+        self.publications_by_title = publications.drop_duplicates("title").set_index("title", drop=False)
+
+        self.universities = tables["university_keyword"].sort_values(
+            ["keyword", "facultyCount"], ascending=[True, False], kind="stable").reset_index(drop=True)
+        self.university_slices = _key_slices(self.universities["keyword"])
+
+        self.faculty_publications = tables["faculty_publications"].sort_values(
+            ["faculty", "year"], ascending=[True, False], kind="stable").reset_index(drop=True)
+        self.faculty_publication_slices = _key_slices(self.faculty_publications["faculty"])
+
+    @classmethod
+    def read(cls, directory):
+        tables = {name: pd.read_parquet(os.path.join(directory, f"{name}.parquet")) for name in TABLES}
+        return cls(tables)
+
+    def slice(self, df, slices, key):
+        start, stop = slices.get(key, (0, 0))
+        return df.iloc[start:stop]
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def load(directory=None):
+    """Load (or reload) the snapshot directory into memory"""
+    global _snapshot
+    snapshot = Snapshot.read(directory or db_config.SNAPSHOT_DIR)
+    with _snapshot_lock:
+        _snapshot = snapshot
+    return snapshot
+
+
+def get_snapshot():
+    snapshot = _snapshot
+    if snapshot is None:
+        with _snapshot_lock:
+            snapshot = _snapshot
+        if snapshot is None:
+            snapshot = load()
+    return snapshot
+
+
+def init():
+    with timed_step("snapshot_utils.load"):
+        get_snapshot()
+
+
+def reset():
+    """Snapshots are read-only files; nothing is tied to the parent process"""
+
+
+# Same functions as the utils modules
+
+@instrument("snapshot")
+def get_publication_year_range():
+    cube = get_snapshot().cube
+    if cube.min_year is None:
+        return DEFAULT_START_YEAR, DEFAULT_START_YEAR
+    return cube.min_year, cube.max_year
+
+
+@instrument("snapshot")
+def get_top_keywords(top_n=5, start_year=DEFAULT_START_YEAR, end_year=None):
+    return get_snapshot().cube.top_keywords(top_n, start_year, end_year)
+
+
+@instrument("snapshot")
+def get_all_keywords():
+    return get_snapshot().keywords
+
+
+@instrument("snapshot")
+def search_keywords(text, limit=KEYWORD_SEARCH_LIMIT):
+    return get_snapshot().keyword_index.search(text, limit)
+
+
+@instrument("snapshot")
+def get_top_faculty_by_keyword(selected_keyword, k=TOP_FACULTY_DEFAULT):
+    snapshot = get_snapshot()
+    scores = snapshot.slice(snapshot.faculty_scores, snapshot.faculty_score_slices, selected_keyword)
+    k = max(1, min(int(k), TOP_FACULTY_MAX))
+    scores = scores[scores["faculty_id"].isin(snapshot.faculty.index)].head(k)
+    faculty = snapshot.faculty.loc[scores["faculty_id"].to_numpy()].reset_index(drop=True)
+    faculty["total_citations"] = scores["total_citations"].to_numpy()
+    return faculty
+
+
+@instrument("snapshot")
+def get_faculty_by_id(faculty_id):
+    faculty = get_snapshot().faculty
+    if faculty_id not in faculty.index:
+        return None
+    return faculty.loc[faculty_id].to_dict()
+
+
+@instrument("snapshot")
+def get_keyword_trend(keywords, limit=MAX_TREND_KEYWORDS):
+    snapshot = get_snapshot()
+    keywords = list(dict.fromkeys(keywords))[:limit]
+    parts = [snapshot.slice(snapshot.trend, snapshot.trend_slices, kw) for kw in keywords]
+    if not parts:
+        return pd.DataFrame(columns=TREND_COLUMNS)
+    return pd.concat(parts, ignore_index=True)[TREND_COLUMNS]
+
+
+@instrument("snapshot")
+def get_keyword_series(keywords):
+    snapshot = get_snapshot()
+    return {kw: snapshot.slice(snapshot.trend, snapshot.trend_slices, kw).reset_index(drop=True)[TREND_COLUMNS]
+            for kw in dict.fromkeys(keywords)}
+
+
+@instrument("snapshot")
+def get_top_publications(keyword, page=0, page_size=PUBLICATION_PAGE_SIZE):
+    snapshot = get_snapshot()
+    rows = snapshot.slice(snapshot.keyword_publications, snapshot.keyword_publication_slices, keyword)
+    page_rows = rows.iloc[page * page_size:(page + 1) * page_size]
+    return page_rows[["_id", "id", "title", "venue", "year", "numCitations"]].to_dict("records")
+
+
+@instrument("snapshot")
+def count_publications_by_keyword(keyword):
+    start, stop = get_snapshot().keyword_publication_slices.get(keyword, (0, 0))
+    return stop - start
+
+
+@instrument("snapshot")
+def get_universities_by_keyword(keyword):
+    snapshot = get_snapshot()
+    rows = snapshot.slice(snapshot.universities, snapshot.university_slices, keyword).head(50)
+    return rows[["university", "facultyCount", "totalCitations"]].to_dict("records")
+
+
+@instrument("snapshot")
+def iter_publications_for_faculty(faculty_names, page=0, page_size=None, newest_first=True, batch_size=None):
+    if not faculty_names:
+        return
+    snapshot = get_snapshot()
+    parts = [snapshot.slice(snapshot.faculty_publications, snapshot.faculty_publication_slices, name)
+             for name in parse_faculty_names(faculty_names)]
+    if not parts:
+        return
+    rows = pd.concat(parts).sort_values("year", ascending=not newest_first, kind="stable")
+    if page_size:
+        rows = rows.iloc[page * page_size:(page + 1) * page_size]
+    yield from rows.to_dict("records")
+
+
+def get_publications_for_faculty(faculty_names, page=0, page_size=None, newest_first=True):
+    return list(iter_publications_for_faculty(faculty_names, page, page_size, newest_first))
+
+
+@instrument("snapshot")
+def get_publication_by_title(title):
+    publications = get_snapshot().publications_by_title
+    if title not in publications.index:
+        return None
+    return publications.loc[title].to_dict()
+
+
+@instrument("snapshot")
+def get_publication_by_id(id_str):
+    publications = get_snapshot().publications_by_id
+    if str(id_str) not in publications.index:
+        return None
+    return publications.loc[str(id_str)].to_dict()
+
+
+# Snapshots are read-only: writes are refused the same way invalid edits are
+
+def update_publication(pub_id, new_citations, expected=None):
+    return False
+
+
+def queue_citation_update(pub_id, new_citations, expected=None, publication_id=None):
+    return False
+
+
+def flush_citation_updates():
+    return {}
+
+
+def update_publication_citations(publication_id, new_citations):
+    return False
+
+
+def update_faculty_photo_url(faculty_id, new_photo_url):
+    return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export = subparsers.add_parser("export", help="write a snapshot of the live databases")
+    export.add_argument("directory", nargs="?", default=db_config.SNAPSHOT_DIR)
+    options = parser.parse_args(argv)
+
+    if options.command == "export":
+        start = time.perf_counter()
+        sizes = export_snapshot(options.directory)
+        for name, rows in sizes.items():
+            print(f"{name:<28} {rows:>10} rows")
+        print(f"Exported to {options.directory} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+# Callables run by init_all_in_background once the backends are initialised
+_warmups = []
+
+# (step name, seconds, error or None) in completion order
+_timings = []
+_timings_lock = threading.Lock()
+
+
+@contextmanager
+def timed_step(name):
+    """Record how long a startup step took, including failed ones"""
+    start = time.perf_counter()
+    error = None
+    try:
+        yield
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        with _timings_lock:
+            _timings.append((name, elapsed, repr(error) if error else None))
+
+
+def get_startup_timings():
+    """Returns a list of {step, ms, error} dicts in completion order"""
+    with _timings_lock:
+        return [{"step": name, "ms": round(seconds * 1000, 2), "error": error}
+                for name, seconds, error in _timings]
+
+
+def print_startup_timings():
+    for timing in get_startup_timings():
+        status = f"failed: {timing['error']}" if timing['error'] else "ok"
+        print(f"[startup] {timing['step']:<24} {timing['ms']:>10.2f} ms  {status}")
+
+
+def _backend_modules():
+    import db_config
+    if db_config.DATA_MODE == "snapshot":
+        import snapshot_utils
+        return [snapshot_utils]
+    import mongodb_utils
+    import mysql_utils
+    import neo4j_utils
+    return [mysql_utils, mongodb_utils, neo4j_utils]
+
+
+def reset_all():
+    """Drop every backend connection inherited across fork so each worker opens its own"""
+    for module in _backend_modules():
+        module.reset()
+
+
+def recommended_worker_count():
+    """The usual (2 x cores) + 1 process-worker count for the cores this process may use"""
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = os.cpu_count() or 1
+    return 2 * cores + 1
+
+
+def init_all(parallel=True):
+    """
+    Connect to every backend and set up its schema.
+
+    Each module's init() runs in its own thread when parallel is True, so a
+    slow database only delays its own widgets. Failures are recorded in the
+    startup timings rather than raised; the module retries lazily on first use.
+    """
+    modules = _backend_modules()
+
+    def run(module):
+        try:
+            with timed_step(f"{module.__name__}.init"):
+                module.init()
+        except Exception as e:
+            print(f"{module.__name__} initialisation failed: {e}")
+
+    if parallel:
+        with ThreadPoolExecutor(max_workers=len(modules)) as pool:
+            list(pool.map(run, modules))
+    else:
+        for module in modules:
+            run(module)
+    return get_startup_timings()
+
+
+def register_warmup(func):
+    """Run func() after the background initialisation (e.g. to pre-render figures)"""
+    _warmups.append(func)
+    return func
+
+
+def run_warmups():
+    """Run every registered warm-up now; failures are printed and recorded in the timings"""
+    for func in _warmups:
+        try:
+            with timed_step(f"warmup.{func.__name__}"):
+                func()
+        except Exception as e:
+            print(f"Warm-up {func.__name__} failed: {e}")
+
+
+def init_all_in_background():
+    """Run init_all, then the registered warm-ups, on a daemon thread and return the thread"""
+    def run():
+        init_all()
+        run_warmups()
+        print_startup_timings()
+
+    thread = threading.Thread(target=run, name="backend-init", daemon=True)
+    thread.start()
+    return thread
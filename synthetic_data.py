@@ -0,0 +1,325 @@
+"""
+Synthetic academicworld-shaped dataset for benchmarks and load tests.
+
+generate_dataset() builds universities, faculty, keywords and publications
+plus the link tables, with skewed (Zipf-like) keyword popularity and
+publication authorship so hot keywords behave like the real ones. The
+load_* functions write the same dataset into MySQL (or SQLite), MongoDB
+(or mongomock) and Neo4j in the shapes the utils modules query, and
+write_source() writes it as a bulk_loader source directory:
+
+    python synthetic_data.py medium ./source
+"""
+import itertools
+import json
+import os
+import sys
+
+from bson import json_util
+import numpy as np
+import pandas as pd
+import sqlalchemy as sa
+
+# Named scales; any of the counts can also be passed directly
+SCALES = {
+    "tiny": {"universities": 5, "faculty": 50, "keywords": 60, "publications": 400},
+    "small": {"universities": 20, "faculty": 500, "keywords": 400, "publications": 5000},
+    "medium": {"universities": 60, "faculty": 3000, "keywords": 1500, "publications": 40000},
+    "large": {"universities": 150, "faculty": 15000, "keywords": 5000, "publications": 250000},
+}
+
+KEYWORDS_PER_PUBLICATION = (1, 6)
+AUTHORS_PER_PUBLICATION = (1, 4)
+KEYWORDS_PER_FACULTY = (3, 12)
+YEAR_RANGE = (1980, 2023)
+
+_WORDS = [
+    "learning", "machine", "network", "data", "graph", "neural", "vision", "language", "system",
+    "security", "quantum", "robot", "control", "signal", "cloud", "energy", "protein", "genome",
+    "optimization", "inference", "privacy", "storage", "compiler", "sensor", "wireless", "imaging",
+    "semantic", "distributed", "parallel", "database", "statistics", "theory", "model", "analysis",
+]
+_FIRST_NAMES = ["Peggy", "Tim", "Ana", "Wei", "Ravi", "Maria", "John", "Li", "Sara", "Omar", "Kim", "Jose"]
+_LAST_NAMES = ["Agouris", "Davis", "Chen", "Singh", "Garcia", "Smith", "Wang", "Khan", "Lee", "Lopez", "Kumar", "Brown"]
+_POSITIONS = ["Professor", "Associate Professor", "Assistant Professor", "Lecturer"]
+
+
+def _zipf_weights(n, exponent=1.1):
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+
+def _keyword_names(n, rng):
+    """n distinct names of two distinct words, then of three once those run out, and so on"""
+    names = []
+    size = 2
+    while len(names) < n:
+        candidates = list(itertools.permutations(_WORDS, size))
+        picked = rng.permutation(len(candidates))[:n - len(names)]
+        names.extend(" ".join(candidates[i]) for i in picked)
+        size += 1
+    return names
+
+
+def _sizes(scale):
+    if isinstance(scale, str):
+        return dict(SCALES[scale])
+    sizes = dict(SCALES["small"])
+    sizes.update(scale)
+    return sizes
+
+
+def generate_dataset(scale="small", seed=0):
+    """
+    Returns:
+        dict: {"sizes": {...}, "tables": {table name: DataFrame}} where the
+        tables follow the academicworld MySQL schema
+    """
+    sizes = _sizes(scale)
+    rng = np.random.default_rng(seed)
+    n_uni, n_fac, n_kw, n_pub = sizes["universities"], sizes["faculty"], sizes["keywords"], sizes["publications"]
+
+    university = pd.DataFrame({
+        "id": np.arange(1, n_uni + 1),
+        "name": [f"University {i}" for i in range(1, n_uni + 1)],
+        "photo_url": [f"https://example.org/university/{i}.png" for i in range(1, n_uni + 1)],
+    })
+
+    keyword_names = _keyword_names(n_kw, rng)
+    keyword = pd.DataFrame({"id": np.arange(1, n_kw + 1), "name": keyword_names})
+
+    first = rng.choice(_FIRST_NAMES, n_fac)
+    last = rng.choice(_LAST_NAMES, n_fac)
+    faculty_ids = np.arange(1, n_fac + 1)
+    faculty = pd.DataFrame({
+        "id": faculty_ids,
+        # Suffix the last name so "First Last" searches are unique
+        "name": [f"{f} {l}{i}" for f, l, i in zip(first, last, faculty_ids)],
+        "position": rng.choice(_POSITIONS, n_fac),
+        "research_interest": [keyword_names[i] for i in rng.integers(0, n_kw, n_fac)],
+        "email": [f"faculty{i}@example.org" for i in faculty_ids],
+        "phone": [f"555-{i:07d}" for i in faculty_ids],
+        "photo_url": [f"https://example.org/faculty/{i}.png" for i in faculty_ids],
+        "university_id": rng.choice(university["id"], n_fac, p=_zipf_weights(n_uni, 0.8)),
+    })
+
+    years = rng.integers(YEAR_RANGE[0], YEAR_RANGE[1] + 1, n_pub)
+    # Recent years are busier, as in the real data
+    years = np.maximum(years, rng.integers(YEAR_RANGE[0], YEAR_RANGE[1] + 1, n_pub))
+    publication = pd.DataFrame({
+        "ID": np.arange(1, n_pub + 1),
+        "title": [f"Publication {i}" for i in range(1, n_pub + 1)],
+        "venue": [f"Venue {v}" for v in rng.integers(1, 200, n_pub)],
+        "year": years,
+        "num_citations": rng.zipf(1.6, n_pub).clip(0, 20000) - 1,
+    })
+
+    kw_weights = _zipf_weights(n_kw)
+    counts = rng.integers(KEYWORDS_PER_PUBLICATION[0], KEYWORDS_PER_PUBLICATION[1] + 1, n_pub)
+    publication_keyword = pd.DataFrame({
+        "publication_id": np.repeat(publication["ID"].to_numpy(), counts),
+        "keyword_id": rng.choice(keyword["id"], counts.sum(), p=kw_weights),
+    }).drop_duplicates()
+    publication_keyword["score"] = rng.random(len(publication_keyword)).round(4)
+
+    fac_weights = _zipf_weights(n_fac, 0.7)
+    counts = rng.integers(AUTHORS_PER_PUBLICATION[0], AUTHORS_PER_PUBLICATION[1] + 1, n_pub)
+    faculty_publication = pd.DataFrame({
+        "faculty_Id": rng.choice(faculty_ids, counts.sum(), p=fac_weights),
+        "publication_Id": np.repeat(publication["ID"].to_numpy(), counts),
+    }).drop_duplicates()
+
+    counts = rng.integers(KEYWORDS_PER_FACULTY[0], KEYWORDS_PER_FACULTY[1] + 1, n_fac)
+    faculty_keyword = pd.DataFrame({
+        "faculty_id": np.repeat(faculty_ids, counts),
+        "keyword_id": rng.choice(keyword["id"], counts.sum(), p=kw_weights),
+    }).drop_duplicates()
+    faculty_keyword["score"] = rng.random(len(faculty_keyword)).round(4)
+
+    tables = {
+        "university": university,
+        "faculty": faculty,
+        "keyword": keyword,
+        "publication": publication,
+        "publication_keyword": publication_keyword.reset_index(drop=True),
+        "faculty_publication": faculty_publication.reset_index(drop=True),
+        "faculty_keyword": faculty_keyword.reset_index(drop=True),
+    }
+    sizes = {name: len(df) for name, df in tables.items()}
+    return {"sizes": sizes, "tables": tables}
+
+
+# MySQL / SQLite
+
+def mysql_metadata():
+    """The academicworld MySQL tables (also used by bulk_loader)"""
+    metadata = sa.MetaData()
+    sa.Table("university", metadata,
+             sa.Column("id", sa.Integer, primary_key=True),
+             sa.Column("name", sa.String(512)),
+             sa.Column("photo_url", sa.String(512)))
+    sa.Table("faculty", metadata,
+             sa.Column("id", sa.Integer, primary_key=True),
+             sa.Column("name", sa.String(512)),
+             sa.Column("position", sa.String(512)),
+             sa.Column("research_interest", sa.String(512)),
+             sa.Column("email", sa.String(512)),
+             sa.Column("phone", sa.String(512)),
+             sa.Column("photo_url", sa.String(512)),
+             sa.Column("university_id", sa.Integer))
+    sa.Table("keyword", metadata,
+             sa.Column("id", sa.Integer, primary_key=True),
+             sa.Column("name", sa.String(512)))
+    sa.Table("publication", metadata,
+             sa.Column("ID", sa.Integer, primary_key=True),
+             sa.Column("title", sa.String(512)),
+             sa.Column("venue", sa.String(512)),
+             sa.Column("year", sa.Integer),
+             sa.Column("num_citations", sa.Integer))
+    sa.Table("publication_keyword", metadata,
+             sa.Column("publication_id", sa.Integer, primary_key=True),
+             sa.Column("keyword_id", sa.Integer, primary_key=True),
+             sa.Column("score", sa.Float))
+    sa.Table("faculty_publication", metadata,
+             sa.Column("faculty_Id", sa.Integer, primary_key=True),
+             sa.Column("publication_Id", sa.Integer, primary_key=True))
+    sa.Table("faculty_keyword", metadata,
+             sa.Column("faculty_id", sa.Integer, primary_key=True),
+             sa.Column("keyword_id", sa.Integer, primary_key=True),
+             sa.Column("score", sa.Float))
+    return metadata
+
+
+def load_mysql(dataset, url, chunksize=5000):
+    """(Re)create the academicworld tables at `url` and insert the dataset"""
+    engine = sa.create_engine(url)
+    metadata = mysql_metadata()
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+    with engine.begin() as connection:
+        for name, df in dataset["tables"].items():
+            records = df.to_dict("records")
+            for start in range(0, len(records), chunksize):
+                connection.execute(metadata.tables[name].insert(), records[start:start + chunksize])
+    engine.dispose()
+
+
+# MongoDB / mongomock
+
+def mongo_documents(dataset):
+    """Build the publications and faculty documents the Mongo queries expect"""
+    t = dataset["tables"]
+    keyword_names = dict(zip(t["keyword"]["id"], t["keyword"]["name"]))
+    university_names = dict(zip(t["university"]["id"], t["university"]["name"]))
+
+    pub_keywords = {}
+    for pub_id, kw_id, score in t["publication_keyword"].itertuples(index=False):
+        pub_keywords.setdefault(int(pub_id), []).append(
+            {"id": int(kw_id), "name": keyword_names[kw_id], "score": float(score)})
+    publications = [
+        {"id": int(p.ID), "title": p.title, "venue": p.venue, "year": int(p.year),
+         "numCitations": int(p.num_citations), "keywords": pub_keywords.get(int(p.ID), [])}
+        for p in t["publication"].itertuples(index=False)
+    ]
+
+    citations = dict(zip(t["publication"]["ID"], t["publication"]["num_citations"]))
+    fac_pubs, fac_citations = {}, {}
+    for fac_id, pub_id in t["faculty_publication"].itertuples(index=False):
+        fac_pubs.setdefault(int(fac_id), []).append(int(pub_id))
+        fac_citations[int(fac_id)] = fac_citations.get(int(fac_id), 0) + int(citations[pub_id])
+    fac_keywords = {}
+    for fac_id, kw_id, score in t["faculty_keyword"].itertuples(index=False):
+        fac_keywords.setdefault(int(fac_id), []).append(
+            {"id": int(kw_id), "name": keyword_names[kw_id], "score": float(score)})
+
+    faculty = []
+    for f in t["faculty"].itertuples(index=False):
+        first, last = f.name.split(" ", 1)
+        faculty.append({
+            "id": int(f.id),
+            # Stored as "Last,First", matching mongodb_utils.parse_faculty_names
+            "name": f"{last},{first}",
+            "position": f.position,
+            "researchInterest": f.research_interest,
+            "email": f.email,
+            "phone": f.phone,
+            "photoUrl": f.photo_url,
+            "affiliation": {"id": int(f.university_id), "name": university_names[f.university_id]},
+            "keywords": fac_keywords.get(int(f.id), []),
+            "publications": fac_pubs.get(int(f.id), []),
+            "numCitations": fac_citations.get(int(f.id), 0),
+        })
+    return {"publications": publications, "faculty": faculty}
+
+
+def load_mongo(dataset, db, chunksize=5000):
+    """Replace the publications and faculty collections of `db` with the dataset"""
+    for name, docs in mongo_documents(dataset).items():
+        db[name].drop()
+        for start in range(0, len(docs), chunksize):
+            db[name].insert_many(docs[start:start + chunksize], ordered=False)
+
+
+# Neo4j
+
+def load_neo4j(dataset, driver, database, batch_size=5000):
+    """Replace the graph in `database` with the dataset's keyword/publication/faculty graph"""
+    t = dataset["tables"]
+
+    def batches(df):
+        records = df.to_dict("records")
+        for start in range(0, len(records), batch_size):
+            yield records[start:start + batch_size]
+
+    with driver.session(database=database) as session:
+        session.run("MATCH (n) CALL { WITH n DETACH DELETE n } IN TRANSACTIONS OF 10000 ROWS").consume()
+        for rows in batches(t["keyword"]):
+            session.run("UNWIND $rows AS r CREATE (:KEYWORD {id: r.id, name: r.name})", rows=rows).consume()
+        for rows in batches(t["publication"]):
+            session.run("UNWIND $rows AS r CREATE (:PUBLICATION {id: r.ID, title: r.title, venue: r.venue, "
+                        "year: r.year, numCitations: r.num_citations})", rows=rows).consume()
+        for rows in batches(t["university"]):
+            session.run("UNWIND $rows AS r CREATE (:INSTITUTE {id: r.id, name: r.name})", rows=rows).consume()
+        for rows in batches(t["faculty"]):
+            session.run("UNWIND $rows AS r CREATE (:FACULTY {id: r.id, name: r.name, position: r.position})",
+                        rows=rows).consume()
+        for label, key in [("KEYWORD", "id"), ("PUBLICATION", "id"), ("FACULTY", "id"), ("INSTITUTE", "id")]:
+            session.run(f"CREATE INDEX {label.lower()}_{key} IF NOT EXISTS FOR (n:{label}) ON (n.{key})").consume()
+        for rows in batches(t["publication_keyword"]):
+            session.run("UNWIND $rows AS r MATCH (p:PUBLICATION {id: r.publication_id}), (k:KEYWORD {id: r.keyword_id}) "
+                        "CREATE (p)-[:LABEL_BY {score: r.score}]->(k)", rows=rows).consume()
+        for rows in batches(t["faculty_publication"]):
+            session.run("UNWIND $rows AS r MATCH (f:FACULTY {id: r.faculty_Id}), (p:PUBLICATION {id: r.publication_Id}) "
+                        "CREATE (f)-[:PUBLISH]->(p)", rows=rows).consume()
+        for rows in batches(t["faculty"][["id", "university_id"]]):
+            session.run("UNWIND $rows AS r MATCH (f:FACULTY {id: r.id}), (i:INSTITUTE {id: r.university_id}) "
+                        "CREATE (f)-[:AFFILIATION_WITH]->(i)", rows=rows).consume()
+        for rows in batches(t["faculty_keyword"]):
+            session.run("UNWIND $rows AS r MATCH (f:FACULTY {id: r.faculty_id}), (k:KEYWORD {id: r.keyword_id}) "
+                        "CREATE (f)-[:INTERESTED_IN {score: r.score}]->(k)", rows=rows).consume()
+
+
+# bulk_loader source files
+
+def write_source(dataset, directory):
+    """
+    Write the dataset as JSON lines: mysql/<table>.jsonl with one row per
+    line and mongo/<collection>.jsonl with one document per line (the
+    format mongoexport produces)
+    """
+    os.makedirs(os.path.join(directory, "mysql"), exist_ok=True)
+    os.makedirs(os.path.join(directory, "mongo"), exist_ok=True)
+    for name, df in dataset["tables"].items():
+        with open(os.path.join(directory, "mysql", f"{name}.jsonl"), "w") as f:
+            for record in df.to_dict("records"):
+                f.write(json.dumps(record, default=int) + "\n")
+    for name, docs in mongo_documents(dataset).items():
+        with open(os.path.join(directory, "mongo", f"{name}.jsonl"), "w") as f:
+            for doc in docs:
+                f.write(json_util.dumps(doc) + "\n")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: python synthetic_data.py SCALE DIRECTORY")
+    write_source(generate_dataset(sys.argv[1]), sys.argv[2])
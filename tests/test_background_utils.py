@@ -0,0 +1,65 @@
+import threading
+import time
+
+import diskcache
+
+from background_utils import ThreadPoolManager
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def make_manager(tmp_path):
+    return ThreadPoolManager(diskcache.Cache(str(tmp_path)), workers=1)
+
+
+def job_fn(manager, calls, release=None):
+    def run(key, progress_key, args, context):
+        calls.append(args)
+        if release is not None:
+            release.wait(5)
+        manager.handle.set(key, args * 2)
+    return run
+
+
+def test_job_runs_in_the_pool_and_its_result_is_read_once(tmp_path):
+    manager = make_manager(tmp_path)
+    calls = []
+    job = manager.call_job_fn("key", job_fn(manager, calls), 21, {})
+    wait_until(lambda: not manager.job_running(job))
+    assert calls == [21]
+    assert manager.get_result("key", job) == 42
+    assert manager.get_result("key", job) is manager.UNDEFINED
+
+
+def test_job_cancelled_while_queued_never_runs(tmp_path):
+    manager = make_manager(tmp_path)
+    calls, release = [], threading.Event()
+    first = manager.call_job_fn("first", job_fn(manager, calls, release), 1, {})
+    queued = manager.call_job_fn("queued", job_fn(manager, calls), 2, {})
+    assert manager.job_running(queued)
+
+    manager.terminate_job(queued)
+    assert not manager.job_running(queued)
+    release.set()
+    wait_until(lambda: not manager.job_running(first))
+    manager._pool.shutdown(wait=True)
+    assert calls == [1]
+    assert manager.get_result("queued", queued) is manager.UNDEFINED
+
+
+def test_job_cancelled_while_running_stops_being_awaited(tmp_path):
+    manager = make_manager(tmp_path)
+    calls, release = [], threading.Event()
+    job = manager.call_job_fn("key", job_fn(manager, calls, release), 1, {})
+    wait_until(lambda: calls)
+
+    manager.terminate_job(job)
+    assert not manager.job_running(job)
+    release.set()
+    manager._pool.shutdown(wait=True)
+    assert not manager.job_running(job)
@@ -0,0 +1,70 @@
+from cache_utils import Generations, ResultCache, cached
+
+
+def worker_caches(tmp_path):
+    # Two workers: separate caches sharing one invalidation directory
+    return (ResultCache(generations=Generations(str(tmp_path))),
+            ResultCache(generations=Generations(str(tmp_path))))
+
+
+def test_invalidation_reaches_other_processes(tmp_path):
+    first, second = worker_caches(tmp_path)
+    first.set("a", 1, [("faculty", 1)])
+    second.set("a", 1, [("faculty", 1)])
+    second.set("b", 2, [("faculty", 2)])
+
+    first.invalidate_tags(("faculty", 1))
+
+    assert first.get("a") == (False, None)
+    assert second.get("a") == (False, None)
+    assert second.get("b") == (True, 2)
+
+
+def test_invalidate_function_reaches_other_processes(tmp_path):
+    first, second = worker_caches(tmp_path)
+    key = (__name__, "f", ())
+    second.set(key, 1)
+
+    class f:
+        __module__ = __name__
+        __qualname__ = "f"
+
+    first.invalidate_function(f)
+    assert second.get(key) == (False, None)
+
+
+def test_value_computed_before_an_invalidation_is_not_stored(tmp_path):
+    first, second = worker_caches(tmp_path)
+    generation = second.generation()
+    first.invalidate_tags(("faculty", 1))
+    second.set("a", "stale", [("faculty", 1)], generation=generation)
+    assert second.get("a") == (False, None)
+
+    second.set("a", "fresh", [("faculty", 1)], generation=second.generation())
+    assert second.get("a") == (True, "fresh")
+
+
+def test_cached_skips_the_store_when_invalidated_during_the_call(tmp_path):
+    first, second = worker_caches(tmp_path)
+    calls = []
+
+    @cached(tags=lambda arguments, result: [("keyword", arguments["keyword"])], cache=second)
+    def lookup(keyword):
+        calls.append(keyword)
+        if len(calls) == 1:
+            first.invalidate_tags(("keyword", keyword))
+        return len(calls)
+
+    assert lookup("ml") == 1
+    assert lookup("ml") == 2
+    assert lookup("ml") == 2
+
+
+def test_without_a_directory_invalidations_stay_in_process():
+    cache = ResultCache(generations=Generations())
+    cache.set("a", 1, [("t", 1)])
+    generation = cache.generation()
+    cache.invalidate_tags(("t", 1))
+    assert cache.get("a") == (False, None)
+    cache.set("a", 1, [("t", 1)], generation=generation)
+    assert cache.get("a") == (False, None)
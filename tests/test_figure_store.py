@@ -0,0 +1,115 @@
+import threading
+import time
+
+import pandas as pd
+
+from figure_store import FigureStore
+
+
+class TopKeywords:
+    """Stands in for get_top_keywords; records the year ranges it was asked for"""
+
+    def __init__(self, keywords=20, delay=0):
+        self.keywords = keywords
+        self.delay = delay
+        self.calls = []
+
+    def __call__(self, top_n, start_year, end_year):
+        self.calls.append((start_year, end_year))
+        time.sleep(self.delay)
+        n = min(top_n, self.keywords)
+        return pd.DataFrame({"keyword": [f"kw{i}" for i in range(n)],
+                             "popularity": [end_year - start_year + 100 - i for i in range(n)]})
+
+
+def test_top_n_figures_are_prefixes_of_one_render():
+    load = TopKeywords()
+    store = FigureStore(load, max_top_n=10)
+    ten = store.get(10, 2000, 2010)
+    five = store.get(5, 2000, 2010)
+
+    assert load.calls == [(2000, 2010)]
+    assert [trace["name"] for trace in ten["data"]] == [f"kw{i}" for i in range(10)]
+    assert five["data"] == ten["data"][:5]
+    assert five["layout"]["title"]["text"] == "Top 5 Keywords (2000-2010)"
+    # Every top-N shares the scale of the largest bubble
+    assert {trace["marker"]["sizeref"] for trace in ten["data"]} == {2 * 110 / 60 ** 2}
+    assert store.get(5, 2000, 2010) is five
+    assert len(store.get(50, 2000, 2010)["data"]) == 10
+
+
+def test_least_recently_used_range_is_evicted():
+    load = TopKeywords()
+    store = FigureStore(load, max_ranges=2)
+    store.get(5, 2000, 2010)
+    store.get(5, 2001, 2010)
+    store.get(5, 2000, 2010)  # hit; 2001 becomes the oldest
+    store.get(5, 2002, 2010)
+    store.get(5, 2000, 2010)
+    store.get(5, 2001, 2010)
+
+    assert load.calls == [(2000, 2010), (2001, 2010), (2002, 2010), (2001, 2010)]
+
+
+def test_concurrent_misses_render_once():
+    load = TopKeywords(delay=0.2)
+    store = FigureStore(load)
+    figures = []
+    threads = [threading.Thread(target=lambda: figures.append(store.get(5, 2000, 2010))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert load.calls == [(2000, 2010)]
+    assert len(figures) == 8 and all(figure is figures[0] for figure in figures)
+
+
+def test_failed_render_reaches_waiters_and_is_not_stored():
+    def load(top_n, start_year, end_year):
+        time.sleep(0.1)
+        raise RuntimeError("database down")
+
+    store = FigureStore(load)
+    errors = []
+
+    def get():
+        try:
+            store.get(5, 2000, 2010)
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=get) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(errors) == 3
+
+    store.load_top_keywords = TopKeywords()
+    assert len(store.get(5, 2000, 2010)["data"]) == 5
+
+
+def test_refresh_renders_again_only_when_data_changed():
+    load = TopKeywords(keywords=3)
+    changed = []
+    store = FigureStore(load, refresh_data=lambda: changed.pop() if changed else False)
+    before = store.get(5, 2000, 2010)
+
+    assert not store.refresh()
+    assert store.get(5, 2000, 2010) is before
+    assert load.calls == [(2000, 2010)]
+
+    load.keywords = 5
+    changed.append(True)
+    assert store.refresh()
+    assert load.calls == [(2000, 2010), (2000, 2010)]
+    assert len(store.get(5, 2000, 2010)["data"]) == 5
+
+
+def test_refresh_without_refresh_data_keeps_figures():
+    load = TopKeywords()
+    store = FigureStore(load)
+    store.get(5, 2000, 2010)
+    assert not store.refresh()
+    assert load.calls == [(2000, 2010)]
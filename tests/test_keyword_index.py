@@ -0,0 +1,58 @@
+import sqlalchemy as sa
+
+import mysql_utils
+import synthetic_data
+from keyword_index import KeywordIndex
+
+NAMES = ["machine learning", "Deep Learning", "learning theory", "Machine Vision", "data mining",
+         "reinforcement learning", "graph learning", "databases", "", None]
+
+
+def test_prefix_matches_come_before_substring_matches():
+    index = KeywordIndex(NAMES)
+    assert index.search("learning") == ["learning theory", "Deep Learning", "graph learning",
+                                        "machine learning", "reinforcement learning"]
+
+
+def test_search_folds_case_and_whitespace():
+    index = KeywordIndex(NAMES)
+    assert index.search("  MACHINE ") == ["machine learning", "Machine Vision"]
+    assert index.search("deep") == ["Deep Learning"]
+
+
+def test_results_are_sorted_case_insensitively_within_each_group():
+    index = KeywordIndex(NAMES)
+    assert index.search("data") == ["data mining", "databases"]
+    assert index.search("in") == ["data mining", "Deep Learning", "graph learning", "learning theory",
+                                  "machine learning", "Machine Vision", "reinforcement learning"]
+
+
+def test_limit_caps_prefix_and_substring_matches():
+    index = KeywordIndex(NAMES)
+    assert index.search("learning", limit=2) == ["learning theory", "Deep Learning"]
+    assert index.search("learning", limit=1) == ["learning theory"]
+    assert index.search("l", limit=3) == ["learning theory", "Deep Learning", "graph learning"]
+
+
+def test_empty_query_lists_names_and_blank_names_are_dropped():
+    index = KeywordIndex(NAMES)
+    assert len(index) == 8
+    assert index.search("", limit=3) == ["data mining", "databases", "Deep Learning"]
+    assert index.search(None, limit=1) == ["data mining"]
+    assert index.search("quantum") == []
+
+
+def test_refresh_picks_up_catalogue_changes(tmp_path):
+    url = f"sqlite:///{tmp_path / 'keywords.db'}"
+    synthetic_data.load_mysql(synthetic_data.generate_dataset("tiny"), url)
+    mysql_utils.configure(url)
+    assert mysql_utils.search_keywords("zz new keyword") == []
+
+    with mysql_utils.pooled_connection() as connection:
+        connection.execute(sa.text("INSERT INTO keyword (id, name) VALUES (999999, 'ZZ New Keyword')"))
+        connection.commit()
+    # The index is only rebuilt on refresh
+    assert mysql_utils.search_keywords("zz new keyword") == []
+    mysql_utils.refresh_keyword_index()
+    assert mysql_utils.search_keywords("zz new") == ["ZZ New Keyword"]
+    assert mysql_utils.search_keywords("new keyword") == ["ZZ New Keyword"]
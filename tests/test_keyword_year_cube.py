@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+import pytest
+import sqlalchemy as sa
+
+import mysql_utils
+import synthetic_data
+from keyword_cube import KeywordYearCube
+
+
+def brute_force(counts_df, start_year, end_year):
+    rows = counts_df[(counts_df["year"] >= start_year) & (counts_df["year"] <= end_year)]
+    return rows.groupby("keyword")["publication_count"].sum()
+
+
+@pytest.fixture(scope="module")
+def counts_df():
+    rng = np.random.default_rng(0)
+    keywords = [f"kw{i}" for i in range(30)]
+    df = pd.DataFrame({
+        "keyword": rng.choice(keywords, 400),
+        "year": rng.integers(2000, 2021, 400),
+        "publication_count": rng.integers(1, 50, 400),
+    })
+    # Duplicate (keyword, year) rows are summed
+    return df.groupby(["keyword", "year"], as_index=False)["publication_count"].sum()
+
+
+@pytest.mark.parametrize("start_year, end_year", [
+    (2000, 2020), (2005, 2012), (2010, 2010), (2000, 2000), (2020, 2020), (1990, 2005), (2015, 2040),
+])
+def test_range_counts_match_groupby(counts_df, start_year, end_year):
+    cube = KeywordYearCube(counts_df)
+    expected = brute_force(counts_df, start_year, end_year).reindex(cube.keywords, fill_value=0)
+    assert cube.range_counts(start_year, end_year).tolist() == expected.tolist()
+
+
+def test_open_range_covers_every_year(counts_df):
+    cube = KeywordYearCube(counts_df)
+    expected = counts_df.groupby("keyword")["publication_count"].sum().reindex(cube.keywords)
+    assert cube.range_counts().tolist() == expected.tolist()
+    assert (cube.min_year, cube.max_year) == (counts_df["year"].min(), counts_df["year"].max())
+
+
+@pytest.mark.parametrize("start_year, end_year", [(1980, 1990), (2030, 2040), (2012, 2010)])
+def test_ranges_without_data_count_nothing(counts_df, start_year, end_year):
+    cube = KeywordYearCube(counts_df)
+    assert not cube.range_counts(start_year, end_year).any()
+    assert cube.top_keywords(5, start_year, end_year).empty
+
+
+@pytest.mark.parametrize("top_n", [1, 5, 30, 100])
+def test_top_keywords_match_groupby(counts_df, top_n):
+    cube = KeywordYearCube(counts_df)
+    totals = brute_force(counts_df, 2005, 2015)
+    expected = (totals[totals > 0].rename("popularity").reset_index()
+                .sort_values(["popularity", "keyword"], ascending=[False, True]).head(top_n))
+    top = cube.top_keywords(top_n, 2005, 2015)
+    assert top["keyword"].tolist() == expected["keyword"].tolist()
+    assert top["popularity"].tolist() == expected["popularity"].tolist()
+
+
+def test_empty_cube():
+    cube = KeywordYearCube(pd.DataFrame({"keyword": [], "year": [], "publication_count": []}))
+    assert cube.min_year is None
+    assert cube.top_keywords(5, 2000, 2020).empty
+
+
+def test_refresh_rebuilds_from_the_database(tmp_path):
+    dataset = synthetic_data.generate_dataset("tiny")
+    url = f"sqlite:///{tmp_path / 'cube.db'}"
+    synthetic_data.load_mysql(dataset, url)
+    mysql_utils.configure(url)
+
+    t = dataset["tables"]
+    rows = t["publication_keyword"].merge(t["publication"], left_on="publication_id", right_on="ID")
+    rows = rows.merge(t["keyword"], left_on="keyword_id", right_on="id", suffixes=("", "_keyword"))
+    rows = rows.groupby(["name", "year"]).publication_id.nunique().rename("publication_count").reset_index()
+    expected = brute_force(rows.rename(columns={"name": "keyword"}), 2000, 2030)
+
+    cube = mysql_utils.get_keyword_year_cube()
+    assert cube.range_counts(2000, 2030).tolist() == expected.reindex(cube.keywords, fill_value=0).tolist()
+
+    # A publication in a year outside the data appears after a refresh
+    keyword = cube.keywords[0]
+    with mysql_utils.pooled_connection() as connection:
+        connection.execute(sa.text("INSERT INTO publication (ID, title, venue, year, num_citations) "
+                                   "VALUES (999999, 't', 'v', 2099, 0)"))
+        connection.execute(sa.text("INSERT INTO publication_keyword (publication_id, keyword_id, score) "
+                                   "SELECT 999999, id, 1 FROM keyword WHERE name = :name"), {"name": keyword})
+        connection.commit()
+    assert mysql_utils.get_keyword_year_cube() is cube
+
+    refreshed = mysql_utils.refresh_keyword_year_cube()
+    assert mysql_utils.get_keyword_year_cube() is refreshed
+    assert refreshed.max_year == 2099
+    assert refreshed.top_keywords(5, 2099, 2099).to_dict("records") == [{"keyword": keyword, "popularity": 1}]
+
+    # Periodic checks rebuild only after a load stamps the cube
+    assert not mysql_utils.refresh_keyword_year_cube_if_stale()
+    assert mysql_utils.get_keyword_year_cube() is refreshed
+    mysql_utils.invalidate_keyword_year_cube()
+    assert mysql_utils.refresh_keyword_year_cube_if_stale()
+    assert mysql_utils.get_keyword_year_cube() is not refreshed
+    assert not mysql_utils.refresh_keyword_year_cube_if_stale()
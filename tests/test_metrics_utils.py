@@ -0,0 +1,16 @@
+import dash
+
+import metrics_utils
+
+
+def test_instrumented_callback_may_return_a_patch():
+    @metrics_utils.instrument("dash")
+    def save():
+        patch = dash.Patch()
+        patch[0]["numCitations"] = 1
+        return patch
+
+    assert isinstance(save(), dash.Patch)
+    series = metrics_utils.snapshot()[(f"{__name__}.{save.__qualname__}", "dash")]
+    assert series["calls"] == 1
+    assert series["errors"] == 0
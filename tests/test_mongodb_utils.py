@@ -0,0 +1,154 @@
+import time
+
+import mongomock
+import pymongo.errors
+import pytest
+
+import mongodb_utils
+
+
+def apply_operations(collection, operations):
+    # mongomock's bulk_write cannot take operations built by current pymongo
+    for operation in operations:
+        collection.update_one(operation._filter, operation._doc, upsert=operation._upsert)
+
+
+class FakeBulkWrite:
+    """Stands in for Collection.bulk_write; `failures` is one entry per call:
+    None (succeed), an exception to raise, or {index: write error code}"""
+
+    def __init__(self, monkeypatch, *failures):
+        self.failures = list(failures)
+        self.calls = []
+        monkeypatch.setattr(mongomock.Collection, "bulk_write", self, raising=False)
+
+    def __get__(self, collection, owner):
+        return lambda operations, ordered=True: self(collection, operations)
+
+    def __call__(self, collection, operations):
+        self.calls.append(len(operations))
+        failure = self.failures.pop(0) if self.failures else None
+        if isinstance(failure, Exception):
+            raise failure
+        failure = failure or {}
+        apply_operations(collection, [op for i, op in enumerate(operations) if i not in failure])
+        if failure:
+            raise pymongo.errors.BulkWriteError({"writeErrors": [
+                {"index": i, "code": code, "errmsg": f"error {code}"} for i, code in failure.items()]})
+
+
+@pytest.fixture
+def publications():
+    client = mongomock.MongoClient()
+    mongodb_utils.configure(client, "citation_queue_test")
+    collection = client["citation_queue_test"]["publications"]
+    ids = [str(collection.insert_one({"id": i, "numCitations": 10, "keywords": [{"name": "kw"}]}).inserted_id)
+           for i in range(3)]
+    return collection, ids
+
+
+def citations(collection, pub_id):
+    return collection.find_one({"_id": mongodb_utils.ObjectId(pub_id)})["numCitations"]
+
+
+def make_queue(synced, **kwargs):
+    return mongodb_utils.CitationWriteQueue(flush_seconds=60, on_applied=synced.extend, **kwargs)
+
+
+def test_edits_are_merged_and_written_in_one_batch(publications, monkeypatch):
+    collection, ids = publications
+    bulk_write = FakeBulkWrite(monkeypatch)
+    synced = []
+    queue = make_queue(synced)
+    queue.put(ids[0], 11, 10, 0)
+    queue.put(ids[0], 12, 10, 0)
+    queue.put(ids[1], 20, 10, 1)
+    assert queue.pending_count() == 2
+
+    assert queue.flush() == {ids[0]: True, ids[1]: True}
+    assert bulk_write.calls == [2]
+    assert [citations(collection, pub_id) for pub_id in ids] == [12, 20, 10]
+    assert sorted(synced) == [(0, 12), (1, 20)]
+    assert queue.pending_count() == 0
+
+
+def test_compare_and_set_conflict_is_not_applied(publications, monkeypatch):
+    collection, ids = publications
+    FakeBulkWrite(monkeypatch)
+    synced = []
+    queue = make_queue(synced)
+    queue.put(ids[0], 50, 9, 0)  # someone else already changed it from 9
+    queue.put(ids[1], 60, 10, 1)
+
+    assert queue.flush() == {ids[0]: False, ids[1]: True}
+    assert citations(collection, ids[0]) == 10
+    assert synced == [(1, 60)]
+    assert queue.pending_count() == 0
+
+
+def test_only_the_failed_edit_is_requeued(publications, monkeypatch):
+    collection, ids = publications
+    bulk_write = FakeBulkWrite(monkeypatch, {1: 91})
+    synced = []
+    queue = make_queue(synced)
+    for i, pub_id in enumerate(ids):
+        queue.put(pub_id, 100 + i, 10, i)
+
+    with pytest.raises(pymongo.errors.BulkWriteError):
+        queue.flush()
+    assert sorted(synced) == [(0, 100), (2, 102)]
+    assert queue.pending_count() == 1
+
+    assert queue.flush() == {ids[1]: True}
+    assert bulk_write.calls == [3, 1]
+    assert sorted(synced) == [(0, 100), (1, 101), (2, 102)]
+    assert [citations(collection, pub_id) for pub_id in ids] == [100, 101, 102]
+
+
+def test_permanent_write_error_is_given_up(publications, monkeypatch):
+    collection, ids = publications
+    FakeBulkWrite(monkeypatch, {0: 121})
+    queue = make_queue([])
+    queue.put(ids[0], 5, 10, 0)
+
+    with pytest.raises(pymongo.errors.BulkWriteError):
+        queue.flush()
+    assert queue.pending_count() == 0
+    assert [(pub_id, reason) for pub_id, _, reason in queue.failed] == [(ids[0], "error 121")]
+    assert citations(collection, ids[0]) == 10
+
+
+def test_edit_is_given_up_after_max_attempts(publications, monkeypatch):
+    collection, ids = publications
+    FakeBulkWrite(monkeypatch, *[pymongo.errors.AutoReconnect("down")] * 3)
+    queue = make_queue([], max_attempts=3)
+    queue.put(ids[0], 5, 10, 0)
+
+    for _ in range(3):
+        with pytest.raises(pymongo.errors.AutoReconnect):
+            queue.flush()
+    assert queue.pending_count() == 0
+    assert [reason for _, _, reason in queue.failed] == ["3 failed attempts"]
+
+
+def test_failed_timed_flush_is_retried(publications, monkeypatch):
+    collection, ids = publications
+    FakeBulkWrite(monkeypatch, pymongo.errors.AutoReconnect("down"))
+    synced = []
+    queue = mongodb_utils.CitationWriteQueue(flush_seconds=0.05, on_applied=synced.extend)
+    queue.put(ids[0], 7, 10, 0)
+
+    deadline = time.monotonic() + 5
+    while not synced and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert synced == [(0, 7)]
+    assert citations(collection, ids[0]) == 7
+
+
+def test_flush_at_exit_does_not_raise(publications, monkeypatch):
+    collection, ids = publications
+    FakeBulkWrite(monkeypatch, pymongo.errors.AutoReconnect("down"))
+    queue = make_queue([])
+    queue.put(ids[0], 7, 10, 0)
+    queue.flush_at_exit()
+    assert queue.pending_count() == 1
@@ -0,0 +1,92 @@
+import pytest
+import sqlalchemy as sa
+
+import mysql_utils
+import synthetic_data
+
+
+def execute(statement, **params):
+    with mysql_utils.pooled_connection() as connection:
+        connection.execute(sa.text(statement), params)
+        connection.commit()
+
+
+def brute_force_scores(keyword):
+    """SUM(num_citations) per author over the distinct publications labelled with the keyword name"""
+    rows = mysql_utils.get_data("""
+        SELECT DISTINCT fp.faculty_Id AS faculty_id, p.ID AS publication_id, p.num_citations
+        FROM faculty_publication fp
+        JOIN publication p ON fp.publication_Id = p.ID
+        JOIN publication_keyword pk ON p.ID = pk.publication_id
+        JOIN keyword k ON pk.keyword_id = k.id
+        WHERE k.name = :keyword
+    """, {"keyword": keyword})
+    return rows.groupby("faculty_id")["num_citations"].sum().to_dict()
+
+
+@pytest.fixture
+def duplicate_keyword(tmp_path):
+    """A tiny database where one keyword name has two ids, both on one publication and on another"""
+    dataset = synthetic_data.generate_dataset("tiny")
+    url = f"sqlite:///{tmp_path / 'faculty.db'}"
+    synthetic_data.load_mysql(dataset, url)
+    mysql_utils.configure(url)
+
+    keyword_id, keyword = mysql_utils.get_data("""
+        SELECT k.id, k.name FROM keyword k
+        JOIN publication_keyword pk ON pk.keyword_id = k.id
+        GROUP BY k.id, k.name ORDER BY COUNT(*) DESC LIMIT 1
+    """).iloc[0]
+    authored = """
+        SELECT MIN(fp.publication_Id) FROM faculty_publication fp
+        WHERE fp.publication_Id {} (SELECT publication_id FROM publication_keyword WHERE keyword_id = :keyword_id)
+    """
+    labelled, unlabelled = [int(mysql_utils.get_data(authored.format(op), {"keyword_id": int(keyword_id)}).iloc[0, 0])
+                            for op in ("IN", "NOT IN")]
+    execute("INSERT INTO keyword (id, name) VALUES (999999, :name)", name=keyword)
+    for publication_id in (labelled, unlabelled):
+        execute("INSERT INTO publication_keyword (publication_id, keyword_id, score) VALUES (:id, 999999, 1)",
+                id=publication_id)
+    mysql_utils.refresh_faculty_keyword_scores()
+    return keyword, labelled
+
+
+def test_top_faculty_counts_every_id_of_a_keyword_name_once(duplicate_keyword):
+    keyword, _ = duplicate_keyword
+    expected = brute_force_scores(keyword)
+
+    top = mysql_utils.get_top_faculty_by_keyword(keyword, mysql_utils.TOP_FACULTY_MAX)
+    assert top["id"].is_unique
+    assert len(top) == min(len(expected), mysql_utils.TOP_FACULTY_MAX)
+    assert {int(f): int(total) for f, total in zip(top["id"], top["total_citations"])} == \
+        {f: expected[f] for f in top["id"]}
+    assert top["total_citations"].tolist() == sorted(expected.values(), reverse=True)[:len(top)]
+
+
+def test_citation_edit_shifts_the_scores_once(duplicate_keyword):
+    keyword, publication_id = duplicate_keyword
+    citations = int(mysql_utils.get_data("SELECT num_citations FROM publication WHERE ID = :id",
+                                         {"id": publication_id}).iloc[0, 0])
+
+    assert mysql_utils.update_publication_citations(publication_id, citations + 7)
+    scores = mysql_utils.get_data("SELECT faculty_id, total_citations FROM faculty_keyword_score WHERE keyword = :k",
+                                  {"k": keyword})
+    assert dict(zip(scores["faculty_id"], scores["total_citations"])) == brute_force_scores(keyword)
+
+
+def test_ensure_schema_replaces_an_older_score_table(tmp_path):
+    engine = sa.create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    synthetic_data.mysql_metadata().create_all(engine)
+    with engine.connect() as connection:
+        connection.execute(sa.text("CREATE TABLE faculty_keyword_score (faculty_id INT, keyword_id INT, "
+                                   "total_citations BIGINT, PRIMARY KEY (faculty_id, keyword_id))"))
+        connection.execute(sa.text("INSERT INTO faculty_keyword_score VALUES (1, 2, 3)"))
+        connection.commit()
+
+    mysql_utils.ensure_schema(engine)
+    mysql_utils.ensure_schema(engine)
+    with engine.connect() as connection:
+        columns = [column["name"] for column in sa.inspect(connection).get_columns("faculty_keyword_score")]
+        rows = connection.execute(sa.text("SELECT COUNT(*) FROM faculty_keyword_score")).scalar()
+    assert columns == ["faculty_id", "keyword", "total_citations"]
+    assert rows == 0
@@ -0,0 +1,16 @@
+import json
+import os
+
+import query_plans
+
+BASELINE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "query_plan_baseline.json")
+
+
+def test_sqlite_plans_match_the_baseline():
+    report = query_plans.inspect_plans(query_plans.build_parser().parse_args([]))
+    with open(BASELINE) as f:
+        baseline = json.load(f)
+
+    assert report["errors"] == {}
+    assert report["plans"]["sqlite"]
+    assert query_plans.compare(report["plans"], baseline) == []
@@ -0,0 +1,27 @@
+import pytest
+
+import synthetic_data
+
+
+@pytest.mark.parametrize("scale", sorted(synthetic_data.SCALES))
+def test_every_scale_generates_its_distinct_keywords(scale):
+    dataset = synthetic_data.generate_dataset(scale)
+    names = dataset["tables"]["keyword"]["name"]
+    assert len(names) == synthetic_data.SCALES[scale]["keywords"]
+    assert names.is_unique
+    assert dataset["sizes"]["faculty"] == synthetic_data.SCALES[scale]["faculty"]
+    assert dataset["sizes"]["publication"] == synthetic_data.SCALES[scale]["publications"]
+
+
+def test_keyword_names_move_to_longer_names_when_pairs_run_out():
+    pairs = len(synthetic_data._WORDS) * (len(synthetic_data._WORDS) - 1)
+    dataset = synthetic_data.generate_dataset({"keywords": pairs + 10})
+    word_counts = dataset["tables"]["keyword"]["name"].str.split().str.len()
+    assert (word_counts == 2).sum() == pairs
+    assert (word_counts == 3).sum() == 10
+
+
+def test_same_seed_same_dataset():
+    first = synthetic_data.generate_dataset("tiny", seed=3)["tables"]
+    second = synthetic_data.generate_dataset("tiny", seed=3)["tables"]
+    assert all(first[name].equals(second[name]) for name in first)
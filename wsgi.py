@@ -0,0 +1,7 @@
+# Production entry point: gunicorn -c gunicorn.conf.py wsgi:server
+#
+# Importing the app opens no database connections; each worker creates its
+# own MySQL pool, Mongo client and Neo4j driver after fork (see gunicorn.conf.py).
+from app import server
+
+__all__ = ["server"]